@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class VentapiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ventAPI'
+
+    def ready(self):
+        from ventAPI import signals  # noqa: F401
@@ -0,0 +1,232 @@
+"""
+Our API authentication module : token authentication without queries on the hot path.
+
+A token resolves to a snapshot of its user (role, reg_number, customer account...),
+looked up in two cache tiers before the database :
+- a bounded LRU in each process, whose entries expire after API_TOKEN_LOCAL_TIMEOUT,
+- the shared cache (e.g. Redis), whose entries expire after API_TOKEN_CACHE_TIMEOUT.
+Deleting a token, or saving its user or customer account, invalidates the shared entry
+and the local one (see signals.py).
+Other processes, and changes sending no signal (e.g. User.objects.filter(...).update(
+is_active=False)), are caught up by checking snapshots against the database again
+once older than API_TOKEN_RECHECK_INTERVAL, in either tier : a revoked token or
+deactivated user is refused within that interval, whatever the deactivation path.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from ventashop.models import CustomerAccount
+
+User = get_user_model()
+
+
+def _snapshot_fields(model, names):
+    # In the order of the model's fields, as expected by Model.from_db().
+    return [f.attname for f in model._meta.concrete_fields if f.attname in names]
+
+
+USER_FIELDS = _snapshot_fields(
+    User,
+    {
+        "id",
+        "email",
+        "first_name",
+        "last_name",
+        "role",
+        "reg_number",
+        "is_active",
+        "is_staff",
+        "is_superuser",
+    },
+)
+ACCOUNT_FIELDS = _snapshot_fields(
+    CustomerAccount, {"id", "is_active", "customer_id", "employee_reg"}
+)
+
+
+class LRUCache:
+    """A thread-safe, bounded, least recently used cache, with expiring entries."""
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """The value of key, or None if absent or expired."""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_tokens = LRUCache(
+    maxsize=getattr(settings, "API_TOKEN_CACHE_SIZE", 1000),
+    timeout=getattr(settings, "API_TOKEN_LOCAL_TIMEOUT", 30),
+)
+
+
+def _cache_key(key):
+    # Token keys are credentials : only their hash is stored as a cache key.
+    return "ventapi:token:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def _load_snapshot(key):
+    """Snapshot of the user of token key from the database (one query), or None."""
+
+    token = (
+        Token.objects.select_related("user__customeraccount")
+        .filter(key=key)
+        .only(
+            "key",
+            *(f"user__{f}" for f in USER_FIELDS),
+            *(f"user__customeraccount__{f.removesuffix('_id')}" for f in ACCOUNT_FIELDS),
+        )
+        .first()
+    )
+    if token is None:
+        return None
+
+    user = token.user
+    try:
+        account = user.customeraccount
+    except CustomerAccount.DoesNotExist:
+        account = None
+
+    return {
+        "user": [getattr(user, f) for f in USER_FIELDS],
+        "account": account and [getattr(account, f) for f in ACCOUNT_FIELDS],
+        "checked": time.time(),
+    }
+
+
+def _is_recent(snapshot):
+    """Whether a snapshot was read from the database within the recheck interval."""
+
+    age = time.time() - snapshot.get("checked", 0)
+
+    return age < getattr(settings, "API_TOKEN_RECHECK_INTERVAL", 5)
+
+
+def _user_from_snapshot(snapshot):
+    """
+    A user instance from a snapshot. Its other fields are deferred (loaded on access),
+    and save() only writes the snapshot's fields.
+    """
+
+    user = User.from_db(DEFAULT_DB_ALIAS, USER_FIELDS, snapshot["user"])
+
+    account = None
+    if snapshot["account"] is not None:
+        account = CustomerAccount.from_db(
+            DEFAULT_DB_ALIAS, ACCOUNT_FIELDS, snapshot["account"]
+        )
+    # A customer account of None raises RelatedObjectDoesNotExist, as usual.
+    User.customeraccount.related.set_cached_value(user, account)
+
+    return user
+
+
+def get_snapshot(key):
+    """
+    Snapshot of the user of token key : from the local cache, shared cache, or database
+    when not checked against it recently.
+    """
+
+    snapshot = local_tokens.get(key)
+    if snapshot is not None and _is_recent(snapshot):
+        return snapshot
+
+    snapshot = cache.get(_cache_key(key))
+    if snapshot is None or not _is_recent(snapshot):
+        snapshot = warm_token(key)
+    else:
+        local_tokens.set(key, snapshot)
+
+    return snapshot
+
+
+def warm_token(key):
+    """Load the user of token key in both cache tiers, and return its snapshot."""
+
+    snapshot = _load_snapshot(key)
+    if snapshot is not None:
+        cache.set(
+            _cache_key(key), snapshot, getattr(settings, "API_TOKEN_CACHE_TIMEOUT", 300)
+        )
+        local_tokens.set(key, snapshot)
+
+    return snapshot
+
+
+def invalidate_token(key):
+    """Forget token key, in the shared cache and this process."""
+
+    cache.delete(_cache_key(key))
+    local_tokens.delete(key)
+
+
+def invalidate_user_tokens(user_id):
+    """Forget the tokens of a user."""
+
+    for key in Token.objects.filter(user_id=user_id).values_list("key", flat=True):
+        invalidate_token(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication, resolving tokens from the caches (see module docstring)."""
+
+    def authenticate_credentials(self, key):
+        snapshot = get_snapshot(key)
+        if snapshot is None:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+
+        user = _user_from_snapshot(snapshot)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+
+        token = Token(key=key)
+        token.user = user
+
+        return (user, token)
@@ -0,0 +1,23 @@
+"""Our API pagination module."""
+
+from rest_framework import pagination
+
+
+class CursorPagination(pagination.CursorPagination):
+    """
+    Cursor pagination of every list endpoint : each page is one indexed range query,
+    whatever the table size, and no COUNT(*) is run.
+
+    Viewsets may declare their own (stable, unique or tie-broken) "cursor_ordering"
+    and default "page_size". Clients may ask for another "page_size", up to max_page_size.
+    """
+
+    ordering = "-pk"
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordering = getattr(view, "cursor_ordering", self.ordering)
+        self.page_size = getattr(view, "page_size", self.page_size)
+
+        return super().paginate_queryset(queryset, request, view)
@@ -0,0 +1,169 @@
+"""
+Our API query plans module : select_related / prefetch_related lookups
+derived from the fields of a serializer.
+
+A viewset listing n objects then costs a fixed number of queries
+(one per prefetched relation), instead of a few per object.
+"""
+
+import functools
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField
+
+
+class QueryPlan:
+    """The select_related and prefetch_related lookups of a serializer's model."""
+
+    def __init__(self, select_related=(), prefetch_related=()):
+        self.select_related = list(select_related)
+        self.prefetch_related = list(prefetch_related)
+
+    def __bool__(self):
+        return bool(self.select_related or self.prefetch_related)
+
+    def apply(self, queryset):
+        """queryset with the plan's lookups."""
+
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+
+        return queryset
+
+
+def _relation(model, name):
+    """Relation field named name on model (forward or reverse), or None."""
+
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        # Reverse relations are named <model>_set in sources, <model> in _meta.
+        if not name.endswith("_set"):
+            return None
+        try:
+            field = model._meta.get_field(name[: -len("_set")])
+        except FieldDoesNotExist:
+            return None
+
+    return field if field.is_relation else None
+
+
+def _single_path(model, source):
+    """
+    Longest chain of forward to-one relations of a dotted source, as a
+    select_related lookup (e.g. "customer.email" -> "customer"), or None.
+    """
+
+    path = []
+    for name in source.split("."):
+        field = _relation(model, name)
+        if field is None or field.many_to_many or field.one_to_many:
+            break
+        path.append(name)
+        model = field.related_model
+
+    return "__".join(path) or None
+
+
+def _related_queryset(field, plan=None, only_pk=False, exclude=None):
+    """Queryset of a prefetched relation, with its own plan."""
+
+    model = field.related_model
+    queryset = model._default_manager.all()
+
+    if plan is not None:
+        if exclude is not None:
+            # Already set by the prefetch, from the other side.
+            plan = QueryPlan(
+                [s for s in plan.select_related if s.split("__")[0] != exclude],
+                plan.prefetch_related,
+            )
+        queryset = plan.apply(queryset)
+
+    if only_pk:
+        fields = ["pk"]
+        if field.one_to_many:
+            fields.append(field.field.name)
+        queryset = queryset.only(*fields)
+
+    return queryset
+
+
+def build_query_plan(serializer, model):
+    """
+    QueryPlan of a serializer instance for model :
+    - nested serializers and dotted sources of to-one relations are select_related,
+    - nested serializers and primary keys of to-many relations are prefetched,
+      with their own plan.
+    """
+
+    plan = QueryPlan()
+
+    for field in serializer.fields.values():
+        if field.source == "*" or field.write_only:
+            continue
+
+        if isinstance(field, serializers.ListSerializer) and isinstance(
+            field.child, serializers.ModelSerializer
+        ):
+            relation = _relation(model, field.source)
+            if relation is None:
+                continue
+            child_plan = build_query_plan(field.child, relation.related_model)
+            exclude = relation.field.name if relation.one_to_many else None
+            plan.prefetch_related.append(
+                Prefetch(
+                    field.source,
+                    queryset=_related_queryset(relation, child_plan, exclude=exclude),
+                )
+            )
+
+        elif isinstance(field, ManyRelatedField):
+            relation = _relation(model, field.source)
+            if relation is None or not (relation.one_to_many or relation.many_to_many):
+                continue
+            plan.prefetch_related.append(
+                Prefetch(field.source, queryset=_related_queryset(relation, only_pk=True))
+            )
+
+        elif isinstance(field, serializers.ModelSerializer):
+            path = _single_path(model, field.source)
+            if path is None:
+                continue
+            plan.select_related.append(path)
+            child_plan = build_query_plan(field, field.Meta.model)
+            plan.select_related += [f"{path}__{s}" for s in child_plan.select_related]
+
+        elif "." in field.source:
+            path = _single_path(model, field.source)
+            if path is not None:
+                plan.select_related.append(path)
+
+    return plan
+
+
+@functools.lru_cache(maxsize=None)
+def get_query_plan(serializer_class):
+    """The (cached) QueryPlan of a model serializer class."""
+
+    return build_query_plan(serializer_class(), serializer_class.Meta.model)
+
+
+class QueryPlanMixin:
+    """
+    Viewset mixin applying its serializer's query plan to its querysets,
+    whatever their filters (in filter_queryset, used by list and detail actions).
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+
+        plan = get_query_plan(self.get_serializer_class())
+        if plan and not queryset.query.is_sliced:
+            queryset = plan.apply(queryset)
+
+        return queryset
@@ -150,13 +150,24 @@ class ConversationSerializer(serializers.ModelSerializer):
         read_only_fields = ["subject", "date_created"]
 
 
+class ConversationSummarySerializer(serializers.ModelSerializer):
+    """Conversation model serializer, without messages."""
+
+    participants = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+    class Meta:
+        model = Conversation
+        fields = ["id", "subject", "date_created", "date_modified", "participants"]
+        read_only_fields = fields
+
+
 class ProductSerializer(serializers.ModelSerializer):
     """Product model serializer."""
 
     class Meta:
         model = Product
-        fields = ["name", "price"]
-        read_only_fields = ["name", "price"]
+        fields = ["id", "name", "slug", "price"]
+        read_only_fields = ["name", "slug", "price"]
 
 
 class LineItemSerializer(serializers.ModelSerializer):
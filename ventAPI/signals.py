@@ -0,0 +1,35 @@
+"""Our API signal receivers module, connected in apps.py."""
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from ventAPI.authentication import invalidate_token, invalidate_user_tokens
+from ventashop.models import CustomerAccount
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    """A revoked token stops authenticating, see authentication.py."""
+
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user_tokens(sender, instance, **kwargs):
+    """Cached users are refreshed once changed."""
+
+    invalidate_user_tokens(instance.pk)
+
+
+@receiver(post_save, sender=CustomerAccount)
+@receiver(post_delete, sender=CustomerAccount)
+def forget_customer_tokens(sender, instance, **kwargs):
+    """Cached customer accounts are refreshed once changed."""
+
+    if instance.customer_id is not None:
+        invalidate_user_tokens(instance.customer_id)
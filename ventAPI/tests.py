@@ -1,3 +1,761 @@
-from django.test import TestCase
+"""Our API's test module."""
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from ventAPI.authentication import (
+    CachedTokenAuthentication,
+    LRUCache,
+    _cache_key,
+    local_tokens,
+    warm_token,
+)
+from ventashop.models import (
+    Cart,
+    ChangeLogEntry,
+    Conversation,
+    Message,
+    Product,
+    UnreadCounter,
+    User,
+)
+from ventashop.tests import utils_tests
+
+
+class MessageViewSetTestCase(TestCase):
+    """Test class for our message API endpoint, and its keyset windows."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Arrange."""
+
+        cls.employee1 = utils_tests.create_employee1()
+        cls.customer1 = utils_tests.create_customer1()
+        cls.conversation = Conversation.objects.get(participants=cls.customer1)
+
+        cls.messages = [
+            Message.objects.create(
+                author=cls.customer1,
+                content="content" + str(i),
+                conversation=cls.conversation,
+            )
+            for i in range(10)
+        ]
+        cls.token = Token.objects.create(user=cls.customer1)
+
+    def setUp(self) -> None:
+        """Arrange."""
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    def get_contents(self, params):
+        """Contents of the messages returned by the endpoint."""
+
+        response = self.client.get("/api/messages/", params)
+        self.assertEqual(response.status_code, 200)
+
+        return [m["content"] for m in response.json()]
+
+    def test_last_messages(self):
+        """Check the last n messages of a conversation are returned."""
+
+        # Act, assert.
+        self.assertEqual(
+            self.get_contents({"conversation": self.conversation.pk, "last": 2}),
+            ["content8", "content9"],
+        )
+
+    def test_messages_before_and_after(self):
+        """Check "limit" messages before / after a message id are returned."""
+
+        # Arrange.
+        params = {"conversation": self.conversation.pk, "limit": 2}
+
+        # Act, assert.
+        self.assertEqual(
+            self.get_contents({**params, "before": self.messages[5].pk}),
+            ["content3", "content4"],
+        )
+        self.assertEqual(
+            self.get_contents({**params, "after": self.messages[5].pk}),
+            ["content6", "content7"],
+        )
+
+    def test_invalid_cursor(self):
+        """Check a non numeric cursor is refused."""
+
+        # Act.
+        response = self.client.get(
+            "/api/messages/", {"conversation": self.conversation.pk, "before": "abc"}
+        )
+
+        # Assert.
+        self.assertEqual(response.status_code, 400)
+
+    def test_conversation_messages_pages(self):
+        """Check a conversation's messages are paginated by cursor, oldest first."""
+
+        # Arrange.
+        params = {"conversation": self.conversation.pk, "page_size": 4}
+
+        # Act.
+        first = self.client.get("/api/messages/", params).json()
+        second = self.client.get(first["next"]).json()
+
+        # Assert.
+        self.assertEqual(
+            [m["content"] for m in first["results"] + second["results"]],
+            ["content" + str(i) for i in range(8)],
+        )
+        self.assertNotIn("count", first)
+
+    def test_create_message_bumps_conversation(self):
+        """Check posting a message moves its conversation to the top of the inbox."""
+
+        # Arrange.
+        other = Conversation.objects.create(subject="other")
+        other.participants.add(self.employee1)
+
+        # Act.
+        response = self.client.post(
+            "/api/messages/",
+            {"content": "new", "conversation_id": self.conversation.pk},
+        )
+
+        # Assert.
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Conversation.objects.inbox(self.employee1)[0], self.conversation)
+
+    def test_patch_read_state_counted(self):
+        """Check marking a message read, then deleting it, keeps the unread counter right."""
+
+        # Arrange.
+        counter = UnreadCounter.objects.get(user=self.employee1, conversation=self.conversation)
+        url = f"/api/messages/{self.messages[0].pk}/"
+
+        # Act.
+        patched = self.client.patch(url, {"is_read": True}, format="json")
+        read_count = UnreadCounter.objects.get(pk=counter.pk).count
+        self.client.delete(f"/api/messages/{self.messages[1].pk}/")
+
+        # Assert.
+        self.assertEqual(patched.status_code, 200)
+        self.assertEqual(read_count, 9)
+        self.assertEqual(UnreadCounter.objects.get(pk=counter.pk).count, 8)
+
+
+class UserConversationViewSetTestCase(TestCase):
+    """Test class for our user conversation API endpoint, and its unread counters."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Arrange."""
+
+        cls.employee1 = utils_tests.create_employee1()
+        cls.customer1 = utils_tests.create_customer1()
+        cls.conversation = Conversation.objects.get(participants=cls.customer1)
+        cls.conversation.add_message(author=cls.customer1, content="question")
+        cls.token = Token.objects.create(user=cls.employee1)
+
+    def setUp(self) -> None:
+        """Arrange."""
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    def test_unread_and_mark_read(self):
+        """Check unread counts are listed, then reset by mark_read."""
+
+        # Act.
+        unread = self.client.get("/api/user_conversations/unread/").json()
+        marked = self.client.post(
+            f"/api/user_conversations/{self.conversation.pk}/mark_read/"
+        ).json()
+
+        # Assert.
+        self.assertEqual(unread["total"], 1)
+        self.assertEqual(unread["conversations"], {str(self.conversation.pk): 1})
+        self.assertEqual(marked["marked_read"], 1)
+        self.assertEqual(
+            self.client.get("/api/user_conversations/unread/").json()["total"], 0
+        )
+
+
+class CursorPaginationTestCase(TestCase):
+    """Test class for the cursor pagination of our list endpoints."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Arrange."""
+
+        cls.employee1 = utils_tests.create_employee1()
+        cls.customer1 = utils_tests.create_customer1()
+        cls.token = Token.objects.create(user=cls.employee1)
+
+    def setUp(self) -> None:
+        """Arrange."""
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    def test_pages_follow_cursor(self):
+        """Check pages chain through their "next" cursor, without duplicates nor COUNT."""
+
+        # Arrange.
+        Product.objects.bulk_create(
+            [
+                Product(name=f"product{i}", slug=f"product{i}", description="", price=1)
+                for i in range(5)
+            ]
+        )
+
+        # Act.
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get("/api/products/", {"page_size": 2}).json()
+        pages = [first]
+        while pages[-1]["next"]:
+            pages.append(self.client.get(pages[-1]["next"]).json())
+
+        # Assert.
+        self.assertEqual(
+            [p["name"] for page in pages for p in page["results"]],
+            [f"product{i}" for i in range(5)],
+        )
+        self.assertEqual(len(pages), 3)
+        self.assertFalse(any("COUNT" in q["sql"] for q in queries.captured_queries))
+
+    def test_max_page_size(self):
+        """Check the page size asked for is capped, and defaults to the endpoint's."""
+
+        # Arrange.
+        Product.objects.bulk_create(
+            [
+                Product(name=f"product{i}", slug=f"product{i}", description="", price=1)
+                for i in range(250)
+            ]
+        )
+
+        # Act.
+        capped = self.client.get("/api/products/", {"page_size": 1000}).json()
+        default = self.client.get("/api/products/").json()
+
+        # Assert.
+        self.assertEqual(len(capped["results"]), 200)
+        self.assertEqual(len(default["results"]), 50)
+
+
+class QueryCountTestCase(TestCase):
+    """
+    Test class for the query plans of our list endpoints :
+    their query count is fixed, whatever the number of objects listed.
+    """
+
+    # Watermark (conditional GET endpoints, plus their messages' for conversations),
+    # page, then one query per prefetched relation : the token is authenticated
+    # from the cache.
+    ENDPOINT_QUERIES = {
+        "/api/users/": 3,
+        "/api/customeraccounts/": 2,
+        "/api/orders/": 4,
+        "/api/whole_orders/": 4,
+        "/api/user_orders/": 4,
+        "/api/comments/": 1,
+        "/api/lineitems/": 1,
+        "/api/conversations/": 5,
+        "/api/user_conversations/": 5,
+        "/api/messages/": 2,
+    }
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Arrange."""
+
+        cls.employee1 = utils_tests.create_employee1()
+        cls.customer1 = utils_tests.create_customer1()
+        cls.product = Product.objects.create(
+            name="product1", description="description1", price=1
+        )
+        cls.token = Token.objects.create(user=cls.employee1)
+
+    def setUp(self) -> None:
+        """Arrange."""
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+        warm_token(self.token.key)
+
+    def add_data(self, size):
+        """size more orders (2 line items and a comment each), customers and messages."""
+
+        cart = Cart.objects.get(customer_account__customer=self.customer1)
+        for _ in range(size):
+            other = Product.objects.create(
+                name=f"product{Product.objects.count() + 1}", description="", price=1
+            )
+            cart.add_line_item(self.product, 1000)
+            cart.add_line_item(other, 1000)
+            cart.make_order()
+
+        conversation = Conversation.objects.get(participants=self.customer1)
+        for i in range(size):
+            conversation.add_message(author=self.customer1, content=str(i))
+
+    def test_fixed_query_count(self):
+        """Check each list endpoint costs the same number of queries, for 1 or 5 objects each."""
+
+        for size in (1, 4):
+            # Arrange.
+            self.add_data(size)
+
+            for url, expected in self.ENDPOINT_QUERIES.items():
+                with self.subTest(url=url, objects=size):
+                    # Act, assert.
+                    with self.assertNumQueries(expected):
+                        response = self.client.get(url)
+                    self.assertEqual(response.status_code, 200)
+
+
+class ConditionalGetTestCase(TestCase):
+    """Test class for the conditional GET (ETag / Last-Modified) of our polled endpoints."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Arrange."""
+
+        cls.employee1 = utils_tests.create_employee1()
+        cls.customer1 = utils_tests.create_customer1()
+        cls.conversation = Conversation.objects.get(participants=cls.customer1)
+        cls.conversation.add_message(author=cls.customer1, content="question")
+
+        product = Product.objects.create(name="product1", description="", price=1)
+        cart = Cart.objects.get(customer_account__customer=cls.customer1)
+        cart.add_line_item(product, 1000)
+        cls.order = cart.make_order()
+
+        cls.token = Token.objects.create(user=cls.employee1)
+
+    def setUp(self) -> None:
+        """Arrange."""
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    def assertNotModified(self, url, response, queries=1):
+        """Check a request of url with response's validators is answered with a 304."""
+
+        with self.assertNumQueries(queries):  # Watermark, the token being cached.
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified["ETag"], response["ETag"])
+
+    def test_not_modified(self):
+        """Check unchanged lists and objects are answered with a 304, without payload."""
+
+        for url, queries in [
+            ("/api/user_orders/", 1),
+            (f"/api/user_orders/{self.order.pk}/", 1),
+            ("/api/user_conversations/", 2),  # Conversations, then their messages.
+            (f"/api/messages/?conversation={self.conversation.pk}&last=10", 1),
+        ]:
+            with self.subTest(url=url):
+                # Act.
+                response = self.client.get(url)
+
+                # Assert.
+                self.assertEqual(response.status_code, 200)
+                self.assertIn("Last-Modified", response)
+                self.assertNotModified(url, response, queries)
+
+    def test_if_modified_since(self):
+        """Check a list unchanged since a date is answered with a 304."""
+
+        # Arrange.
+        response = self.client.get("/api/user_orders/")
+
+        # Act.
+        not_modified = self.client.get(
+            "/api/user_orders/", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+
+        # Assert.
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_modified(self):
+        """Check new comments, messages and read marks change the ETags."""
+
+        # Arrange.
+        orders = self.client.get("/api/user_orders/")
+        conversations = self.client.get("/api/user_conversations/")
+
+        # Act.
+        self.order.add_comment("Expédiée.")
+        new_orders = self.client.get("/api/user_orders/", HTTP_IF_NONE_MATCH=orders["ETag"])
+        self.conversation.mark_read(self.employee1)
+        read = self.client.get(
+            "/api/user_conversations/", HTTP_IF_NONE_MATCH=conversations["ETag"]
+        )
+
+        # Assert.
+        self.assertEqual(new_orders.status_code, 200)
+        self.assertEqual(len(new_orders.json()["results"][0]["comment_set"]), 2)
+        self.assertEqual(read.status_code, 200)
+        self.assertNotEqual(read["ETag"], conversations["ETag"])
+
+    def test_deleted(self):
+        """Check deleted orders and messages change the ETags."""
+
+        # Arrange.
+        orders = self.client.get("/api/user_orders/")
+        conversations = self.client.get("/api/user_conversations/")
+
+        # Act.
+        self.order.delete()
+        new_orders = self.client.get("/api/user_orders/", HTTP_IF_NONE_MATCH=orders["ETag"])
+        self.conversation.message_set.all().delete()
+        new_conversations = self.client.get(
+            "/api/user_conversations/", HTTP_IF_NONE_MATCH=conversations["ETag"]
+        )
+
+        # Assert.
+        self.assertEqual(new_orders.status_code, 200)
+        self.assertEqual(new_orders.json()["results"], [])
+        self.assertEqual(new_conversations.status_code, 200)
+        self.assertEqual(new_conversations.json()["results"][0]["message_set"], [])
+
+
+class SyncViewSetTestCase(TestCase):
+    """Test class for our change feed endpoint."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Arrange."""
+
+        cls.employee1 = utils_tests.create_employee1()
+        cls.customer1 = utils_tests.create_customer1()
+        cls.customer2 = utils_tests.create_customer2()
+        cls.conversation = Conversation.objects.get(participants=cls.customer1)
+        cls.product = Product.objects.create(name="product1", description="", price=1)
+        cls.token = Token.objects.create(user=cls.customer1)
+
+    def setUp(self) -> None:
+        """Arrange."""
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    def sync(self, since):
+        response = self.client.get("/api/sync/", {"since": since})
+        self.assertEqual(response.status_code, 200)
+
+        return response.json()
+
+    def make_order(self, customer):
+        cart = Cart.objects.get(customer_account__customer=customer)
+        cart.add_line_item(self.product, 1000)
+
+        return cart.make_order()
+
+    def test_changes_since_cursor(self):
+        """Check only the user's changes after the cursor are returned, once per object."""
+
+        # Arrange.
+        cursor = self.sync(0)["cursor"]
+        order = self.make_order(self.customer1)
+        self.make_order(self.customer2)
+        self.conversation.add_message(author=self.employee1, content="hello")
+        message = Message.objects.get(content="hello")
+
+        # Act.
+        feed = self.sync(cursor)
+
+        # Assert.
+        changes = {(c["model"], c["id"]): c for c in feed["changes"]}
+        self.assertEqual(
+            set(changes),
+            {
+                ("order", order.pk),
+                ("comment", order.comment_set.get().pk),
+                ("message", message.pk),
+                ("conversation", self.conversation.pk),
+            },
+        )
+        self.assertEqual(changes[("message", message.pk)]["data"]["content"], "hello")
+        self.assertFalse(feed["more"])
+        self.assertEqual(self.sync(feed["cursor"])["changes"], [])
+
+    def test_tombstones(self):
+        """Check deleted objects are returned as deleted, without data."""
+
+        # Arrange.
+        self.conversation.add_message(author=self.employee1, content="hello")
+        message = Message.objects.get(content="hello")
+        pk = message.pk
+        cursor = self.sync(0)["cursor"]
+
+        # Act.
+        message.delete()
+        feed = self.sync(cursor)
+
+        # Assert.
+        self.assertEqual(
+            feed["changes"],
+            [{"model": "message", "id": pk, "action": "deleted", "data": None}],
+        )
+
+    def test_read_marks(self):
+        """Check messages marked read are returned as updated."""
+
+        # Arrange.
+        self.conversation.add_message(author=self.employee1, content="hello")
+        cursor = self.sync(0)["cursor"]
+
+        # Act.
+        self.conversation.mark_read(self.customer1)
+        feed = self.sync(cursor)
+
+        # Assert.
+        self.assertEqual(len(feed["changes"]), 1)
+        self.assertEqual(feed["changes"][0]["action"], "updated")
+        self.assertTrue(feed["changes"][0]["data"]["is_read"])
+
+    def test_pruned_cursor(self):
+        """Check a cursor older than the pruned log is refused with a 410."""
+
+        # Arrange.
+        cursor = self.sync(0)["cursor"]
+        self.make_order(self.customer1)
+        ChangeLogEntry.objects.prune(before=timezone.now())
+
+        # Act.
+        response = self.client.get("/api/sync/", {"since": cursor})
+
+        # Assert.
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(response.json()["cursor"], ChangeLogEntry.objects.head())
+
+    def test_full_resync(self):
+        """
+        Check a client refused after pruning resyncs from the head cursor,
+        then gets the changes made since.
+        """
+
+        # Arrange.
+        old_order = self.make_order(self.customer1)
+        ChangeLogEntry.objects.prune(before=timezone.now())
+        self.assertEqual(self.client.get("/api/sync/", {"since": 0}).status_code, 410)
+
+        # Act.
+        cursor = self.client.get("/api/sync/head/").json()["cursor"]
+        snapshot = self.client.get("/api/user_orders/").json()["results"]
+        new_order = self.make_order(self.customer1)
+        feed = self.sync(cursor)
+
+        # Assert.
+        self.assertEqual([order["id"] for order in snapshot], [old_order.pk])
+        self.assertEqual(
+            {(c["model"], c["id"]) for c in feed["changes"]},
+            {("order", new_order.pk), ("comment", new_order.comment_set.get().pk)},
+        )
+        self.assertEqual(self.sync(feed["cursor"])["changes"], [])
+
+
+class CachedTokenAuthenticationTestCase(TestCase):
+    """Test class for our cached token authentication."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Arrange."""
+
+        cls.customer1 = utils_tests.create_customer1()
+        cls.token = Token.objects.create(user=cls.customer1)
+
+    def setUp(self) -> None:
+        """Arrange."""
+
+        cache.clear()
+        local_tokens.clear()
+        self.authentication = CachedTokenAuthentication()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    def test_no_query_once_cached(self):
+        """Check a cached token is authenticated without any query, account included."""
+
+        # Arrange.
+        with self.assertNumQueries(1):
+            self.authentication.authenticate_credentials(self.token.key)
+
+        # Act.
+        with self.assertNumQueries(0):
+            user, _ = self.authentication.authenticate_credentials(self.token.key)
+            account = user.customeraccount
+
+        # Assert.
+        self.assertEqual(user, self.customer1)
+        self.assertEqual(user.role, "CUSTOMER")
+        self.assertEqual(account.customer_id, self.customer1.pk)
+
+    def test_shared_cache_tier(self):
+        """Check a token missing from the process cache is read from the shared one."""
+
+        # Arrange.
+        warm_token(self.token.key)
+        local_tokens.clear()
+
+        # Act, assert.
+        with self.assertNumQueries(0):
+            self.authentication.authenticate_credentials(self.token.key)
+
+    def test_login_warms_cache(self):
+        """Check logging in caches the token."""
+
+        # Act.
+        response = APIClient().post(
+            "/api/api-token-auth/",
+            {"username": "customer1@test.com", "password": "12345678&"},
+        )
+
+        # Assert.
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(local_tokens.get(response.json()["token"]))
+
+    def test_revoked_token(self):
+        """Check a deleted token stops authenticating."""
+
+        # Arrange.
+        self.assertEqual(self.client.get("/api/user_orders/").status_code, 200)
+
+        # Act.
+        self.token.delete()
+
+        # Assert.
+        self.assertEqual(self.client.get("/api/user_orders/").status_code, 401)
+
+    def test_customer_without_account(self):
+        """Check a customer without customer account gets an empty order list."""
+
+        # Arrange.
+        customer = User.objects.create(email="customer@test.com", role="CUSTOMER")
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Token " + Token.objects.create(user=customer).key
+        )
+
+        # Act.
+        response = self.client.get("/api/user_orders/")
+
+        # Assert.
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"], [])
+
+    def test_user_changes(self):
+        """Check user changes are seen, and deactivated users refused."""
+
+        # Arrange.
+        self.authentication.authenticate_credentials(self.token.key)
+
+        # Act.
+        self.customer1.first_name = "renamed"
+        self.customer1.save()
+        user, _ = self.authentication.authenticate_credentials(self.token.key)
+        self.customer1.is_active = False
+        self.customer1.save()
+
+        # Assert.
+        self.assertEqual(user.first_name, "renamed")
+        self.assertEqual(self.client.get("/api/user_orders/").status_code, 401)
+
+    def age(self, snapshot):
+        """A snapshot as cached by another process, not checked recently."""
+
+        return {**snapshot, "checked": snapshot["checked"] - settings.API_TOKEN_RECHECK_INTERVAL}
+
+    def test_deactivated_in_admin(self):
+        """Check deactivating a user in the admin revokes their token, in every process."""
+
+        # Arrange.
+        admin = User.objects.create_superuser(email="admin@test.com", password="12345678&")
+        admin_client = Client()
+        admin_client.force_login(admin)
+        self.assertEqual(self.client.get("/api/user_orders/").status_code, 200)
+        snapshot = local_tokens.get(self.token.key)
+
+        # Act.
+        response = admin_client.post(
+            reverse("admin:ventashop_user_change", args=[self.customer1.pk]),
+            {
+                "email": self.customer1.email,
+                "role": self.customer1.role,
+                "customer_capacity": self.customer1.customer_capacity,
+                "first_name": self.customer1.first_name,
+                "last_name": self.customer1.last_name,
+                "date_joined_0": "2024-01-01",
+                "date_joined_1": "00:00:00",
+            },
+        )
+        refused = self.client.get("/api/user_orders/").status_code
+        local_tokens.set(self.token.key, self.age(snapshot))
+        cache.set(_cache_key(self.token.key), self.age(snapshot))
+
+        # Assert.
+        self.assertEqual(response.status_code, 302)
+        self.customer1.refresh_from_db()
+        self.assertFalse(self.customer1.is_active)
+        self.assertEqual(refused, 401)
+        self.assertEqual(self.client.get("/api/user_orders/").status_code, 401)
+
+    def test_deactivated_by_update(self):
+        """
+        Check a user deactivated without any signal, e.g. by a queryset update,
+        is refused once their cached token is checked again.
+        """
+
+        # Arrange.
+        self.authentication.authenticate_credentials(self.token.key)
+        User.objects.filter(pk=self.customer1.pk).update(is_active=False)
+
+        # Act.
+        snapshot = self.age(local_tokens.get(self.token.key))
+        local_tokens.set(self.token.key, snapshot)
+        cache.set(_cache_key(self.token.key), snapshot)
+
+        # Assert.
+        self.assertEqual(self.client.get("/api/user_orders/").status_code, 401)
+
+    def test_cached_user_save(self):
+        """Check saving a cached user only writes its cached fields."""
+
+        # Arrange.
+        user, _ = self.authentication.authenticate_credentials(self.token.key)
+
+        # Act.
+        user.first_name = "renamed"
+        user.save()
+
+        # Assert.
+        self.customer1.refresh_from_db()
+        self.assertEqual(self.customer1.first_name, "renamed")
+        self.assertTrue(self.customer1.check_password("12345678&"))
+
+    def test_lru_bound(self):
+        """Check the least recently used entries are evicted first."""
+
+        # Arrange.
+        lru = LRUCache(maxsize=2, timeout=30)
+        lru.set("a", 1)
+        lru.set("b", 2)
+        lru.get("a")
+
+        # Act.
+        lru.set("c", 3)
+
+        # Assert.
+        self.assertEqual((lru.get("a"), lru.get("b"), lru.get("c")), (1, None, 3))
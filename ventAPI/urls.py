@@ -22,6 +22,8 @@ router.register(r'user_conversations', views.UserConversationViewSet)
 router.register(r'conversations', views.ConversationViewSet)
 router.register(r'messages', views.MessageViewSet)
 router.register(r'lineitems', views.LineItemViewSet)
+router.register(r'products', views.ProductViewSet)
+router.register(r'sync', views.SyncViewSet, basename="sync")
 
 # Wire up our API using automatic URL routing.
 # Additionally, we include login URLs for the browsable API.
@@ -3,17 +3,19 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
 
-from rest_framework import permissions
+from django.db.models import Count, Max
+
+from rest_framework import permissions, status
 from rest_framework import viewsets
-from rest_framework.authentication import (
-    TokenAuthentication,
-)
+from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
 
-# from rest_framework.response import Response
+from rest_framework.response import Response
 
 # from ventAPI.pemissions import IsEmployee
 
 from ventashop.models import (
+    ChangeLogEntry,
     CustomerAccount,
     Order,
     Comment,
@@ -21,13 +23,19 @@ from ventashop.models import (
     Message,
     Conversation,
     LineItem,
+    UnreadCounter,
 )
+from ventashop.search import search_products
+from ventAPI.authentication import CachedTokenAuthentication
+from ventAPI.conditional import ConditionalGetMixin
+from ventAPI.query_plans import QueryPlanMixin, get_query_plan
 from ventAPI.serializers import (
     UserSerializer,
     CustomerAccountSerializer,
     OrderSerializer,
     CommentSerializer,
     ConversationSerializer,
+    ConversationSummarySerializer,
     MessageSerializer,
     ProductSerializer,
     LineItemSerializer,
@@ -38,7 +46,7 @@ from ventAPI.serializers import (
 User = get_user_model()
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows users to be viewed or edited.
     -> Rather than write multiple views we're grouping together all the common behavior into classes called ViewSets.
@@ -46,8 +54,9 @@ class UserViewSet(viewsets.ModelViewSet):
 
     queryset = User.objects.all().order_by("-date_joined")
     serializer_class = UserSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = ("-date_joined", "-pk")
 
     def get_queryset(self):
         if "customer_account" in self.request.query_params:
@@ -65,29 +74,31 @@ class UserViewSet(viewsets.ModelViewSet):
         return super().get_queryset()
 
 
-class CustomerAccountViewSet(viewsets.ModelViewSet):
+class CustomerAccountViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows customer accounts to be viewed or edited.
     """
 
     queryset = CustomerAccount.objects.all()
     serializer_class = CustomerAccountSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ConditionalGetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows employee related orders to be viewed or edited.
     """
 
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
 
-class UserRelatedOrderViewSet(viewsets.ModelViewSet):
+class UserRelatedOrderViewSet(
+    ConditionalGetMixin, QueryPlanMixin, viewsets.ModelViewSet
+):
     """
     API endpoint that allows customers orders to be viewed, by customer or related employee.
     """
@@ -95,7 +106,7 @@ class UserRelatedOrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.all()
     # serializer_class = OrderSerializer
     serializer_class = WholeOrderSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
@@ -106,46 +117,73 @@ class UserRelatedOrderViewSet(viewsets.ModelViewSet):
         # Employee related order list.
         if user.role == "EMPLOYEE":
             queryset = Order.objects.all().filter(
-                customer_account__employee_reg=user.reg_number
+                customer_account__employee_reg=user.reg_number,
+                customer_account__employee_reg__isnull=False,
             )
-        # Customer related order list.
+        # Customer related order list (none, if they have no customer account).
         elif user.role == "CUSTOMER":
             queryset = Order.objects.all().filter(customer_account__customer=user)
 
         return queryset
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows comments to be viewed or edited.
     """
 
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
 
-class ConversationViewSet(viewsets.ModelViewSet):
+class ConversationConditionalGetMixin(ConditionalGetMixin):
+    """
+    Conditional GET of conversations, modified along with their messages :
+    the messages of the page's conversations only, through the
+    (conversation, date_modified) index.
+    """
+
+    def get_watermark(self, rows):
+        watermark = super().get_watermark(rows)
+        messages = Message.objects.filter(conversation_id__in=watermark["pks"]).aggregate(
+            message_count=Count("pk"), message_modified=Max("date_modified")
+        )
+        watermark["message_count"] = messages["message_count"]
+        dates = [watermark["last_modified"], messages["message_modified"]]
+        watermark["last_modified"] = max(filter(None, dates), default=None)
+
+        return watermark
+
+
+class ConversationViewSet(
+    ConversationConditionalGetMixin, QueryPlanMixin, viewsets.ModelViewSet
+):
     """
     API endpoint that allows conversations to be viewed or edited.
     """
 
     queryset = Conversation.objects.all()
     serializer_class = ConversationSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
 
-class UserConversationViewSet(viewsets.ModelViewSet):
+class UserConversationViewSet(
+    ConversationConditionalGetMixin, QueryPlanMixin, viewsets.ModelViewSet
+):
     """
     API endpoint that allows specific user conversations to be viewed or edited.
     """
 
     queryset = Conversation.objects.all()
     serializer_class = ConversationSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    # Most recent activity first, as in the inbox.
+    cursor_ordering = ("-date_modified", "-pk")
+    page_size = 20
 
     def get_queryset(self):
         """
@@ -154,50 +192,159 @@ class UserConversationViewSet(viewsets.ModelViewSet):
         """
 
         user = self.request.user
-        queryset = Conversation.objects.filter(participants=user).order_by(
-            "date_modified"
-        )
+        queryset = Conversation.objects.filter(participants=user)
 
         return queryset
 
+    @action(detail=False)
+    def unread(self, request):
+        """Unread message count per conversation, and their total, for the user."""
+
+        counts = dict(
+            UnreadCounter.objects.filter(user=request.user).values_list(
+                "conversation_id", "count"
+            )
+        )
+
+        return Response({"total": sum(counts.values()), "conversations": counts})
+
+    @action(detail=True, methods=["post"])
+    def mark_read(self, request, pk=None):
+        """Mark the conversation as read by the user."""
+
+        updated = self.get_object().mark_read(request.user)
+
+        return Response({"marked_read": updated})
+
 
-class MessageViewSet(viewsets.ModelViewSet):
+class MessageViewSet(ConditionalGetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows messages to be viewed or edited.
     """
 
     queryset = Message.objects.all()
     serializer_class = MessageSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
+    cursor_ordering = ("date_created", "pk")
+    page_size = 100
+    window_size = 20
+    max_window_size = 100
+
+    def get_int_param(self, name, default=None):
+        """Positive integer query parameter, or default if absent."""
+
+        value = self.request.query_params.get(name)
+
+        if value is None:
+            return default
+        if not value.isdigit() or int(value) == 0:
+            raise ParseError(f'"{name}" must be a positive integer.')
+
+        return int(value)
+
+    def get_queryset(self):
+        """
+        All messages, or the messages of a conversation ("conversation" query parameter).
+        For a conversation, a keyset window can be asked for :
+        "last" n messages, or "limit" messages "before" / "after" a message id.
+        """
+
+        if "conversation" not in self.request.query_params:
+            return super().get_queryset()
+
+        queryset = Message.objects.filter(
+            conversation_id=self.get_int_param("conversation")
+        ).select_related("author")
+
+        last = self.get_int_param("last")
+        before = self.get_int_param("before")
+        after = self.get_int_param("after")
+
+        if last is None and before is None and after is None:
+            return queryset
+
+        size = min(
+            last or self.get_int_param("limit", self.window_size), self.max_window_size
+        )
+
+        return queryset.window(size, before=before, after=after)
+
+    def paginate_queryset(self, queryset):
+        params = self.request.query_params
+
+        # Keyset windows are already bounded.
+        if "conversation" in params and {"last", "before", "after"} & params.keys():
+            return None
+
+        return super().paginate_queryset(queryset)
+
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        message = serializer.save(author=self.request.user)
+        # Keep the inbox sorted by most recent activity.
+        Conversation.objects.filter(pk=message.conversation_id).update(
+            date_modified=message.date_created
+        )
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(QueryPlanMixin, viewsets.ReadOnlyModelViewSet):
     """
-    API endpoint that allows products to be viewed or edited.
+    API endpoint that allows products to be viewed, and searched.
     """
 
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
+    # Queries per request, authentication with a cold cache included.
+    query_budget = 2
+    cursor_ordering = "name"
+    search_limit = 20
+    max_search_limit = 100
+
+    def get_queryset(self):
+        """
+        All products, or the best results of a full-text search ("search" query parameter),
+        the last word being a prefix for type-ahead,
+        optionally in a category ("category" slug) and up to "limit" results.
+        """
+
+        params = self.request.query_params
 
-class LineItemViewSet(viewsets.ModelViewSet):
+        if "search" not in params:
+            return super().get_queryset()
+
+        limit = params.get("limit", "")
+        limit = int(limit) if limit.isdigit() and int(limit) > 0 else self.search_limit
+
+        return search_products(params["search"], category=params.get("category"))[
+            : min(limit, self.max_search_limit)
+        ]
+
+    def paginate_queryset(self, queryset):
+        # Search results are already limited, best ranked first.
+        if "search" in self.request.query_params:
+            return None
+
+        return super().paginate_queryset(queryset)
+
+
+class LineItemViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows line items to be viewed or edited.
     """
 
     queryset = LineItem.objects.all()
     serializer_class = LineItemSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
 
-class WholeOrderViewListView(viewsets.ModelViewSet):
+class WholeOrderViewListView(
+    ConditionalGetMixin, QueryPlanMixin, viewsets.ModelViewSet
+):
     """
     API endpoint that displays all details of anorder,
     with nested relationships.
@@ -205,5 +352,112 @@ class WholeOrderViewListView(viewsets.ModelViewSet):
 
     queryset = Order.objects.all()
     serializer_class = WholeOrderSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+
+class SyncViewSet(viewsets.ViewSet):
+    """
+    API endpoint of the changes to the user's orders, comments, conversations and messages
+    since a cursor ("since" query parameter : the "cursor" of the previous response),
+    read from the change log : the cost is proportional to the number of changes.
+    Each object changed is listed once, with its current data, or as deleted (tombstone).
+    "more" tells there are more changes to fetch from the new cursor.
+
+    A client without a cursor (first sync), or whose cursor is older than the pruned
+    change log (410 response), resyncs fully :
+    1. GET sync/head/ (or read the 410 response) : the "cursor" of the log head,
+    2. load the objects from the list endpoints (user_orders, user_conversations,
+       messages), objects older than the change log included,
+    3. GET sync/?since=<cursor> from then on : changes made meanwhile are sent again.
+    """
+
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+
+    serializer_classes = {
+        "order": OrderSerializer,
+        "comment": CommentSerializer,
+        "conversation": ConversationSummarySerializer,
+        "message": MessageSerializer,
+    }
+    limit = 500
+
+    def list(self, request):
+        since = request.query_params.get("since", "0")
+        if not since.isdigit():
+            raise ParseError('"since" must be a change log cursor.')
+        since = int(since)
+
+        if since < ChangeLogEntry.objects.pruned_up_to():
+            return Response(
+                {
+                    "detail": "Changes since this cursor were pruned, resync.",
+                    "cursor": ChangeLogEntry.objects.head(),
+                },
+                status=status.HTTP_410_GONE,
+            )
+
+        entries = list(
+            ChangeLogEntry.objects.visible_to(request.user)
+            .filter(pk__gt=since)
+            .order_by("pk")[: self.limit + 1]
+        )
+        more = len(entries) > self.limit
+        entries = entries[: self.limit]
+
+        # Last change of each object, in the order of the log.
+        latest = {}
+        for entry in entries:
+            latest.pop((entry.model, entry.object_id), None)
+            latest[(entry.model, entry.object_id)] = entry
+
+        data = self.get_data(latest)
+
+        return Response(
+            {
+                "changes": [
+                    {
+                        "model": model,
+                        "id": pk,
+                        "action": entry.get_action_display()
+                        if (model, pk) in data
+                        else "deleted",
+                        "data": data.get((model, pk)),
+                    }
+                    for (model, pk), entry in latest.items()
+                ],
+                "cursor": entries[-1].pk if entries else since,
+                "more": more,
+            }
+        )
+
+    @action(detail=False)
+    def head(self, request):
+        """Cursor of the change log head, to sync from after a full resync."""
+
+        return Response({"cursor": ChangeLogEntry.objects.head()})
+
+    def get_data(self, latest):
+        """Current data of the objects changed and not deleted, one query per model."""
+
+        data = {}
+
+        for model, serializer_class in self.serializer_classes.items():
+            pks = [
+                pk
+                for (entry_model, pk), entry in latest.items()
+                if entry_model == model and entry.action != ChangeLogEntry.DELETED
+            ]
+            if not pks:
+                continue
+
+            queryset = ChangeLogEntry.MODELS[model]._default_manager.filter(
+                pk__in=pks
+            )
+            for instance in get_query_plan(serializer_class).apply(queryset):
+                data[(model, instance.pk)] = serializer_class(
+                    instance, context={"request": self.request}
+                ).data
+
+        return data
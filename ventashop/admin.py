@@ -1,7 +1,12 @@
 from django.contrib import admin
+from django.contrib.admin import helpers
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
+from django.shortcuts import render
 from django.utils.translation import gettext_lazy as _
 
+from .forms import RepriceForm
+from .pricing import reprice_products
+
 from .models import (
                     Category,
                     Product,
@@ -26,6 +31,41 @@ admin.site.register(Category, CategoryAdmin)
 
 class ProductAdmin(admin.ModelAdmin):
     fields = ["name", "date_created", "description", "price", "category"]
+    list_display = ["name", "price", "category", "date_created"]
+    list_filter = ["category", "date_created"]
+    actions = ["reprice"]
+
+    @admin.action(description="Modifier le prix des produits sélectionnés")
+    def reprice(self, request, queryset):
+        """Ask for a percentage, then reprice products and open carts set-based."""
+
+        if "apply" in request.POST:
+            form = RepriceForm(request.POST)
+            if form.is_valid():
+                ratio = 1 + form.cleaned_data["percent"] / 100
+                reports = list(reprice_products(queryset, ratio))
+                self.message_user(
+                    request,
+                    f"{sum(r['products'] for r in reports)} produit(s) et "
+                    f"{sum(r['carts'] for r in reports)} panier(s) mis à jour "
+                    f"en {sum(r['elapsed'] for r in reports):.3f} s.",
+                )
+                return None
+        else:
+            form = RepriceForm()
+
+        return render(
+            request,
+            "admin/ventashop/product/reprice.html",
+            {
+                **self.admin_site.each_context(request),
+                "title": "Modifier le prix des produits",
+                "opts": self.model._meta,
+                "products": queryset,
+                "form": form,
+                "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+            },
+        )
 
 
 admin.site.register(Product, ProductAdmin)
@@ -85,7 +125,7 @@ class UserAdmin(DjangoUserAdmin):
     """Define admin model for custom User model with no email field."""
 
     fieldsets = (
-        (None, {'fields': ('email', 'password', 'role')}),
+        (None, {'fields': ('email', 'password', 'role', 'customer_capacity')}),
         (_('Personal info'), {'fields': ('first_name', 'last_name')}),
         (_('Permissions'), {'fields': ('is_active', 'is_staff', 'is_superuser',
                                        'groups', 'user_permissions')}),
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class VentashopConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ventashop'
+
+    def ready(self):
+        from ventashop import signals  # noqa: F401
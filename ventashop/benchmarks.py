@@ -0,0 +1,340 @@
+"""
+Our benchmark module : the shop's hot paths, measured on seeded datasets.
+
+A scenario is a generator function of a Dataset : the code before its single yield
+prepares the run (not measured), the code after it is measured. Each run happens
+in a savepoint rolled back afterwards, so runs don't pile data up.
+
+A report (see run_benchmarks) maps dataset sizes to the scenarios' measures :
+median and fastest wall time, query count and peak memory, and can be compared
+with a report of another commit (see compare_reports).
+"""
+
+import platform
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from ventashop.forms import UserForm
+from ventashop.models import Conversation, CustomerAccount, Order, Product, User
+
+REPORT_VERSION = 1
+
+SCENARIOS = {}
+
+
+class BenchmarkError(Exception):
+    """A scenario didn't run as expected (e.g. an error response)."""
+
+
+def scenario(name):
+    """Register a scenario under name."""
+
+    def register(function):
+        SCENARIOS[name] = function
+        return function
+
+    return register
+
+
+def dataset_options(size):
+    """seed_ventalis options of a dataset of size orders."""
+
+    customers = max(size // 10, 10)
+
+    return {
+        "employees": max(customers // 100, 2),
+        "customers": customers,
+        "categories": 10,
+        "products": max(size // 40, 20),
+        "orders": size,
+        "messages": size * 5 // 2,
+    }
+
+
+class Dataset:
+    """
+    A seeded dataset, and the objects scenarios work on : the customer with the
+    most orders, their employee and conversation, and logged in clients.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.options = dataset_options(size)
+
+    def seed(self, seed, force=False):
+        call_command("seed_ventalis", seed=seed, force=force, stdout=StringIO(), **self.options)
+
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+        account = (
+            CustomerAccount.objects.annotate(orders=Count("order"))
+            .select_related("customer")
+            .order_by("-orders", "pk")
+            .first()
+        )
+        self.customer = account.customer
+        self.cart = account.cart
+        self.employee = User.objects.get(reg_number=account.employee_reg)
+        self.conversation = Conversation.objects.filter(participants=self.customer).get()
+        self.order = Order.objects.filter(customer_account=account).latest("date_created")
+        self.products = list(Product.objects.order_by("pk")[:5])
+
+        self.customer_client = Client(HTTP_HOST="localhost")
+        self.customer_client.force_login(self.customer)
+        self.employee_client = Client(HTTP_HOST="localhost")
+        self.employee_client.force_login(self.employee)
+
+        token, _ = Token.objects.get_or_create(user=self.employee)
+        self.api_client = APIClient(HTTP_HOST="localhost")
+        self.api_client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+
+
+def check(response):
+    """Raise BenchmarkError if response is not a success."""
+
+    if response.status_code != 200:
+        raise BenchmarkError(f"{response.request['PATH_INFO']} : {response.status_code}")
+
+
+#####################
+##### SCENARIOS #####
+#####################
+
+
+@scenario("cart.add_line_item")
+def cart_add_line_item(data):
+    yield
+    data.cart.add_line_item(data.products[0], 1000)
+
+
+@scenario("cart.make_order")
+def cart_make_order(data):
+    for product in data.products[:3]:
+        data.cart.add_line_item(product, 1000)
+    yield
+    data.cart.make_order()
+
+
+@scenario("order.save")
+def order_save(data):
+    order = Order.objects.get(pk=data.order.pk)
+    order.status = Order.EXPEDIEE
+    yield
+    order.save()
+
+
+@scenario("user_form.create_user")
+def user_form_create_user(data):
+    form = UserForm(
+        {
+            "email": "benchmark@ventalis.test",
+            "password": "Benchmark1&",
+            "first_name": "Bench",
+            "last_name": "Mark",
+            "company": "Benchmark",
+        }
+    )
+    if not form.is_valid():
+        raise BenchmarkError(form.errors.as_text())
+    yield
+    form.create_user("CUSTOMER")
+
+
+@scenario("view.messages")
+def view_messages(data):
+    url = reverse("ventashop:messages", args=[data.conversation.pk])
+    yield
+    check(data.customer_client.get(url))
+
+
+@scenario("view.conversations")
+def view_conversations(data):
+    url = reverse("ventashop:conversations")
+    yield
+    check(data.employee_client.get(url))
+
+
+@scenario("view.products")
+def view_products(data):
+    url = reverse("ventashop:products-all")
+    yield
+    check(data.customer_client.get(url))
+
+
+def api_scenario(name, path, params=lambda data: {}):
+    @scenario(f"api.{name}")
+    def api_list(data):
+        query = params(data)
+        yield
+        check(data.api_client.get(path, query))
+
+    return api_list
+
+
+api_scenario("users", "/api/users/")
+api_scenario("customeraccounts", "/api/customeraccounts/")
+api_scenario("orders", "/api/orders/")
+api_scenario("user_orders", "/api/user_orders/")
+api_scenario("conversations", "/api/conversations/")
+api_scenario("user_conversations", "/api/user_conversations/")
+api_scenario(
+    "messages", "/api/messages/", lambda data: {"conversation": data.conversation.pk}
+)
+api_scenario("products", "/api/products/")
+
+
+#######################
+##### MEASUREMENT #####
+#######################
+
+
+@contextmanager
+def rolled_back():
+    """A savepoint, rolled back on exit."""
+
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def run_once(function, data, trace_memory=False):
+    """
+    Run a scenario once, return its wall time (ms), query count,
+    and peak memory (KiB, if traced : tracing slows code down).
+    """
+
+    queries = 0
+
+    def count_query(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    with rolled_back():
+        run = function(data)
+        next(run)
+
+        if trace_memory:
+            tracemalloc.start()
+        with connection.execute_wrapper(count_query):
+            start = time.perf_counter()
+            for _ in run:
+                raise BenchmarkError("A scenario yields once.")
+            elapsed = (time.perf_counter() - start) * 1000
+        peak = None
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+
+    return elapsed, queries, peak
+
+
+def measure(function, data, repeat):
+    """
+    Measures of a scenario over repeat runs, after a first one warming caches up,
+    and a last one tracing memory.
+    """
+
+    run_once(function, data)
+    runs = [run_once(function, data) for _ in range(repeat)]
+    _, _, peak = run_once(function, data, trace_memory=True)
+
+    timings = [elapsed for elapsed, _, _ in runs]
+
+    return {
+        "wall_ms": round(statistics.median(timings), 3),
+        "wall_ms_min": round(min(timings), 3),
+        "queries": max(queries for _, queries, _ in runs),
+        "peak_kib": round(peak, 1),
+    }
+
+
+def run_benchmarks(sizes, repeat=5, names=None, seed=42, label="", log=None, force=False):
+    """
+    Report of the scenarios named names (all by default), on a dataset of each size
+    (in orders), seeded then rolled back. Seeding with DEBUG off needs force.
+    """
+
+    names = names or list(SCENARIOS)
+    report = {
+        "version": REPORT_VERSION,
+        "label": label,
+        "date": timezone.now().isoformat(),
+        "python": platform.python_version(),
+        "database": connection.vendor,
+        "repeat": repeat,
+        "sizes": {},
+    }
+
+    for size in sizes:
+        with rolled_back():
+            data = Dataset(size)
+            data.seed(seed, force=force)
+
+            results = {}
+            for name in names:
+                results[name] = measure(SCENARIOS[name], data, repeat)
+                if log:
+                    log(size, name, results[name])
+
+        report["sizes"][str(size)] = {"dataset": data.options, "scenarios": results}
+
+    return report
+
+
+def compare_reports(
+    baseline, report, time_threshold=0.2, min_ms=1.0, query_threshold=0, memory_threshold=0.25
+):
+    """
+    Regressions of report from baseline, for the sizes and scenarios of both :
+    - a median wall time more than time_threshold (ratio) and min_ms slower,
+    - more than query_threshold extra queries,
+    - a peak memory more than memory_threshold (ratio) higher.
+
+    Returns:
+        regressions (list): (size, scenario, description) tuples.
+    """
+
+    regressions = []
+
+    for size, measured in report["sizes"].items():
+        reference = baseline["sizes"].get(size)
+        if reference is None:
+            continue
+
+        for name, new in measured["scenarios"].items():
+            old = reference["scenarios"].get(name)
+            if old is None:
+                continue
+
+            if (
+                new["wall_ms"] > old["wall_ms"] * (1 + time_threshold)
+                and new["wall_ms"] - old["wall_ms"] > min_ms
+            ):
+                regressions.append(
+                    (size, name, f"wall time {old['wall_ms']} -> {new['wall_ms']} ms")
+                )
+            if new["queries"] > old["queries"] + query_threshold:
+                regressions.append(
+                    (size, name, f"queries {old['queries']} -> {new['queries']}")
+                )
+            if new["peak_kib"] > old["peak_kib"] * (1 + memory_threshold):
+                regressions.append(
+                    (size, name, f"peak memory {old['peak_kib']} -> {new['peak_kib']} KiB")
+                )
+
+    return regressions
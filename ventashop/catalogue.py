@@ -0,0 +1,69 @@
+"""
+Our catalogue cache module : rendered catalogue pages, for anonymous users.
+
+Cache keys embed a catalogue version, bumped whenever products or categories change
+(see signals.py, and pricing.py for set-based updates) : stale pages are never read
+again, and expire on their own.
+The version is kept in the database, so that a bump outdates the pages cached by every
+process at once, whatever the cache backend (per process by default, see settings.py).
+"""
+
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from ventashop.models import Sequence
+
+CATALOGUE_VERSION_SEQUENCE = "catalogue_version"
+
+# The query parameters the catalogue views use, see views.CatalogueMixin.
+CATALOGUE_PARAMS = ("after", "format", "q")
+
+
+def catalogue_version():
+    """The current catalogue version, read from the database : once per request."""
+
+    # First use, or a database restored : start from the clock, so no older page is ever matched.
+    sequence, _ = Sequence.objects.get_or_create(
+        name=CATALOGUE_VERSION_SEQUENCE, defaults={"last_value": time.time_ns()}
+    )
+
+    return sequence.last_value
+
+
+def bump_catalogue_version():
+    """Invalidate all cached catalogue pages."""
+
+    # No version yet : no page cached under the next one either.
+    Sequence.objects.filter(name=CATALOGUE_VERSION_SEQUENCE).update(
+        last_value=F("last_value") + 1
+    )
+
+
+def catalogue_cache_key(path, params):
+    """
+    Cache key of a rendered catalogue page, from its path and query parameters.
+    Only the parameters the views use are kept (others would only multiply keys),
+    and hashed, to keep keys short whatever the search.
+    """
+
+    query = urlencode([(name, params[name]) for name in CATALOGUE_PARAMS if name in params])
+    digest = hashlib.sha256(f"{path}?{query}".encode()).hexdigest()
+
+    return f"catalogue:{catalogue_version()}:{digest}"
+
+
+def get_catalogue_page(key):
+    """A rendered catalogue page, or None."""
+
+    return cache.get(key)
+
+
+def set_catalogue_page(key, content):
+    """Cache a rendered catalogue page."""
+
+    cache.set(key, content, timeout=getattr(settings, "CATALOGUE_CACHE_TIMEOUT", 300))
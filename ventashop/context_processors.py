@@ -0,0 +1,17 @@
+"""Our template context processors module."""
+
+from ventashop.models import UnreadCounter
+
+
+def unread_messages(request):
+    """
+    The user's unread message total, for the header badge.
+    Lazy : only queried if a template displays it.
+    """
+
+    user = getattr(request, "user", None)
+
+    if user is None or not user.is_authenticated:
+        return {}
+
+    return {"unread_messages_count": lambda: UnreadCounter.objects.total_for(user)}
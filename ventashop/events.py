@@ -0,0 +1,191 @@
+"""
+Our conversation events module : new messages pushed to connected participants.
+
+A broker fans events out to subscriptions, one bounded asyncio queue per connected
+client, so an idle connection costs a coroutine and a queue, no thread.
+The broker class is set with the VENTALIS_MESSAGE_BROKER setting :
+- InProcessBroker (default) : events published and consumed in the same process.
+- PostgresBroker : events shared by all the processes / workers, with LISTEN / NOTIFY.
+"""
+
+import asyncio
+import functools
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils.module_loading import import_string
+
+
+def message_event(message):
+    """The event pushed for a new message."""
+
+    return {
+        "id": message.pk,
+        "author": message.author.email,
+        "content": message.content,
+        "date_created": message.date_created.isoformat(),
+    }
+
+
+class Subscription:
+    """A client's queue of events, for one conversation."""
+
+    __slots__ = ("loop", "queue", "overflowed")
+
+    def __init__(self, loop, size):
+        self.loop = loop
+        self.queue = asyncio.Queue(size)
+        self.overflowed = False
+
+    def put(self, event):
+        """Queue event, called in the subscription's event loop."""
+
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow client : its stream ends once drained, and it catches up on reconnection.
+            self.overflowed = True
+
+
+class InProcessBroker:
+    """Fan events out to the subscriptions of this process."""
+
+    queue_size = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def subscribe(self, conversation_id):
+        """A new subscription to a conversation's events, from a running event loop."""
+
+        subscription = Subscription(asyncio.get_running_loop(), self.queue_size)
+
+        with self._lock:
+            self._subscriptions.setdefault(conversation_id, set()).add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, conversation_id, subscription):
+        """Remove a subscription."""
+
+        with self._lock:
+            subscriptions = self._subscriptions.get(conversation_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(conversation_id, None)
+
+    def subscription_count(self):
+        """Subscriptions of this process, all conversations together."""
+
+        with self._lock:
+            return sum(len(s) for s in self._subscriptions.values())
+
+    def fan_out(self, conversation_id, event):
+        """Queue event for the conversation's subscriptions, from any thread."""
+
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(conversation_id, ()))
+
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # Event loop closed.
+                self.unsubscribe(conversation_id, subscription)
+
+    def publish(self, conversation_id, event):
+        """Publish an event for a conversation."""
+
+        self.fan_out(conversation_id, event)
+
+
+class PostgresBroker(InProcessBroker):
+    """
+    Share events between processes with Postgres LISTEN / NOTIFY.
+    Only message ids go through the channel (payloads are limited to 8000 bytes) :
+    each process loads the message once, in its listener thread,
+    then fans the event out to its own subscriptions.
+    """
+
+    channel = "ventalis_messages"
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def subscribe(self, conversation_id):
+        """A new subscription, the listener thread being started if needed."""
+
+        self._start_listener()
+
+        return super().subscribe(conversation_id)
+
+    def publish(self, conversation_id, event):
+        """Notify all processes, the current one included."""
+
+        payload = json.dumps({"conversation": conversation_id, "message": event["id"]})
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, payload])
+
+    def _start_listener(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen, name="ventalis-message-listener", daemon=True
+                )
+                self._listener.start()
+
+    def _listen(self):
+        import psycopg
+
+        while True:
+            try:
+                with psycopg.connect(
+                    **connection.get_connection_params(), autocommit=True
+                ) as listen_connection:
+                    listen_connection.execute(f"LISTEN {self.channel}")
+                    for notify in listen_connection.notifies():
+                        self._dispatch(json.loads(notify.payload))
+            except Exception:
+                # Connection lost : listen again after a pause.
+                time.sleep(1)
+
+    def _dispatch(self, notification):
+        from ventashop.models import Message
+
+        with self._lock:
+            if notification["conversation"] not in self._subscriptions:
+                return
+
+        close_old_connections()
+        message = (
+            Message.objects.select_related("author")
+            .filter(pk=notification["message"])
+            .first()
+        )
+        if message is not None:
+            self.fan_out(notification["conversation"], message_event(message))
+
+
+@functools.lru_cache(maxsize=None)
+def get_broker():
+    """The broker of this process."""
+
+    path = getattr(settings, "VENTALIS_MESSAGE_BROKER", "ventashop.events.InProcessBroker")
+
+    return import_string(path)()
+
+
+def publish_message(message):
+    """Push a new message to the conversation's participants, once committed."""
+
+    event = message_event(message)
+
+    transaction.on_commit(
+        lambda: get_broker().publish(message.conversation_id, event), robust=True
+    )
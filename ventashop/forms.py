@@ -8,10 +8,9 @@ from django.contrib.auth.hashers import make_password
 from django.core.mail import send_mail
 from django.forms import ModelForm
 
-from ventashop.models import Category, User, Cart, CustomerAccount
+from ventashop.models import Category, User, Cart, CustomerAccount, RegNumberSlot
 from ventasite.settings import VENTALIS_EMAIL
 from ventashop.utils import (
-    unique_reg_number_generator,
     contains_min_one_upper,
     contains_min_one_lower,
     min_length_8,
@@ -70,6 +69,18 @@ class ContactForm(forms.Form):
         )
 
 
+class RepriceForm(forms.Form):
+    """Our product repricing form, for the product admin action."""
+
+    percent = forms.DecimalField(
+        label="Variation de prix (%)",
+        max_digits=5,
+        decimal_places=2,
+        min_value=-99.99,
+        help_text="Par exemple -40 pour une remise de 40 %.",
+    )
+
+
 class LoginForm(forms.Form):
     email = forms.EmailField()
     password = forms.CharField(max_length=100, widget=forms.PasswordInput)
@@ -148,7 +159,7 @@ class UserForm(forms.ModelForm):
         if created:
             if role == "EMPLOYEE":
                 # Creation of a unique registration number
-                user.reg_number = unique_reg_number_generator(user)
+                user.reg_number = RegNumberSlot.objects.allocate(user)
                 user.company = "Ventalis"
                 user.save()
 
@@ -0,0 +1,149 @@
+"""
+Our product image module : derivatives (resized JPEG and WebP variants) of uploads.
+
+Variants are generated after commit in a worker pool, so uploads don't wait for them,
+and recorded in Product.variants. Their names derive from the original image name,
+so they are deleted along with it (see signals.py, with django_cleanup).
+"""
+
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from ventashop.storage import DERIVED_DIR
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = (320, 640, 1280)
+VARIANT_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+VARIANTS_DIR = DERIVED_DIR
+
+_executor = None
+
+
+def variant_name(image_name, width, extension):
+    """Storage name of an image variant."""
+
+    stem, _ = os.path.splitext(image_name)
+
+    return f"{VARIANTS_DIR}/{stem}-{width}w.{extension}"
+
+
+def delete_variants(image_name, storage):
+    """Delete all the possible variants of an image, in its storage."""
+
+    for width in VARIANT_WIDTHS:
+        for extension in VARIANT_FORMATS:
+            name = variant_name(image_name, width, extension)
+            if storage.exists(name):
+                storage.delete(name)
+
+
+def build_variants(image_name, storage):
+    """
+    Resize an image to each variant width smaller than the original (or the smallest one),
+    in each variant format, saved in the image's storage.
+
+    Returns:
+        variants (dict): original image name, and the list of variants.
+    """
+
+    with storage.open(image_name) as image_file:
+        image = ImageOps.exif_transpose(Image.open(image_file))
+        image.load()
+
+    widths = [w for w in VARIANT_WIDTHS if w < image.width] or [min(VARIANT_WIDTHS)]
+    images = []
+
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+
+        for extension, image_format in VARIANT_FORMATS.items():
+            content = io.BytesIO()
+            converted = resized.convert("RGB") if image_format == "JPEG" else resized
+            converted.save(content, image_format, quality=80, optimize=True)
+
+            name = variant_name(image_name, width, extension)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(content.getvalue()))
+
+            images.append({"width": width, "format": extension, "name": name})
+
+    return {"source": image_name, "images": images}
+
+
+def generate_product_variants(product_id):
+    """Build and record the variants of a product's image, if still the current one."""
+
+    from ventashop.models import Product
+
+    image_name = (
+        Product.objects.filter(pk=product_id).values_list("image", flat=True).first()
+    )
+    if not image_name:
+        return
+
+    storage = Product._meta.get_field("image").storage
+
+    # The same image may be shared with other products (see storage.py).
+    variants = (
+        Product.objects.filter(image=image_name, variants__source=image_name)
+        .values_list("variants", flat=True)
+        .first()
+    ) or build_variants(image_name, storage)
+
+    # Only if the image wasn't replaced meanwhile, its variants being deleted
+    # unless another product uses it.
+    updated = Product.objects.filter(pk=product_id, image=image_name).update(
+        variants=variants
+    )
+    if not updated and not Product.objects.filter(image=image_name).exists():
+        delete_variants(image_name, storage)
+
+
+def _generate_in_worker(product_id):
+    close_old_connections()
+
+    try:
+        generate_product_variants(product_id)
+    except Exception:
+        logger.exception("Variants of product %s image failed.", product_id)
+    finally:
+        close_old_connections()
+
+
+def get_executor():
+    """The worker pool of this process."""
+
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "PRODUCT_IMAGE_WORKERS", 2),
+            thread_name_prefix="product-image",
+        )
+
+    return _executor
+
+
+def schedule_product_variants(product_id):
+    """
+    Generate a product's image variants once committed, in the worker pool,
+    or right away if PRODUCT_IMAGE_WORKERS is 0.
+    """
+
+    def submit():
+        if getattr(settings, "PRODUCT_IMAGE_WORKERS", 2):
+            get_executor().submit(_generate_in_worker, product_id)
+        else:
+            generate_product_variants(product_id)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,130 @@
+"""Our benchmark command for the shop's hot paths, with a JSON report."""
+
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ventashop.benchmarks import SCENARIOS, BenchmarkError, compare_reports, run_benchmarks
+
+
+def int_list(value):
+    return [int(size) for size in value.split(",")]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure wall time, query count and peak memory of the shop's hot paths "
+        "(cart, orders, sign in, message and product views, API lists) on seeded "
+        "datasets of increasing size, rolled back afterwards. Write a JSON report, "
+        "and compare it with a baseline report against regression thresholds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int_list,
+            default=[2000, 20000],
+            help="Comma separated dataset sizes, in orders.",
+        )
+        parser.add_argument("--repeat", type=int, default=5, help="Measured runs.")
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            choices=sorted(SCENARIOS),
+            help="Scenario to run (repeatable), all by default.",
+        )
+        parser.add_argument("--seed", type=int, default=42, help="Random seed.")
+        parser.add_argument("--label", default="", help="Report label, e.g. a commit.")
+        parser.add_argument("--output", help="Path of the JSON report to write.")
+        parser.add_argument(
+            "--report",
+            help="Compare this existing report instead of running the benchmarks.",
+        )
+        parser.add_argument("--baseline", help="Path of a JSON report to compare with.")
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Seed even though DEBUG is off (e.g. a staging database).",
+        )
+        parser.add_argument(
+            "--time-threshold",
+            type=float,
+            default=0.2,
+            help="Tolerated wall time increase, as a ratio.",
+        )
+        parser.add_argument(
+            "--min-ms",
+            type=float,
+            default=1.0,
+            help="Tolerated wall time increase, in milliseconds (noise floor).",
+        )
+        parser.add_argument(
+            "--query-threshold",
+            type=int,
+            default=0,
+            help="Tolerated extra queries.",
+        )
+        parser.add_argument(
+            "--memory-threshold",
+            type=float,
+            default=0.25,
+            help="Tolerated peak memory increase, as a ratio.",
+        )
+
+    def handle(self, *args, **options):
+        if options["report"]:
+            report = self.load(options["report"])
+        else:
+            if not settings.DEBUG and not options["force"]:
+                raise CommandError("DEBUG is off : run again with --force to seed anyway.")
+            try:
+                report = run_benchmarks(
+                    options["sizes"],
+                    repeat=options["repeat"],
+                    names=options["scenario"],
+                    seed=options["seed"],
+                    label=options["label"],
+                    log=self.log,
+                    force=options["force"],
+                )
+            except BenchmarkError as e:
+                raise CommandError(f"Benchmark failed : {e}")
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['output']}.")
+
+        if not options["baseline"]:
+            return
+
+        regressions = compare_reports(
+            self.load(options["baseline"]),
+            report,
+            time_threshold=options["time_threshold"],
+            min_ms=options["min_ms"],
+            query_threshold=options["query_threshold"],
+            memory_threshold=options["memory_threshold"],
+        )
+        for size, name, description in regressions:
+            self.stdout.write(f"{size} orders, {name} : {description}")
+
+        if regressions:
+            raise CommandError(f"{len(regressions)} regression(s) found.")
+
+        self.stdout.write(self.style.SUCCESS("No regression."))
+
+    def load(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Can't read report {path} : {e}")
+
+    def log(self, size, name, measures):
+        self.stdout.write(
+            f"{size} orders, {name} : {measures['wall_ms']} ms "
+            f"(min {measures['wall_ms_min']}), {measures['queries']} queries, "
+            f"{measures['peak_kib']} KiB"
+        )
@@ -0,0 +1,55 @@
+"""Our throughput benchmark for the order reference number allocator."""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from ventashop.models import Sequence
+from ventashop.utils import BlockAllocator, encode_ref_number
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure how many order reference numbers per second the allocator hands out, "
+        "and how many queries it needs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count", type=int, default=100000, help="Number of allocations."
+        )
+        parser.add_argument(
+            "--block-size",
+            type=int,
+            default=100,
+            help="Numbers reserved in the database at once.",
+        )
+        parser.add_argument(
+            "--sequence",
+            default="benchmark_ref_number",
+            help="Sequence used by the benchmark, distinct from the orders' one.",
+        )
+
+    def handle(self, *args, **options):
+        allocator = BlockAllocator(
+            reserve=lambda size: Sequence.objects.reserve(options["sequence"], size),
+            block_size=options["block_size"],
+        )
+        count = options["count"]
+        ref_numbers = set()
+
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(count):
+                ref_numbers.add(encode_ref_number(allocator.allocate()))
+            elapsed = time.perf_counter() - start
+
+        self.stdout.write(f"Allocations : {count}")
+        self.stdout.write(f"Duplicates : {count - len(ref_numbers)}")
+        self.stdout.write(f"Elapsed : {elapsed:.3f} s")
+        self.stdout.write(f"Throughput : {count / elapsed:.0f} ref numbers / s")
+        self.stdout.write(
+            f"Queries : {len(queries)} ({len(queries) / count:.4f} per allocation)"
+        )
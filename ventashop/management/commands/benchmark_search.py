@@ -0,0 +1,127 @@
+"""Our latency benchmark for the product search, over a synthetic catalogue."""
+
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils.text import slugify
+
+from ventashop.models import Category, Product
+from ventashop.search import search_products
+
+NOUNS = [
+    "chaise", "table", "bureau", "lampe", "armoire", "étagère", "tabouret", "canapé",
+    "fauteuil", "commode", "miroir", "tapis", "coussin", "rideau", "vase", "horloge",
+    "carton", "palette", "caisse", "gobelet", "assiette", "serviette", "stylo", "cahier",
+    "classeur", "enveloppe", "badge", "casquette", "tasse", "sac",
+]
+ADJECTIVES = [
+    "rouge", "bleu", "vert", "noir", "blanc", "recyclé", "pliant", "robuste", "léger",
+    "compact", "ergonomique", "personnalisé", "imprimé", "brodé", "biodégradable",
+    "isotherme", "réutilisable", "premium", "économique", "artisanal",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the latency of product searches (full words, prefixes, by category) "
+        "over a synthetic catalogue, rolled back afterwards, against a p95 target."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--products", type=int, default=100000, help="Synthetic catalogue size."
+        )
+        parser.add_argument(
+            "--queries", type=int, default=200, help="Searches measured per kind."
+        )
+        parser.add_argument(
+            "--target-ms",
+            type=float,
+            default=50,
+            help="Maximum p95 latency per kind of search, in milliseconds.",
+        )
+        parser.add_argument("--seed", type=int, default=42, help="Random seed.")
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the synthetic catalogue instead of rolling it back.",
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+
+        with transaction.atomic():
+            categories = self.create_catalogue(rng, options["products"])
+
+            kinds = {
+                "word": lambda: (rng.choice(NOUNS), None),
+                "prefix": lambda: (rng.choice(NOUNS)[: rng.randint(3, 5)], None),
+                "two words": lambda: (f"{rng.choice(NOUNS)} {rng.choice(ADJECTIVES)}", None),
+                "category": lambda: (rng.choice(NOUNS), rng.choice(categories).slug),
+            }
+
+            failed = []
+            for kind, make_search in kinds.items():
+                timings = []
+                for _ in range(options["queries"]):
+                    query, category = make_search()
+                    start = time.perf_counter()
+                    list(search_products(query, category=category)[:20])
+                    timings.append((time.perf_counter() - start) * 1000)
+
+                p95 = statistics.quantiles(timings, n=20)[-1]
+                self.stdout.write(
+                    f"{kind} : p50 {statistics.median(timings):.1f} ms, "
+                    f"p95 {p95:.1f} ms, max {max(timings):.1f} ms"
+                )
+                if p95 > options["target_ms"]:
+                    failed.append(kind)
+
+            if not options["keep"]:
+                transaction.set_rollback(True)
+
+        if failed:
+            raise CommandError(
+                f"p95 above {options['target_ms']} ms for : {', '.join(failed)}."
+            )
+
+        self.stdout.write(self.style.SUCCESS("All searches within target."))
+
+    def create_catalogue(self, rng, size):
+        """Synthetic categories and products, with statistics up to date."""
+
+        start = time.perf_counter()
+
+        categories = Category.objects.bulk_create(
+            [Category(name=f"Benchmark {i}", slug=f"benchmark-{i}") for i in range(20)]
+        )
+
+        batch = []
+        for i in range(size):
+            name = f"{rng.choice(NOUNS)} {rng.choice(ADJECTIVES)} {i:06d}"
+            batch.append(
+                Product(
+                    name=name,
+                    slug=slugify(name),
+                    description=" ".join(rng.choices(NOUNS + ADJECTIVES, k=12)),
+                    price=rng.randint(1, 5000) / 100,
+                    category=rng.choice(categories),
+                )
+            )
+            if len(batch) == 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
+
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE ventashop_product")
+
+        self.stdout.write(
+            f"Catalogue : {size} products created in {time.perf_counter() - start:.1f} s"
+        )
+
+        return categories
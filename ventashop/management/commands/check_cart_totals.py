@@ -0,0 +1,44 @@
+"""Our command checking carts' total prices against their line items."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ventashop.models import Cart
+
+
+class Command(BaseCommand):
+    help = (
+        "Detect carts whose total price drifted from the sum of their line items, "
+        "and repair them with --repair."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repair",
+            action="store_true",
+            help="Recalculate the total price of drifted carts.",
+        )
+
+    def handle(self, *args, **options):
+        drifted = Cart.objects.drifted().values_list(
+            "pk", "total_price", "line_items_total"
+        )
+
+        count = 0
+        for pk, total_price, line_items_total in drifted.iterator():
+            count += 1
+            self.stdout.write(
+                f"Cart {pk} : total price is {total_price}, "
+                f"line items sum up to {line_items_total}."
+            )
+
+        if count == 0:
+            self.stdout.write(self.style.SUCCESS("No drifted cart total."))
+            return
+
+        if not options["repair"]:
+            raise CommandError(
+                f"{count} drifted cart total(s) found, run again with --repair."
+            )
+
+        repaired = Cart.objects.drifted().recalculate_totals()
+        self.stdout.write(self.style.SUCCESS(f"{repaired} cart total(s) repaired."))
@@ -0,0 +1,44 @@
+"""Our command checking unread counters against the unread messages they count."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ventashop.models import UnreadCounter
+
+
+class Command(BaseCommand):
+    help = (
+        "Detect unread counters whose count drifted from the number of unread messages "
+        "of the other participants, and repair them with --repair."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repair",
+            action="store_true",
+            help="Recount drifted unread counters.",
+        )
+
+    def handle(self, *args, **options):
+        drifted = UnreadCounter.objects.drifted().values_list(
+            "pk", "user_id", "conversation_id", "count", "unread_messages"
+        )
+
+        count = 0
+        for pk, user_id, conversation_id, counted, unread_messages in drifted.iterator():
+            count += 1
+            self.stdout.write(
+                f"Unread counter {pk} (user {user_id}, conversation {conversation_id}) : "
+                f"count is {counted}, {unread_messages} message(s) are unread."
+            )
+
+        if count == 0:
+            self.stdout.write(self.style.SUCCESS("No drifted unread counter."))
+            return
+
+        if not options["repair"]:
+            raise CommandError(
+                f"{count} drifted unread counter(s) found, run again with --repair."
+            )
+
+        repaired = UnreadCounter.objects.drifted().recalculate()
+        self.stdout.write(self.style.SUCCESS(f"{repaired} unread counter(s) repaired."))
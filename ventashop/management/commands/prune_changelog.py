@@ -0,0 +1,30 @@
+"""Our command pruning the change log of synchronized objects."""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ventashop.models import ChangeLogEntry
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete change log entries older than --days days. Clients with an older "
+        "sync cursor then have to resync fully."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=30, help="Days of changes to keep."
+        )
+
+    def handle(self, *args, **options):
+        if options["days"] < 1:
+            raise CommandError("--days must be at least 1.")
+
+        count = ChangeLogEntry.objects.prune(
+            timezone.now() - timedelta(days=options["days"])
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"{count} change log entries pruned."))
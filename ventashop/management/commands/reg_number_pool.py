@@ -0,0 +1,18 @@
+"""Our command reporting how full the employee registration number pool is."""
+
+from django.core.management.base import BaseCommand
+
+from ventashop.models import RegNumberSlot
+
+
+class Command(BaseCommand):
+    help = "Report how many employee registration numbers are used and free."
+
+    def handle(self, *args, **options):
+        usage = RegNumberSlot.objects.usage()
+        ratio = usage["used"] / usage["total"] * 100 if usage["total"] else 0
+
+        self.stdout.write(
+            f"Registration numbers : {usage['used']} used, {usage['free']} free, "
+            f"out of {usage['total']} ({ratio:.1f} % full)."
+        )
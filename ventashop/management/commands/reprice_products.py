@@ -0,0 +1,69 @@
+"""Our command applying a rule-based price change to products."""
+
+import datetime
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ventashop.pricing import reprice_products, select_products
+
+
+class Command(BaseCommand):
+    help = (
+        "Change the price of products by a percentage, optionally filtered by category "
+        "or creation date, and update open carts accordingly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--percent",
+            type=Decimal,
+            required=True,
+            help="Price variation, e.g. -40 for a 40 %% discount.",
+        )
+        parser.add_argument("--category", help="Only products of this category slug.")
+        parser.add_argument(
+            "--created-before",
+            type=datetime.date.fromisoformat,
+            help="Only products created before this date (YYYY-MM-DD).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Products updated per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        created_before = None
+        if options["created_before"] is not None:
+            created_before = timezone.make_aware(
+                datetime.datetime.combine(options["created_before"], datetime.time.min)
+            )
+
+        products = select_products(
+            category=options["category"], created_before=created_before
+        )
+        ratio = 1 + options["percent"] / 100
+
+        totals = {"products": 0, "line_items": 0, "carts": 0, "elapsed": 0}
+
+        try:
+            for report in reprice_products(products, ratio, options["batch_size"]):
+                self.stdout.write(
+                    f"Batch {report['batch']} : {report['products']} products, "
+                    f"{report['line_items']} cart line items, {report['carts']} carts "
+                    f"updated in {report['elapsed'] * 1000:.1f} ms."
+                )
+                for key in totals:
+                    totals[key] += report[key]
+        except ValueError as err:
+            raise CommandError(err)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{totals['products']} products, {totals['line_items']} cart line items "
+                f"and {totals['carts']} carts updated in {totals['elapsed']:.3f} s."
+            )
+        )
@@ -0,0 +1,466 @@
+"""Our synthetic dataset generator, for load tests and benchmarks."""
+
+import itertools
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from ventashop.catalogue import bump_catalogue_version
+from ventashop.models import (
+    Cart,
+    Category,
+    Comment,
+    Conversation,
+    CustomerAccount,
+    LineItem,
+    Message,
+    Order,
+    Product,
+    RegNumberSlot,
+    Sequence,
+    UnreadCounter,
+    User,
+)
+from ventashop.utils import encode_ref_number, get_VAT_prices
+
+EMAIL_DOMAIN = "seed.ventalis.test"
+PASSWORD = "12345678&"
+CONVERSATION_SUBJECT = "Échanges avec mon conseiller"
+CREATION_COMMENT = "La commande vient d'être créée."
+
+WORDS = [
+    "chaise", "table", "bureau", "lampe", "armoire", "étagère", "tabouret", "canapé",
+    "carton", "palette", "caisse", "gobelet", "assiette", "serviette", "stylo", "cahier",
+    "rouge", "bleu", "vert", "noir", "recyclé", "pliant", "robuste", "léger", "compact",
+    "personnalisé", "imprimé", "brodé", "isotherme", "réutilisable", "premium",
+]
+COMMENTS = [
+    "Commande prise en charge.",
+    "En attente d'approvisionnement.",
+    "Expédition prévue cette semaine.",
+    "Paiement reçu, merci.",
+    "Colis remis au transporteur.",
+]
+# Order statuses, most orders being processed and archived.
+STATUS_WEIGHTS = {
+    Order.CREEE: 5,
+    Order.EN_COURS_DE_TRAITEMENT: 5,
+    Order.EN_ATTENTE_APPROVISIONNEMENT: 2,
+    Order.PREPARATION_EXPEDITION: 2,
+    Order.EN_ATTENTE_PAIEMENT: 2,
+    Order.EXPEDIEE: 4,
+    Order.TRAITEE_ARCHIVEE: 75,
+    Order.ANNULEE: 5,
+}
+
+
+def cumulative_zipf_weights(count, rng, exponent=1.1):
+    """
+    Cumulative Zipf weights of count items, in random order : a few items get
+    most of the draws (best customers, best selling products), as in real shops.
+    """
+
+    weights = [1 / (rank + 1) ** exponent for rank in range(count)]
+    rng.shuffle(weights)
+
+    return list(itertools.accumulate(weights))
+
+
+def chunked(iterable, size):
+    """Lists of at most size items of iterable."""
+
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Populate the database with a synthetic, reproducible dataset : employees, "
+        "customers (with account, cart and conversation), categories, products, "
+        "cart line items, orders with line items and comments, and messages. "
+        "Customers and products follow a skewed (Zipf) distribution."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--employees", type=int, default=20)
+        parser.add_argument("--customers", type=int, default=2000)
+        parser.add_argument("--categories", type=int, default=10)
+        parser.add_argument("--products", type=int, default=500)
+        parser.add_argument("--orders", type=int, default=20000)
+        parser.add_argument(
+            "--comments", type=float, default=1.5, help="Average comments per order."
+        )
+        parser.add_argument(
+            "--carts",
+            type=float,
+            default=0.3,
+            help="Share of customers with line items in their cart.",
+        )
+        parser.add_argument("--messages", type=int, default=50000)
+        parser.add_argument(
+            "--days", type=int, default=730, help="Days of history to spread data over."
+        )
+        parser.add_argument("--seed", type=int, default=42, help="Random seed.")
+        parser.add_argument(
+            "--chunk-size", type=int, default=5000, help="Rows per bulk insert."
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Seed even though DEBUG is off (e.g. a staging database).",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["force"]:
+            raise CommandError("DEBUG is off : run again with --force to seed anyway.")
+        if User.objects.filter(email__endswith="@" + EMAIL_DOMAIN).exists():
+            raise CommandError("The database is already seeded.")
+        if options["customers"] and not options["employees"]:
+            raise CommandError("Customers need at least one employee.")
+        if options["orders"] and not (options["customers"] and options["products"]):
+            raise CommandError("Orders need customers and products.")
+
+        self.rng = random.Random(options["seed"])
+        self.chunk_size = options["chunk_size"]
+        self.end = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.start = self.end - timedelta(days=options["days"])
+        self.password = make_password(PASSWORD)
+
+        with transaction.atomic():
+            employees = self.step("employees", self.create_employees, options["employees"])
+            customers = self.step(
+                "customers", self.create_customers, options["customers"], employees
+            )
+            categories = self.step(
+                "categories", self.create_categories, options["categories"]
+            )
+            products = self.step(
+                "products", self.create_products, options["products"], categories
+            )
+            self.step(
+                "cart line items", self.create_cart_items, customers, products, options["carts"]
+            )
+            self.step(
+                "orders",
+                self.create_orders,
+                options["orders"],
+                customers,
+                products,
+                options["comments"],
+            )
+            self.step("messages", self.create_messages, options["messages"], customers)
+
+        bump_catalogue_version()
+        self.stdout.write(self.style.SUCCESS("Dataset seeded."))
+
+    def step(self, name, create, *args):
+        """Run a creation step, report its duration."""
+
+        start = time.perf_counter()
+        result = create(*args)
+        self.stdout.write(f"{name} : {time.perf_counter() - start:.1f} s")
+
+        return result
+
+    def random_date(self, start=None):
+        start = start or self.start
+        span = (self.end - start).total_seconds()
+
+        return start + timedelta(seconds=self.rng.random() * span)
+
+    def bulk_create(self, model, objects):
+        """Insert objects by chunks, return them with their primary keys."""
+
+        created = []
+        for chunk in chunked(objects, self.chunk_size):
+            created += model.objects.bulk_create(chunk)
+
+        return created
+
+    def create_employees(self, count):
+        """Employees, with registration numbers from the pool."""
+
+        slots = list(
+            RegNumberSlot.objects.filter(employee__isnull=True).order_by("number")[:count]
+        )
+        if len(slots) < count:
+            raise CommandError("Not enough free registration numbers.")
+
+        employees = self.bulk_create(
+            User,
+            (
+                User(
+                    email=f"employee{i}@{EMAIL_DOMAIN}",
+                    password=self.password,
+                    first_name=f"Employé{i}",
+                    last_name="Ventalis",
+                    company="Ventalis",
+                    role="EMPLOYEE",
+                    reg_number=slot.number,
+                    date_joined=self.start,
+                )
+                for i, slot in enumerate(slots)
+            ),
+        )
+
+        for slot, employee in zip(slots, employees):
+            slot.employee = employee
+        RegNumberSlot.objects.bulk_update(slots, ["employee"], batch_size=self.chunk_size)
+
+        return employees
+
+    def create_customers(self, count, employees):
+        """
+        Customers, each with an account related to an employee, a cart,
+        and a conversation with the employee.
+
+        Returns:
+            customers (list): (user, account, cart, conversation, employee) tuples.
+        """
+
+        users = self.bulk_create(
+            User,
+            (
+                User(
+                    email=f"customer{i}@{EMAIL_DOMAIN}",
+                    password=self.password,
+                    first_name=f"Client{i}",
+                    last_name=self.rng.choice(WORDS).capitalize(),
+                    company=f"Société {i}",
+                    role="CUSTOMER",
+                    date_joined=self.random_date(),
+                )
+                for i in range(count)
+            ),
+        )
+        related = [employees[i % len(employees)] for i in range(count)]
+
+        accounts = self.bulk_create(
+            CustomerAccount,
+            (
+                CustomerAccount(
+                    customer=user,
+                    employee_reg=employee.reg_number,
+                    date_created=user.date_joined,
+                )
+                for user, employee in zip(users, related)
+            ),
+        )
+        carts = self.bulk_create(Cart, (Cart(customer_account=a) for a in accounts))
+        conversations = self.bulk_create(
+            Conversation,
+            (
+                Conversation(
+                    subject=CONVERSATION_SUBJECT,
+                    date_created=user.date_joined,
+                    date_modified=user.date_joined,
+                )
+                for user in users
+            ),
+        )
+
+        Participant = Conversation.participants.through
+        self.bulk_create(
+            Participant,
+            (
+                Participant(conversation=conversation, user=participant)
+                for conversation, user, employee in zip(conversations, users, related)
+                for participant in (user, employee)
+            ),
+        )
+
+        return list(zip(users, accounts, carts, conversations, related))
+
+    def create_categories(self, count):
+        return self.bulk_create(
+            Category,
+            (
+                Category(name=f"Catégorie {i}", slug=slugify(f"Catégorie {i}"))
+                for i in range(count)
+            ),
+        )
+
+    def create_products(self, count, categories):
+        def product(i):
+            name = " ".join(self.rng.sample(WORDS, 3)) + f" {i}"
+
+            return Product(
+                name=name,
+                slug=slugify(name),
+                description=" ".join(self.rng.choices(WORDS, k=20)),
+                price=Decimal(self.rng.randint(5, 5000)) / 100,
+                category=self.rng.choice(categories) if categories else None,
+                date_created=self.random_date(),
+            )
+
+        return self.bulk_create(Product, (product(i) for i in range(count)))
+
+    def line_items(self, products, product_weights, count, **kwargs):
+        """count line items of distinct, skewed drawn products."""
+
+        drawn = {
+            p.pk: p for p in self.rng.choices(products, cum_weights=product_weights, k=count)
+        }
+
+        return [
+            LineItem(
+                product=product,
+                quantity=quantity,
+                price=product.price * quantity,
+                **kwargs,
+            )
+            for product in drawn.values()
+            for quantity in [1000 * self.rng.randint(1, 10)]
+        ]
+
+    def create_cart_items(self, customers, products, share):
+        """Line items in the cart of a share of customers, with their total prices."""
+
+        if not products:
+            return
+
+        weights = cumulative_zipf_weights(len(products), self.rng)
+        carts = [cart for _, _, cart, _, _ in customers if self.rng.random() < share]
+
+        for chunk in chunked(carts, self.chunk_size):
+            items = []
+            for cart in chunk:
+                cart_items = self.line_items(
+                    products, weights, self.rng.randint(1, 4), cart=cart
+                )
+                cart.total_price = sum(item.price for item in cart_items)
+                items += cart_items
+
+            LineItem.objects.bulk_create(items)
+            Cart.objects.bulk_update(chunk, ["total_price"])
+
+    def create_orders(self, count, customers, products, comments):
+        """
+        Orders of skewed drawn customers, with line items of skewed drawn products
+        and comments, created chunk by chunk so memory use stays bounded.
+        """
+
+        customer_weights = cumulative_zipf_weights(len(customers), self.rng)
+        product_weights = cumulative_zipf_weights(len(products), self.rng)
+        statuses = list(STATUS_WEIGHTS)
+        status_weights = list(itertools.accumulate(STATUS_WEIGHTS.values()))
+
+        first_number = Sequence.objects.reserve("order_ref_number", count)
+
+        for offset in range(0, count, self.chunk_size):
+            size = min(self.chunk_size, count - offset)
+            owners = self.rng.choices(customers, cum_weights=customer_weights, k=size)
+
+            orders = []
+            order_items = []
+            for i, (user, account, _, _, _) in enumerate(owners):
+                items = self.line_items(products, product_weights, self.rng.randint(1, 5))
+                total_price = sum(item.price for item in items)
+                vat_amount, incl_vat_price = get_VAT_prices(total_price)
+                ref_number = encode_ref_number(first_number + offset + i)
+                date_created = self.random_date(user.date_joined)
+
+                orders.append(
+                    Order(
+                        customer_account=account,
+                        status=self.rng.choices(statuses, cum_weights=status_weights)[0],
+                        total_price=total_price,
+                        vat_amount=vat_amount,
+                        incl_vat_price=incl_vat_price,
+                        ref_number=ref_number,
+                        slug=ref_number,
+                        date_created=date_created,
+                    )
+                )
+                order_items.append(items)
+
+            orders = Order.objects.bulk_create(orders)
+
+            line_items = []
+            order_comments = []
+            for order, items in zip(orders, order_items):
+                for item in items:
+                    item.order = order
+                line_items += items
+
+                order_comments.append(
+                    Comment(content=CREATION_COMMENT, order=order, date_created=order.date_created)
+                )
+                extra = int(max(comments - 1, 0) * 2 * self.rng.random() + 0.5)
+                order_comments += [
+                    Comment(
+                        content=self.rng.choice(COMMENTS),
+                        order=order,
+                        date_created=self.random_date(order.date_created),
+                    )
+                    for _ in range(extra)
+                ]
+
+            LineItem.objects.bulk_create(line_items)
+            Comment.objects.bulk_create(order_comments)
+
+    def create_messages(self, count, customers):
+        """
+        Messages between customers and their employee, in skewed drawn conversations,
+        all read but the last one of each conversation ; and the unread counters
+        of every participant.
+        """
+
+        if not customers:
+            return
+
+        weights = cumulative_zipf_weights(len(customers), self.rng)
+        sizes = {}
+        for customer in self.rng.choices(customers, cum_weights=weights, k=count):
+            sizes[customer] = sizes.get(customer, 0) + 1
+
+        unread = set()
+        messages = []
+        conversations = []
+        for (user, _, _, conversation, employee), size in sizes.items():
+            dates = sorted(self.random_date(user.date_joined) for _ in range(size))
+            for i, date in enumerate(dates):
+                author = self.rng.choice((user, employee))
+                messages.append(
+                    Message(
+                        author=author,
+                        conversation=conversation,
+                        content=" ".join(self.rng.choices(WORDS, k=8)),
+                        date_created=date,
+                        is_read=i < size - 1,
+                    )
+                )
+            conversation.date_modified = dates[-1]
+            conversations.append(conversation)
+            reader = employee if author == user else user
+            unread.add((conversation.pk, reader.pk))
+
+            if len(messages) >= self.chunk_size:
+                Message.objects.bulk_create(messages)
+                messages = []
+        Message.objects.bulk_create(messages)
+
+        for chunk in chunked(conversations, self.chunk_size):
+            Conversation.objects.bulk_update(chunk, ["date_modified"])
+
+        self.bulk_create(
+            UnreadCounter,
+            (
+                UnreadCounter(
+                    conversation=conversation,
+                    user=participant,
+                    count=int((conversation.pk, participant.pk) in unread),
+                )
+                for user, _, _, conversation, employee in customers
+                for participant in (user, employee)
+            ),
+        )
@@ -1,8 +1,20 @@
 """Our message and conversation related views' module."""
 
+import asyncio
+import json
+import time
 from typing import Any
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import HttpRequest, HttpResponse, HttpResponseRedirect
+from django.http import (
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django.views.generic import ListView
@@ -11,6 +23,7 @@ from django.views.generic.edit import FormMixin
 from ventashop.forms import MessageForm
 from ventashop.models import Conversation, Message
 from ventashop.auth_utils import TestIsCustomerOrEmployeeMixin, TestIsEmployeeMixin
+from ventashop.events import get_broker, message_event
 
 
 class MessageListView(
@@ -23,6 +36,8 @@ class MessageListView(
     # paginate_by = 5  # if pagination is desired
     template_name = "ventashop/messages.html"
     context_object_name = "message_list"
+    # Queries per request, see query_profiler.py.
+    query_budget = 13
 
     form_class = MessageForm
 
@@ -36,6 +51,8 @@ class MessageListView(
         if user not in conversation.participants.all():
             return HttpResponse("Unauthorized", status=401)
 
+        conversation.mark_read(user)
+
         return super().get(request, *args, **kwargs)
 
     def post(self, request, *args, **kwargs):
@@ -53,20 +70,29 @@ class MessageListView(
             reverse("ventashop:messages-last", args=(conversation.id, 5))
         )
 
+    def get_cursor(self, name):
+        """Message id given as "before" or "after" query parameter, if any."""
+
+        value = self.request.GET.get(name, "")
+
+        return int(value) if value.isdigit() else None
+
     def get_queryset(self, *args, **kwargs):
         """Message list (aka one conversation) to be displayed."""
 
-        # n last messages to be displayed.
+        m_set = Message.objects.filter(conversation__id=self.kwargs["pk"]).select_related(
+            "author"
+        )
+
+        # n last messages to be displayed, or n messages before / after a given one.
         if "n_last" in self.kwargs:
-            n_last = int(self.kwargs["n_last"])
-            m_set = list(Message.objects.filter(conversation__id=self.kwargs["pk"]))[
-                -n_last:
-            ]
+            m_set = m_set.window(
+                int(self.kwargs["n_last"]),
+                before=self.get_cursor("before"),
+                after=self.get_cursor("after"),
+            )
 
         # all messages to be displayed.
-        else:
-            m_set = Message.objects.filter(conversation__id=self.kwargs["pk"])
-
         return m_set
 
     def get_context_data(self, **kwargs):
@@ -81,40 +107,136 @@ class MessageListView(
         # Form for new message
         context["form"] = self.get_form(self.form_class)
 
+        # New messages pushed by the stream, or polled.
+        context["stream_enabled"] = settings.MESSAGE_STREAM_ENABLED
+
         # Only last messages or all of them
         if "n_last" in self.kwargs:
             context["n_last"] = True
+            context["window_size"] = int(self.kwargs["n_last"])
+
+            # Cursors for older and newer messages, without counting the conversation.
+            message_list = list(context["message_list"])
+            if len(message_list) == context["window_size"]:
+                context["previous_cursor"] = message_list[0].pk
+            if message_list and (
+                self.get_cursor("before") is not None
+                or (
+                    self.get_cursor("after") is not None
+                    and len(message_list) == context["window_size"]
+                )
+            ):
+                context["next_cursor"] = message_list[-1].pk
         else:
             context["n_last"] = False
 
         return context
 
 
+STREAM_KEEPALIVE = 20  # seconds
+STREAM_MAX_AGE = 300  # seconds, EventSource reconnects with the last event id.
+STREAM_CATCH_UP_SIZE = 100
+
+
+def _sse(event):
+    """Server-Sent Events formatting of a message event."""
+
+    return f"id: {event['id']}\nevent: message\ndata: {json.dumps(event)}\n\n"
+
+
+def _is_participant(request, pk):
+    """Whether the request user is a participant in conversation pk."""
+
+    user = request.user
+
+    return (
+        user.is_authenticated
+        and Conversation.objects.filter(pk=pk, participants=user).exists()
+    )
+
+
+async def _message_stream(pk, subscription, last_id):
+    """Missed messages since last_id, then new messages as they come, until max age."""
+
+    broker = get_broker()
+    deadline = time.monotonic() + STREAM_MAX_AGE
+
+    try:
+        yield "retry: 3000\n\n"
+
+        if last_id is not None:
+            messages = (
+                Message.objects.filter(conversation_id=pk)
+                .select_related("author")
+                .window(STREAM_CATCH_UP_SIZE, after=last_id)
+            )
+            async for message in messages:
+                last_id = message.pk
+                yield _sse(message_event(message))
+
+        while time.monotonic() < deadline:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), STREAM_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+
+            # Already sent while catching up.
+            if last_id is not None and event["id"] <= last_id:
+                continue
+
+            last_id = event["id"]
+            yield _sse(event)
+
+            if subscription.overflowed and subscription.queue.empty():
+                return
+    finally:
+        broker.unsubscribe(pk, subscription)
+
+
+async def message_stream(request, pk):
+    """
+    Server-Sent Events stream of a conversation's new messages, for its participants.
+    Async : served under ASGI, an idle connection costs a coroutine and a queue.
+    Under WSGI it would hold a worker, so it is only served with MESSAGE_STREAM_ENABLED.
+    Messages after the "Last-Event-ID" header (or "after" query parameter) are sent first.
+    """
+
+    if not settings.MESSAGE_STREAM_ENABLED:
+        raise Http404
+
+    if not await sync_to_async(_is_participant)(request, pk):
+        return HttpResponse("Unauthorized", status=401)
+
+    last_id = request.headers.get("Last-Event-ID") or request.GET.get("after", "")
+    last_id = int(last_id) if last_id.isdigit() else None
+
+    # Subscribe before catching up, so no message falls in between.
+    subscription = get_broker().subscribe(pk)
+
+    response = StreamingHttpResponse(
+        _message_stream(pk, subscription, last_id), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+
+    return response
+
+
 class ConversationListView(LoginRequiredMixin, TestIsEmployeeMixin, ListView):
-    """Our conversation list view."""
+    """Our conversation list view (aka employee inbox)."""
 
     login_url = "/login/"
     model = Conversation
-    # paginate_by = 5  # if pagination is desired
+    paginate_by = 20
     template_name = "ventashop/conversations.html"
     context_object_name = "conversation_list"
+    query_budget = 6
 
     def get_queryset(self):
-        """The user's conversations, with the list of participants for each."""
-
-        user = self.request.user
-        conversations = Conversation.objects.filter(participants=user).order_by(
-            "date_modified"
-        )
-
-        conversation_list = []
-        for conversation in conversations:
-            participants = conversation.participants.all()
-            conversation_list.append(
-                {
-                    "conversation": conversation,
-                    "participants": participants,
-                }
-            )
+        """
+        The user's conversations, most recently active first,
+        with counterparts, last message and unread count for each.
+        """
 
-        return conversation_list
+        return Conversation.objects.inbox(self.request.user)
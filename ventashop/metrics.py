@@ -0,0 +1,341 @@
+"""
+Our request metrics module : latency, DB time, queries and response sizes by URL name,
+exported in the Prometheus text format.
+
+MetricsMiddleware records each request in the registry of its process (a few dict
+updates, and a timer around each query), which flushes a snapshot to the shared
+store every METRICS_FLUSH_INTERVAL seconds. The metrics endpoint sums the snapshots
+of all the workers. The store class is set with the METRICS_STORE setting :
+- FileStore (default) : a file per worker in METRICS_DIR, shared by the workers
+  of a host (e.g. gunicorn's),
+- CacheStore : a cache entry per worker, shared by all hosts with a shared cache (Redis).
+The endpoint answers requests bearing the METRICS_TOKEN setting, 404 without it.
+"""
+
+import atexit
+import bisect
+import functools
+import hmac
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.http import Http404, HttpResponse
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Other methods are recorded as "OTHER", so labels stay few.
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+UNMATCHED = "<unmatched>"
+PREFIX = "ventalis_http_"
+
+
+def new_series():
+    return {
+        "buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+        "duration": 0.0,
+        "db_duration": 0.0,
+        "queries": 0,
+        "size": 0,
+        "statuses": {},
+    }
+
+
+class Registry:
+    """The request metrics of this process, by (URL name, method)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.series = {}
+        self.last_flush = time.monotonic()
+
+    def record(self, view, method, status, duration, db_duration, queries, size):
+        with self._lock:
+            if self.pid != os.getpid():
+                # Forked (e.g. gunicorn --preload) : the parent's requests aren't ours.
+                self._reset()
+
+            series = self.series.get((view, method))
+            if series is None:
+                series = self.series[(view, method)] = new_series()
+
+            series["buckets"][bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+            series["duration"] += duration
+            series["db_duration"] += db_duration
+            series["queries"] += queries
+            series["size"] += size
+            status_class = f"{status // 100}xx"
+            series["statuses"][status_class] = series["statuses"].get(status_class, 0) + 1
+
+    def snapshot(self):
+        """This process' series, as JSON serializable [view, method, series] lists."""
+
+        with self._lock:
+            return [
+                [
+                    view,
+                    method,
+                    {
+                        **series,
+                        "buckets": list(series["buckets"]),
+                        "statuses": dict(series["statuses"]),
+                    },
+                ]
+                for (view, method), series in self.series.items()
+            ]
+
+    def flush(self, force=False):
+        """Save a snapshot to the store, every METRICS_FLUSH_INTERVAL seconds (or now)."""
+
+        interval = getattr(settings, "METRICS_FLUSH_INTERVAL", 10)
+        if not force and time.monotonic() - self.last_flush < interval:
+            return
+
+        self.last_flush = time.monotonic()
+        try:
+            get_store().save(worker_id(), self.snapshot())
+        except Exception:
+            # Metrics never break requests.
+            logger.warning("Metrics flush failed.", exc_info=True)
+
+
+registry = Registry()
+atexit.register(registry.flush, force=True)
+
+
+def worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def merge(snapshots):
+    """Sum of worker snapshots, by (view, method)."""
+
+    merged = {}
+    for snapshot in snapshots:
+        for view, method, series in snapshot:
+            total = merged.setdefault((view, method), new_series())
+            for i, count in enumerate(series["buckets"]):
+                total["buckets"][i] += count
+            for key in ("duration", "db_duration", "queries", "size"):
+                total[key] += series[key]
+            for status, count in series["statuses"].items():
+                total["statuses"][status] = total["statuses"].get(status, 0) + count
+
+    return merged
+
+
+##################
+##### STORES #####
+##################
+
+
+class FileStore:
+    """Snapshots as JSON files, one per worker, in the METRICS_DIR directory."""
+
+    @property
+    def directory(self):
+        return getattr(
+            settings, "METRICS_DIR", os.path.join(tempfile.gettempdir(), "ventalis-metrics")
+        )
+
+    def save(self, worker, snapshot):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{worker}.json")
+
+        # Written aside then renamed, so readers never see a partial file.
+        with open(path + ".tmp", "w") as f:
+            json.dump(snapshot, f)
+        os.replace(path + ".tmp", path)
+
+    def load(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+
+        snapshots = []
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+
+        return snapshots
+
+
+class CacheStore:
+    """
+    Snapshots in the cache, one entry per worker, listed in an index entry.
+    A worker missing from the index (lost to a concurrent update) adds itself
+    back on its next flush.
+    """
+
+    INDEX_KEY = "metrics:workers"
+
+    def key(self, worker):
+        return f"metrics:worker:{worker}"
+
+    def save(self, worker, snapshot):
+        cache.set(self.key(worker), snapshot, None)
+
+        workers = cache.get(self.INDEX_KEY, [])
+        if worker not in workers:
+            cache.set(self.INDEX_KEY, [*workers, worker], None)
+
+    def load(self):
+        workers = cache.get(self.INDEX_KEY, [])
+
+        return list(cache.get_many([self.key(worker) for worker in workers]).values())
+
+
+@functools.lru_cache(maxsize=None)
+def get_store():
+    """The metrics store of this process."""
+
+    path = getattr(settings, "METRICS_STORE", "ventashop.metrics.FileStore")
+
+    return import_string(path)()
+
+
+##################
+##### EXPORT #####
+##################
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def render_prometheus(merged):
+    """Merged series in the Prometheus text exposition format."""
+
+    def bound(value):
+        return f"{value:g}"
+
+    lines = [
+        f"# HELP {PREFIX}request_duration_seconds Request latency, by URL name.",
+        f"# TYPE {PREFIX}request_duration_seconds histogram",
+    ]
+    for (view, method), series in sorted(merged.items()):
+        cumulative = 0
+        for upper, count in zip((*map(bound, LATENCY_BUCKETS), "+Inf"), series["buckets"]):
+            cumulative += count
+            labels = _labels(view=view, method=method, le=upper)
+            lines.append(f"{PREFIX}request_duration_seconds_bucket{labels} {cumulative}")
+        labels = _labels(view=view, method=method)
+        lines.append(f"{PREFIX}request_duration_seconds_sum{labels} {series['duration']}")
+        lines.append(f"{PREFIX}request_duration_seconds_count{labels} {cumulative}")
+
+    lines += [
+        f"# HELP {PREFIX}requests_total Requests, by URL name and status class.",
+        f"# TYPE {PREFIX}requests_total counter",
+    ]
+    for (view, method), series in sorted(merged.items()):
+        for status, count in sorted(series["statuses"].items()):
+            labels = _labels(view=view, method=method, status=status)
+            lines.append(f"{PREFIX}requests_total{labels} {count}")
+
+    counters = [
+        ("request_db_seconds_total", "db_duration", "Time spent in database queries."),
+        ("request_queries_total", "queries", "Database queries."),
+        ("response_size_bytes_total", "size", "Response body sizes (streamed ones excluded)."),
+    ]
+    for name, key, description in counters:
+        lines += [
+            f"# HELP {PREFIX}{name} {description}",
+            f"# TYPE {PREFIX}{name} counter",
+        ]
+        for (view, method), series in sorted(merged.items()):
+            lines.append(f"{PREFIX}{name}{_labels(view=view, method=method)} {series[key]}")
+
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    """The metrics of all the workers, for bearers of the METRICS_TOKEN."""
+
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if not token:
+        raise Http404
+
+    authorization = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode()):
+        response = HttpResponse("Unauthorized", status=401)
+        response["WWW-Authenticate"] = "Bearer"
+        return response
+
+    registry.flush(force=True)
+
+    return HttpResponse(
+        render_prometheus(merge(get_store().load())),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+######################
+##### MIDDLEWARE #####
+######################
+
+
+class QueryTimer:
+    """Execute wrapper counting and timing queries."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """Middleware recording each request in the registry (see module docstring)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        registry.record(
+            view=match.view_name if match else UNMATCHED,
+            method=request.method if request.method in METHODS else "OTHER",
+            status=response.status_code,
+            duration=duration,
+            db_duration=timer.duration,
+            queries=timer.count,
+            size=0 if response.streaming else len(response.content),
+        )
+        registry.flush()
+
+        return response
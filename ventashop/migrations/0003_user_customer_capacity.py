@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 10:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventashop', '0002_alter_category_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='customer_capacity',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Relative share of new customers assigned to this employee, 0 to stop assigning.'),
+        ),
+    ]
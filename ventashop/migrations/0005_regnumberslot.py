@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-18 10:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_reg_number_pool(apps, schema_editor):
+    """Create the 10000 registration number slots, those already in use being assigned."""
+
+    RegNumberSlot = apps.get_model("ventashop", "RegNumberSlot")
+    User = apps.get_model("ventashop", "User")
+
+    employees = {}
+    for pk, reg_number in User.objects.filter(reg_number__isnull=False).values_list(
+        "pk", "reg_number"
+    ):
+        employees.setdefault(reg_number, pk)
+
+    RegNumberSlot.objects.bulk_create(
+        [
+            RegNumberSlot(number=str(n).zfill(4), employee_id=employees.get(str(n).zfill(4)))
+            for n in range(10000)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventashop', '0004_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegNumberSlot',
+            fields=[
+                ('number', models.CharField(max_length=4, primary_key=True, serialize=False)),
+                ('employee', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reg_number_slot', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='regnumberslot',
+            index=models.Index(condition=models.Q(('employee__isnull', True)), fields=['number'], name='regnumberslot_free_idx'),
+        ),
+        migrations.RunPython(fill_reg_number_pool, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2 on 2026-10-18 10:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_unread_counters(apps, schema_editor):
+    """Create the counters of existing participants, from their unread messages."""
+
+    Conversation = apps.get_model("ventashop", "Conversation")
+    Message = apps.get_model("ventashop", "Message")
+    UnreadCounter = apps.get_model("ventashop", "UnreadCounter")
+    Participation = Conversation.participants.through
+
+    unread = (
+        Message.objects.filter(conversation=OuterRef("conversation_id"), is_read=False)
+        .exclude(author=OuterRef("user_id"))
+        .order_by()
+        .values("conversation")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    participations = Participation.objects.annotate(
+        unread_count=Coalesce(Subquery(unread), 0)
+    ).values_list("user_id", "conversation_id", "unread_count")
+
+    UnreadCounter.objects.bulk_create(
+        [
+            UnreadCounter(user_id=user_id, conversation_id=conversation_id, count=count)
+            for user_id, conversation_id, count in participations.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventashop', '0006_message_window_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ventashop.conversation')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='unreadcounter',
+            constraint=models.UniqueConstraint(fields=('user', 'conversation'), name='unreadcounter_unique_participant'),
+        ),
+        migrations.RunPython(fill_unread_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+from django.db import migrations
+
+SQLITE_FTS_TABLE = "ventashop_product_fts"
+
+SQLITE_FORWARD = [
+    f"""CREATE VIRTUAL TABLE {SQLITE_FTS_TABLE} USING fts5(
+        name, description, content='ventashop_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER {SQLITE_FTS_TABLE}_insert AFTER INSERT ON ventashop_product BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END""",
+    f"""CREATE TRIGGER {SQLITE_FTS_TABLE}_delete AFTER DELETE ON ventashop_product BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    f"""CREATE TRIGGER {SQLITE_FTS_TABLE}_update AFTER UPDATE OF name, description
+        ON ventashop_product BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END""",
+    f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    f"DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_update",
+    f"DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}",
+]
+
+
+POSTGRES_FORWARD = [
+    """ALTER TABLE ventashop_product ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('french', coalesce(name, '')), 'A')
+            || setweight(to_tsvector('french', coalesce(description, '')), 'B')
+        ) STORED""",
+    "CREATE INDEX product_search_idx ON ventashop_product USING gin (search_vector)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS product_search_idx",
+    "ALTER TABLE ventashop_product DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Product text index, unknown to the model, see ventashop/search.py :
+    stored tsvector column with a GIN index on Postgres, FTS5 table on SQLite.
+    """
+
+    statements = {"postgresql": POSTGRES_FORWARD, "sqlite": SQLITE_FORWARD}
+
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    statements = {"postgresql": POSTGRES_BACKWARD, "sqlite": SQLITE_BACKWARD}
+
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ventashop", "0008_product_category_name_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
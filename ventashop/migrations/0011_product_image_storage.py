@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-18 10:41
+
+from django.db import migrations, models
+import ventashop.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventashop', '0010_product_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=ventashop.storage.get_product_image_storage, upload_to='product_img/%Y/%m/%d/'),
+        ),
+    ]
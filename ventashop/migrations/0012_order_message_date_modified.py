@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-18 11:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ventashop", "0011_product_image_storage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="date_modified",
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="message",
+            name="date_modified",
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-18 10:48
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventashop', '0012_order_message_date_modified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('C', 'created'), ('U', 'updated'), ('D', 'deleted')], max_length=1)),
+                ('account_id', models.BigIntegerField(blank=True, null=True)),
+                ('conversation_id', models.BigIntegerField(blank=True, null=True)),
+                ('date_created', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['account_id', 'id'], name='changelog_account_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['conversation_id', 'id'], name='changelog_conversation_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2 on 2026-10-18 10:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventashop', '0013_changelogentry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lineitem',
+            name='cart',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='ventashop.cart'),
+        ),
+        migrations.AlterField(
+            model_name='lineitem',
+            name='order',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='ventashop.order'),
+        ),
+        migrations.AddIndex(
+            model_name='customeraccount',
+            index=models.Index(fields=['employee_reg'], name='customeraccount_employee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lineitem',
+            index=models.Index(condition=models.Q(('cart__isnull', False)), fields=['cart', 'product'], name='lineitem_cart_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lineitem',
+            index=models.Index(condition=models.Q(('order__isnull', False)), fields=['order'], name='lineitem_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('reg_number__isnull', False)), fields=['reg_number'], name='user_reg_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'date_joined'], name='user_role_date_joined_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations
+
+SQLITE_FTS_TABLE = "ventashop_product_fts"
+
+# SQLite rebuilds ventashop_product to alter it (e.g. migrations 0010 and 0011),
+# dropping the triggers created in 0009 : they are created again, and the index rebuilt.
+SQLITE_FORWARD = [
+    f"DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_update",
+    f"""CREATE TRIGGER {SQLITE_FTS_TABLE}_insert AFTER INSERT ON ventashop_product BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END""",
+    f"""CREATE TRIGGER {SQLITE_FTS_TABLE}_delete AFTER DELETE ON ventashop_product BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    f"""CREATE TRIGGER {SQLITE_FTS_TABLE}_update AFTER UPDATE OF name, description
+        ON ventashop_product BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END""",
+    f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')",
+]
+
+
+def recreate_search_triggers(apps, schema_editor):
+    """Product text index triggers, see migration 0009 and ventashop/search.py."""
+
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    for sql in SQLITE_FORWARD:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ventashop", "0015_message_conversation_modified_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(recreate_search_triggers, migrations.RunPython.noop),
+    ]
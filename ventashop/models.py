@@ -1,4 +1,9 @@
-from django.db import models
+import heapq
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce
 
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.core.exceptions import ObjectDoesNotExist
@@ -7,10 +12,11 @@ from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from .storage import get_product_image_storage
 from .utils import (
+    BlockAllocator,
+    encode_ref_number,
     get_VAT_prices,
-    unique_ref_number_generator,
-    unique_reg_number_generator,
 )
 
 
@@ -51,6 +57,18 @@ class UserManager(BaseUserManager):
 class User(AbstractUser):
     """User model."""
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Employee lookups (customers have no reg_number).
+            models.Index(
+                fields=["reg_number"],
+                condition=Q(reg_number__isnull=False),
+                name="user_reg_number_idx",
+            ),
+            # Users by role, e.g. employee list by date joined.
+            models.Index(fields=["role", "date_joined"], name="user_role_date_joined_idx"),
+        ]
+
     username = None
     email = models.EmailField(_("email address"), unique=True)
 
@@ -71,19 +89,260 @@ class User(AbstractUser):
     role = models.CharField(max_length=30, choices=ROLE_CHOICES, default=CUSTOMER)
     company = models.CharField(max_length=200, null=True)
     reg_number = models.CharField(max_length=4, null=True)
+    customer_capacity = models.PositiveSmallIntegerField(
+        default=1,
+        help_text="Relative share of new customers assigned to this employee, 0 to stop assigning.",
+    )
 
     def __str__(self):
         return self.first_name
 
+    def save(self, *args, **kwargs):
+        """
+        A deactivated employee gives their registration number back to the pool,
+        and their customers (with their conversations) to the other employees.
+        The number is kept while no other employee can take the customers over.
+        A reactivated employee gets a new registration number from the pool.
+        """
+
+        if self.pk is None:
+            return super().save(*args, **kwargs)
+
+        if self.is_active:
+            if self.role == "EMPLOYEE" and self.reg_number is None:
+                with transaction.atomic():
+                    self.reg_number = RegNumberSlot.objects.allocate(self)
+
+                    if kwargs.get("update_fields") is not None:
+                        kwargs["update_fields"] = {*kwargs["update_fields"], "reg_number"}
+
+                    return super().save(*args, **kwargs)
+
+            return super().save(*args, **kwargs)
+
+        if self.reg_number is None:
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            accounts = CustomerAccount.objects.filter(employee_reg=self.reg_number)
+            successors = User.objects.filter(
+                role="EMPLOYEE",
+                is_active=True,
+                reg_number__isnull=False,
+                customer_capacity__gt=0,
+            ).exclude(pk=self.pk)
+            if accounts.exists() and not successors.exists():
+                return super().save(*args, **kwargs)
+
+            RegNumberSlot.objects.release(self)
+            self.reg_number = None
+
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "reg_number"}
+
+            # Saved first : the customers' new employees are chosen among the others.
+            result = super().save(*args, **kwargs)
+            accounts.hand_over(self)
+
+        return result
+
+
+class RegNumberSlotManager(models.Manager):
+    """Our registration number pool manager."""
+
+    def allocate(self, employee):
+        """
+        Hand out the lowest free registration number to employee, and return it.
+        Slots locked by concurrent allocations are skipped rather than waited for.
+        """
+
+        with transaction.atomic():
+            slot = (
+                self.select_for_update(skip_locked=True)
+                .filter(employee__isnull=True)
+                .order_by("number")
+                .first()
+            )
+
+            if slot is None:
+                raise ValueError("The registration number pool is exhausted.")
+
+            slot.employee = employee
+            slot.save(update_fields=["employee"])
+
+        return slot.number
+
+    def release(self, employee):
+        """Give employee's registration number back to the pool."""
+
+        return self.filter(employee=employee).update(employee=None)
+
+    def usage(self):
+        """Return how full the pool is : total, used and free slot counts."""
+
+        usage = self.aggregate(
+            total=Count("pk"), used=Count("pk", filter=Q(employee__isnull=False))
+        )
+        usage["free"] = usage["total"] - usage["used"]
+
+        return usage
+
+
+class RegNumberSlot(models.Model):
+    """
+    One of the 10000 employee registration numbers.
+    A slot is free when it has no employee.
+    """
+
+    number = models.CharField(max_length=4, primary_key=True)
+    employee = models.OneToOneField(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="reg_number_slot",
+    )
+
+    objects = RegNumberSlotManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["number"],
+                condition=Q(employee__isnull=True),
+                name="regnumberslot_free_idx",
+            )
+        ]
+
+    def __str__(self) -> str:
+        return self.number
+
+
+def employees_by_load():
+    """
+    Employees who may be assigned customers, annotated with their load :
+    their number of customers, relatively to their capacity.
+    """
+
+    customers_count = (
+        CustomerAccount.objects.filter(employee_reg=OuterRef("reg_number"))
+        .order_by()
+        .values("employee_reg")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+
+    return (
+        User.objects.filter(
+            role="EMPLOYEE", is_active=True, reg_number__isnull=False, customer_capacity__gt=0
+        )
+        .annotate(customers_count=Coalesce(Subquery(customers_count), 0))
+        .annotate(load=Cast("customers_count", FloatField()) / F("customer_capacity"))
+        .order_by("load", "pk")
+    )
+
+
+def lock_employees():
+    """
+    Lock the rows of the employees who may be assigned customers, so that concurrent
+    assignments run one after the other. Must be called within a transaction.
+
+    returns : whether there is any such employee[bool]
+    """
+
+    return bool(
+        list(
+            User.objects.filter(
+                role="EMPLOYEE",
+                is_active=True,
+                reg_number__isnull=False,
+                customer_capacity__gt=0,
+            )
+            .select_for_update()
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+    )
+
+
+class CustomerAccountQuerySet(models.QuerySet):
+    """Our customer account queryset, handing customers over to other employees."""
+
+    def hand_over(self, previous_employee):
+        """
+        Assign the accounts of the queryset to the least loaded employees, relatively
+        to their capacity, and hand them the customers' conversations with
+        previous_employee : employees are locked and their loads read once,
+        then the accounts are spread in Python.
+
+        returns : number of accounts handed over[int]
+        """
+
+        with transaction.atomic():
+            if not lock_employees():  # Abort if no employee exists.
+                return 0
+
+            heap = [
+                (employee.load, employee.pk, employee) for employee in employees_by_load()
+            ]
+            heapq.heapify(heap)
+
+            customers_by_employee = {}
+            accounts = list(self.order_by("pk"))
+            for account in accounts:
+                load, pk, employee = heapq.heappop(heap)
+                employee.customers_count += 1
+                heapq.heappush(
+                    heap,
+                    (employee.customers_count / employee.customer_capacity, pk, employee),
+                )
+
+                account.employee_reg = employee.reg_number
+                account.save(update_fields=["employee_reg"])
+                if account.customer_id is not None:
+                    customers_by_employee.setdefault(employee, []).append(account.customer_id)
+
+            # The customers' conversations with previous_employee, by new employee.
+            participations = Conversation.participants.through.objects.filter(
+                user_id__in=[pk for pks in customers_by_employee.values() for pk in pks],
+                conversation__participants=previous_employee,
+            ).values_list("user_id", "conversation_id")
+            conversations_by_customer = {}
+            for customer_id, conversation_id in participations:
+                conversations_by_customer.setdefault(customer_id, []).append(conversation_id)
+
+            moved = []
+            for employee, customer_ids in customers_by_employee.items():
+                conversation_ids = [
+                    conversation_id
+                    for customer_id in customer_ids
+                    for conversation_id in conversations_by_customer.get(customer_id, [])
+                ]
+                if conversation_ids:
+                    employee.conversation_set.add(*conversation_ids)
+                    moved += conversation_ids
+            if moved:
+                previous_employee.conversation_set.remove(*moved)
+
+        return len(accounts)
+
 
 class CustomerAccount(models.Model):
     "Our customer account model."
 
+    class Meta:
+        indexes = [
+            # Customers of an employee.
+            models.Index(fields=["employee_reg"], name="customeraccount_employee_idx")
+        ]
+
     is_active = models.BooleanField(default=True)
     date_created = models.DateTimeField(default=timezone.now)
     customer = models.OneToOneField(User, null=True, on_delete=models.SET_NULL)
     employee_reg = models.CharField(max_length=4, null=True)
 
+    objects = CustomerAccountQuerySet.as_manager()
+
     def set_cart(self):
         """Assign a cart to customer account"""
 
@@ -93,40 +352,27 @@ class CustomerAccount(models.Model):
             Cart.objects.create(customer_account=self)
 
     def _choose_related_employee(self):
-        """Choose employee with least related customers."""
-
-        employees = User.objects.filter(role="EMPLOYEE")
+        """
+        Choose employee with least related customers, relatively to their capacity.
+        Must be called within a transaction : employee rows are locked first,
+        so that concurrent sign-ups are assigned one after the other,
+        then a single annotated query finds the least loaded employee.
+        """
 
-        if employees.count() == 0:  # Abort if no employee exists.
+        if not lock_employees():  # Abort if no employee exists.
             return
 
-        employee = employees[0]
-        count = CustomerAccount.objects.filter(employee_reg=employee.reg_number).count()
-
-        for e in employees:
-            # Checking for reg_number should be usefull only at dev time. In production, every employee should have a reg_number.
-            if e.reg_number is None:
-                e.reg_number = unique_reg_number_generator(e)
-                e.save()
-                return e.reg_number
-
-            customers_count = CustomerAccount.objects.filter(
-                employee_reg=e.reg_number
-            ).count()
-            if customers_count < count:
-                count = customers_count
-                employee = e
-
-        return employee
+        return employees_by_load().first()
 
     def set_employee_reg_number(self):
         """Assign related employee reg_nubmer."""
 
-        related_employee = self._choose_related_employee()
+        with transaction.atomic():
+            related_employee = self._choose_related_employee()
 
-        if related_employee is not None:  # Abort if no employee exists.
-            self.employee_reg = related_employee.reg_number
-            self.save()
+            if related_employee is not None:  # Abort if no employee exists.
+                self.employee_reg = related_employee.reg_number
+                self.save(update_fields=["employee_reg"])
 
     def set_conversation(self, subject, customer):
         """Create a conversation with customer and related employee as participants."""
@@ -168,21 +414,52 @@ class Category(models.Model):
         return super().save(*args, **kwargs)
 
 
+PACK_SIZE = 1000  # Products are sold and displayed by packs of 1000 units.
+
+
+class ProductQuerySet(models.QuerySet):
+    """Our product queryset."""
+
+    def with_pack_price(self):
+        """Annotate the price for a pack of 1000 units, computed in the database."""
+
+        return self.annotate(
+            pack_price=models.ExpressionWrapper(
+                F("price") * Value(PACK_SIZE),
+                output_field=models.DecimalField(max_digits=13, decimal_places=2),
+            )
+        )
+
+
 class Product(models.Model):
     """This is our Product model."""
 
     class Meta:
         ordering = ["-date_created"]
+        indexes = [
+            # Keyset pagination of the catalogue by category, see views.CatalogueMixin.
+            models.Index(fields=["category", "name"], name="product_category_name_idx")
+        ]
 
     name = models.CharField(max_length=200, unique=True)
     slug = models.SlugField(null=False, unique=True)
     date_created = models.DateTimeField(default=timezone.now)
-    image = models.ImageField(upload_to="product_img/%Y/%m/%d/", blank=True, null=True)
+    # Stored once per content, see storage.py.
+    image = models.ImageField(
+        upload_to="product_img/%Y/%m/%d/",
+        storage=get_product_image_storage,
+        blank=True,
+        null=True,
+    )
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     category = models.ForeignKey(
         Category, on_delete=models.SET_NULL, blank=True, null=True
     )
+    # Resized variants of image, see images.py.
+    variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    objects = ProductQuerySet.as_manager()
 
     def get_absolute_url(self):
         return reverse("ventashop:product-detail", kwargs={"slug": self.slug})
@@ -194,6 +471,76 @@ class Product(models.Model):
         self.slug = slugify(self.name)
         return super().save(*args, **kwargs)
 
+    def get_variants(self, image_format):
+        """Variants of the actual image in a format ("webp" or "jpeg"), narrowest first."""
+
+        if not self.image or self.variants.get("source") != self.image.name:
+            return []
+
+        variants = [v for v in self.variants["images"] if v["format"] == image_format]
+
+        return sorted(variants, key=lambda v: v["width"])
+
+    def get_srcset(self, image_format):
+        """The srcset attribute of the image variants in a format."""
+
+        storage = self.image.storage
+
+        return ", ".join(
+            f"{storage.url(v['name'])} {v['width']}w" for v in self.get_variants(image_format)
+        )
+
+    @property
+    def webp_srcset(self):
+        return self.get_srcset("webp")
+
+    @property
+    def jpeg_srcset(self):
+        return self.get_srcset("jpeg")
+
+
+class CartQuerySet(models.QuerySet):
+    """Our cart queryset, with set-based tools to check and repair total prices."""
+
+    def _line_items_total(self):
+        """Subquery summing up the prices of the line items of the outer cart."""
+
+        line_items_total = (
+            LineItem.objects.filter(cart=OuterRef("pk"))
+            .order_by()
+            .values("cart")
+            .annotate(total=Sum("price"))
+            .values("total")
+        )
+
+        return Coalesce(
+            Subquery(line_items_total),
+            Value(Decimal(0)),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        )
+
+    def with_line_items_total(self):
+        """Annotate each cart with the actual sum of its line items' prices."""
+
+        return self.annotate(line_items_total=self._line_items_total())
+
+    def drifted(self):
+        """Carts whose total_price field differs from the sum of their line items."""
+
+        return self.with_line_items_total().exclude(
+            total_price=F("line_items_total")
+        )
+
+    def recalculate_totals(self):
+        """
+        Recalculate the total_price field of every cart in the queryset,
+        with a single UPDATE statement.
+
+        returns : number of carts updated[int]
+        """
+
+        return self.update(total_price=self._line_items_total())
+
 
 class Cart(models.Model):
     """This is our cart model."""
@@ -203,17 +550,38 @@ class Cart(models.Model):
         CustomerAccount, on_delete=models.CASCADE, null=True
     )
 
+    objects = CartQuerySet.as_manager()
+
     def calculate_total_price(self):
         """
-        A utility method to summ up the prices of all the line items in cart.
+        A utility method to summ up the prices of all the line items in cart,
+        with a single aggregate query.
         Populates total_price field.
         """
 
-        self.total_price = 0
+        self.total_price = LineItem.objects.filter(cart=self).aggregate(
+            total=Coalesce(Sum("price"), Value(Decimal(0)))
+        )["total"]
 
-        for li in LineItem.objects.filter(cart=self):
-            if li.cart is not None:
-                self.total_price += li.price
+    def _apply_total_price_delta(self, delta):
+        """
+        Add a price delta to total_price, atomically on the database side,
+        and refresh the field on this instance.
+        Cart mutations go through here instead of recalculating the whole cart.
+        """
+
+        if delta:
+            Cart.objects.filter(pk=self.pk).update(
+                total_price=F("total_price") + delta
+            )
+
+        self.refresh_from_db(fields=["total_price"])
+
+    def _reset_total_price(self):
+        """Reset total_price to 0, on the database side and on this instance."""
+
+        Cart.objects.filter(pk=self.pk).update(total_price=0)
+        self.total_price = 0
 
     def add_line_item(self, product, quantity):
         """
@@ -221,19 +589,25 @@ class Cart(models.Model):
         Essentially accessed from product view.
         """
 
-        li, created = LineItem.objects.get_or_create(product=product, cart=self)
+        with transaction.atomic():
+            li = (
+                LineItem.objects.select_for_update()
+                .filter(product=product, cart=self)
+                .first()
+            )
 
-        if not created:
-            li.quantity += quantity  # Update line item quantity.
-        else:
-            if quantity < 1000:  # Abort if quantity < 1000.
-                li.delete()
-                return
+            if li is not None:
+                previous_price = li.price
+                li.quantity += quantity  # Update line item quantity.
+            else:
+                if quantity < 1000:  # Abort if quantity < 1000.
+                    return
 
-            li.quantity = quantity
+                previous_price = 0
+                li = LineItem(product=product, cart=self, quantity=quantity)
 
-        li.save()
-        self.save()
+            li.save()
+            self._apply_total_price_delta(li.price - previous_price)
 
     def update_line_item(self, product, quantity):
         """
@@ -244,25 +618,46 @@ class Cart(models.Model):
         if quantity < 1000:  # Abort if quantity < 1000.
             return
 
-        li, created = LineItem.objects.update_or_create(product=product, cart=self)
+        with transaction.atomic():
+            li = (
+                LineItem.objects.select_for_update()
+                .filter(product=product, cart=self)
+                .first()
+            )
 
-        li.quantity = quantity
-        li.save()
-        self.save()
+            if li is not None:
+                previous_price = li.price
+            else:
+                previous_price = 0
+                li = LineItem(product=product, cart=self)
+
+            li.quantity = quantity
+            li.save()
+            self._apply_total_price_delta(li.price - previous_price)
 
     def remove_line_item(self, line_item):
         """Remove a line item from cart, update total price."""
 
-        line_item.delete()
-        self.save()
+        with transaction.atomic():
+            price = (
+                LineItem.objects.select_for_update()
+                .filter(pk=line_item.pk, cart=self)
+                .values_list("price", flat=True)
+                .first()
+            )
+
+            if price is None:  # Abort if line item is not in cart (anymore).
+                return
+
+            LineItem.objects.filter(pk=line_item.pk).delete()
+            self._apply_total_price_delta(-price)
 
     def empty_cart(self):
         """Remove all line items from cart, reset total price to 0."""
 
-        for li in self.lineitem_set.all():
-            li.delete()
-
-        self.save()
+        with transaction.atomic():
+            self.lineitem_set.all().delete()
+            self._reset_total_price()
 
     def make_order(self):
         """
@@ -271,32 +666,75 @@ class Cart(models.Model):
         rather we create a new Order object,
         link the line items to it and then unlink them from the cart.
 
+        Everything happens in a single transaction, with a constant number of queries
+        whatever the number of line items : they are moved to the order and priced
+        at the products' current prices with a single set-based UPDATE,
+        then the order totals are aggregated from the moved line items.
+
         returns : order[Order]
         """
 
-        if self.total_price == 0:  # abort if cart is empty
-            return
+        with transaction.atomic():
+            # Lock the cart, so that its line items can't be ordered twice.
+            Cart.objects.select_for_update().filter(pk=self.pk).values_list("pk").get()
 
-        order = Order.objects.create()
-        order.add_comment()
-        order.customer_account = self.customer_account
+            if not self.lineitem_set.exists():  # abort if cart is empty
+                return
 
-        for li in self.lineitem_set.all():
-            li.order = order
-            li.cart = None
-            li.save()
+            order = Order.objects.create(customer_account=self.customer_account)
 
-        order.save()
-        self.save()
+            product_price = Product.objects.filter(pk=OuterRef("product")).values("price")[:1]
+            self.lineitem_set.update(
+                order=order, cart=None, price=Subquery(product_price) * F("quantity")
+            )
+
+            order.calculate_total_price()
+            order.vat_amount, order.incl_vat_price = get_VAT_prices(order.total_price)
+            Order.objects.filter(pk=order.pk).update(
+                total_price=order.total_price,
+                vat_amount=order.vat_amount,
+                incl_vat_price=order.incl_vat_price,
+            )
+            order.add_comment()
+
+            self._reset_total_price()
 
         return order
 
-    def save(self, *args, **kwargs):
-        """We calculate the total price to populate / update the field."""
 
-        self.calculate_total_price()
+class SequenceManager(models.Manager):
+    """Our sequence model manager."""
 
-        return super().save(*args, **kwargs)
+    def reserve(self, name, size=1):
+        """
+        Atomically reserve "size" consecutive values of sequence "name",
+        return the first one.
+        """
+
+        with transaction.atomic():
+            self.get_or_create(name=name)
+            self.filter(name=name).update(last_value=F("last_value") + size)
+            last_value = self.filter(name=name).values_list("last_value", flat=True).get()
+
+        return last_value - size + 1
+
+
+class Sequence(models.Model):
+    """A named counter, aimed to allocate unique numbers without any lookup."""
+
+    name = models.CharField(max_length=50, primary_key=True)
+    last_value = models.BigIntegerField(default=0)
+
+    objects = SequenceManager()
+
+    def __str__(self) -> str:
+        return self.name
+
+
+ref_number_allocator = BlockAllocator(
+    reserve=lambda size: Sequence.objects.reserve("order_ref_number", size),
+    block_size=100,
+)
 
 
 class Order(models.Model):
@@ -335,6 +773,8 @@ class Order(models.Model):
     vat_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     incl_vat_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     date_created = models.DateTimeField(default=timezone.now)
+    # Bumped along with the comments and line items too, see signals.py.
+    date_modified = models.DateTimeField(auto_now=True)
     ref_number = models.CharField(
         max_length=20, blank=True
     )  # generated in self.save() method.
@@ -347,34 +787,37 @@ class Order(models.Model):
         return self.ref_number
 
     def calculate_total_price(self):
-        """A utility method to summ up the prices of all the line items in order."""
-
-        self.total_price = 0
+        """
+        A utility method to summ up the prices of all the line items in order,
+        with a single aggregate query.
+        """
 
-        for li in LineItem.objects.filter(order=self):
-            self.total_price += li.price
+        self.total_price = LineItem.objects.filter(order=self).aggregate(
+            total=Coalesce(Sum("price"), Value(Decimal(0)))
+        )["total"]
 
     def add_comment(self, content="La commande vient d'être créée."):
         """Add a new comment to order."""
 
-        comment = Comment.objects.create(content=content, order=self)
-        comment.save()
+        Comment.objects.create(content=content, order=self)
 
     def save(self, *args, **kwargs):
         """
-        We get a random ref_number to populate the field,
+        We get a unique ref_number to populate the field,
         populate slug field,
         calculate the total price to populate the field,
         and finally populate vat_amount and incl_vat_price fields.
+        A new order can't have line items yet, so its total price is kept as given.
         """
 
         if not self.ref_number:
-            self.ref_number = unique_ref_number_generator(self)
+            self.ref_number = encode_ref_number(ref_number_allocator.allocate())
 
         if not self.slug:
             self.slug = slugify(self.ref_number)
 
-        self.calculate_total_price()
+        if not self._state.adding:
+            self.calculate_total_price()
         self.vat_amount, self.incl_vat_price = get_VAT_prices(self.total_price)
 
         return super().save(*args, **kwargs)
@@ -394,11 +837,29 @@ class Comment(models.Model):
 class LineItem(models.Model):
     """This is our line item model."""
 
+    class Meta:
+        indexes = [
+            # Cart line items, by product too (see Cart.add_line_item).
+            models.Index(
+                fields=["cart", "product"],
+                condition=Q(cart__isnull=False),
+                name="lineitem_cart_idx",
+            ),
+            models.Index(
+                fields=["order"], condition=Q(order__isnull=False), name="lineitem_order_idx"
+            ),
+        ]
+
     product = models.ForeignKey(Product, on_delete=models.PROTECT)
     quantity = models.IntegerField(default=1000)
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, null=True, blank=True)
-    order = models.ForeignKey(Order, on_delete=models.CASCADE, null=True, blank=True)
+    # Indexed by partial indexes, a line item being either in a cart or in an order.
+    cart = models.ForeignKey(
+        Cart, on_delete=models.CASCADE, null=True, blank=True, db_index=False
+    )
+    order = models.ForeignKey(
+        Order, on_delete=models.CASCADE, null=True, blank=True, db_index=False
+    )
 
     def save(self, *args, **kwargs):
         """
@@ -416,6 +877,45 @@ class LineItem(models.Model):
         return super().save(*args, **kwargs)
 
 
+class ConversationQuerySet(models.QuerySet):
+    """Our conversation queryset, with the inbox of a user."""
+
+    def inbox(self, user):
+        """
+        The user's conversations, most recently active first, each with :
+        - counterparts : the other participants (prefetched, one query for the page),
+        - last_message_content and last_message_date,
+        - unread_count : read from the user's unread counter.
+        Two queries whatever the number of conversations.
+        """
+
+        last_message = Message.objects.filter(conversation=OuterRef("pk")).order_by(
+            "-date_created", "-id"
+        )
+        unread = UnreadCounter.objects.filter(
+            conversation=OuterRef("pk"), user=user
+        ).values("count")[:1]
+
+        return (
+            self.filter(participants=user)
+            .annotate(
+                last_message_content=Subquery(last_message.values("content")[:1]),
+                last_message_date=Subquery(last_message.values("date_created")[:1]),
+                unread_count=Coalesce(Subquery(unread), 0),
+            )
+            .prefetch_related(
+                models.Prefetch(
+                    "participants",
+                    queryset=User.objects.exclude(pk=user.pk).only(
+                        "first_name", "last_name", "role"
+                    ),
+                    to_attr="counterparts",
+                )
+            )
+            .order_by("-date_modified", "-pk")
+        )
+
+
 class Conversation(models.Model):
     """This is our conversation model."""
 
@@ -424,6 +924,8 @@ class Conversation(models.Model):
     date_created = models.DateTimeField(default=timezone.now)
     date_modified = models.DateTimeField(default=timezone.now)
 
+    objects = ConversationQuerySet.as_manager()
+
     def __str__(self) -> str:
         return self.subject
 
@@ -434,15 +936,327 @@ class Conversation(models.Model):
         self.date_modified = timezone.now()
         self.save()
 
+    def mark_read(self, user):
+        """
+        Mark the messages of the other participants as read by user,
+        log them for synchronization (one UPDATE and one INSERT, if any),
+        and reset user's unread counter.
+        """
+
+        with transaction.atomic():
+            unread = list(
+                self.message_set.filter(is_read=False)
+                .exclude(author=user)
+                .values_list("pk", flat=True)
+            )
+            if unread:
+                Message.objects.filter(pk__in=unread).update(
+                    is_read=True, date_modified=timezone.now()
+                )
+                ChangeLogEntry.objects.log_many(
+                    Message, unread, ChangeLogEntry.UPDATED, conversation_id=self.pk
+                )
+            UnreadCounter.objects.filter(conversation=self, user=user, count__gt=0).update(
+                count=0
+            )
+
+        return len(unread)
+
+
+class MessageQuerySet(models.QuerySet):
+    """Our message queryset, with keyset (aka cursor) based windows."""
+
+    def window(self, size, before=None, after=None):
+        """
+        A window of "size" messages, in chronological order :
+        the last ones, those right before message "before",
+        or those right after message "after".
+        Keyset pagination on (date_created, id), served by the
+        (conversation, date_created, id) index : the cost is proportional to size,
+        not to the number of messages in the conversation.
+        Meant to be called on the messages of a single conversation.
+        """
+
+        messages = self
+
+        if after is not None:
+            pivot = Subquery(self.filter(pk=after).values("date_created")[:1])
+            messages = messages.filter(
+                Q(date_created__gte=pivot) & (Q(date_created__gt=pivot) | Q(pk__gt=after))
+            )
+            window = messages.order_by("date_created", "id")[:size]
+        else:
+            if before is not None:
+                pivot = Subquery(self.filter(pk=before).values("date_created")[:1])
+                messages = messages.filter(
+                    Q(date_created__lte=pivot)
+                    & (Q(date_created__lt=pivot) | Q(pk__lt=before))
+                )
+            window = messages.order_by("-date_created", "-id")[:size]
+
+        return self.filter(pk__in=window.values("pk")).order_by("date_created", "id")
+
 
 class Message(models.Model):
     """This is our message model, related to conversation model."""
 
     class Meta:
-        ordering = ["date_created"]
+        ordering = ["date_created", "id"]
+        indexes = [
+            models.Index(
+                fields=["conversation", "date_created", "id"],
+                name="message_conversation_date_idx",
+            ),
+            # Watermarks of conversations (see ventAPI/conditional.py).
+            models.Index(
+                fields=["conversation", "date_modified"],
+                name="message_conversation_mod_idx",
+            ),
+        ]
 
     author = models.ForeignKey(User, on_delete=models.PROTECT)
     date_created = models.DateTimeField(default=timezone.now)
+    date_modified = models.DateTimeField(auto_now=True)
     content = models.CharField(max_length=5000, null=False)
     is_read = models.BooleanField(default=False, null=False)
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, null=False)
+
+    objects = MessageQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The read state as loaded (None if deferred), see save().
+        instance._loaded_is_read = instance.__dict__.get("is_read")
+
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Count a new unread message for the other participants of the conversation,
+        and count it out (or in again) when it's marked read (or unread).
+        """
+
+        adding = self._state.adding
+        loaded_is_read = getattr(self, "_loaded_is_read", None)
+        update_fields = kwargs.get("update_fields")
+        is_read_saved = update_fields is None or "is_read" in update_fields
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            others = UnreadCounter.objects.filter(
+                conversation_id=self.conversation_id
+            ).exclude(user_id=self.author_id)
+            if adding and not self.is_read:
+                others.update(count=F("count") + 1)
+            elif (
+                not adding
+                and is_read_saved
+                and loaded_is_read is not None
+                and loaded_is_read != self.is_read
+            ):
+                if self.is_read:
+                    others.filter(count__gt=0).update(count=F("count") - 1)
+                else:
+                    others.update(count=F("count") + 1)
+
+        if is_read_saved:
+            self._loaded_is_read = self.is_read
+
+
+class UnreadCounterQuerySet(models.QuerySet):
+    """Our unread counter queryset, with set-based tools to check and repair counts."""
+
+    def total_for(self, user):
+        """Unread messages of user, all conversations together."""
+
+        return self.filter(user=user).aggregate(total=Coalesce(Sum("count"), 0))["total"]
+
+    def _unread_messages(self):
+        """Subquery counting the unread messages of the other participants."""
+
+        unread_messages = (
+            Message.objects.filter(conversation=OuterRef("conversation"), is_read=False)
+            .exclude(author=OuterRef("user"))
+            .order_by()
+            .values("conversation")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+
+        return Coalesce(Subquery(unread_messages), 0)
+
+    def with_unread_messages(self):
+        """Annotate each counter with the actual number of unread messages it counts."""
+
+        return self.annotate(unread_messages=self._unread_messages())
+
+    def drifted(self):
+        """Counters whose count differs from the number of unread messages."""
+
+        return self.with_unread_messages().exclude(count=F("unread_messages"))
+
+    def recalculate(self):
+        """
+        Recount every counter in the queryset, with a single UPDATE statement.
+
+        returns : number of counters updated[int]
+        """
+
+        return self.update(count=self._unread_messages())
+
+
+class UnreadCounter(models.Model):
+    """
+    Unread messages of a user in a conversation, maintained on message creation,
+    read state changes and deletion, and on Conversation.mark_read(), so badges
+    don't count messages. One per participant, see signals.py.
+    Drifted counts are repaired by the check_unread_counters command.
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "conversation"], name="unreadcounter_unique_participant"
+            )
+        ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE)
+    count = models.PositiveIntegerField(default=0)
+
+    objects = UnreadCounterQuerySet.as_manager()
+
+    def __str__(self) -> str:
+        return f"{self.user} : {self.count} in {self.conversation}"
+
+
+class ChangeLogQuerySet(models.QuerySet):
+    """Our change log queryset : what changed, for whom."""
+
+    def scope(self, instance):
+        """Customer account or conversation a change is visible through."""
+
+        if isinstance(instance, Order):
+            return {"account_id": instance.customer_account_id}
+        if isinstance(instance, Comment):
+            return {
+                "account_id": Order.objects.filter(pk=instance.order_id)
+                .values_list("customer_account_id", flat=True)
+                .first()
+            }
+        if isinstance(instance, Message):
+            return {"conversation_id": instance.conversation_id}
+
+        return {"conversation_id": instance.pk}
+
+    def log(self, instance, action):
+        """Log a change of a synchronized object."""
+
+        return self.create(
+            model=instance._meta.model_name,
+            object_id=instance.pk,
+            action=action,
+            **self.scope(instance),
+        )
+
+    def log_many(self, model, pks, action, **scope):
+        """Log the same change of many objects of a model, in one query."""
+
+        return self.bulk_create(
+            [
+                self.model(model=model._meta.model_name, object_id=pk, action=action, **scope)
+                for pk in pks
+            ]
+        )
+
+    def pruned_up_to(self):
+        """Id of the last pruned entry : changes since an earlier one are lost."""
+
+        return (
+            Sequence.objects.filter(name=ChangeLogEntry.PRUNED_SEQUENCE)
+            .values_list("last_value", flat=True)
+            .first()
+            or 0
+        )
+
+    def head(self):
+        """Id of the last entry : the cursor of a client up to date right now."""
+
+        return self.aggregate(head=models.Max("pk"))["head"] or self.pruned_up_to()
+
+    def prune(self, before):
+        """Delete the entries older than date before, return their number."""
+
+        with transaction.atomic():
+            old = self.filter(date_created__lt=before)
+            last = old.aggregate(last=models.Max("pk"))["last"]
+            if last is None:
+                return 0
+
+            count, _ = self.filter(pk__lte=last).delete()
+            Sequence.objects.update_or_create(
+                name=ChangeLogEntry.PRUNED_SEQUENCE, defaults={"last_value": last}
+            )
+
+        return count
+
+    def visible_to(self, user):
+        """Changes of the user's orders (as customer or related employee) and conversations."""
+
+        if user.role == "EMPLOYEE":
+            # No reg_number (e.g. deactivated) : not the unassigned customers' employee.
+            accounts = CustomerAccount.objects.filter(
+                employee_reg=user.reg_number, employee_reg__isnull=False
+            )
+        else:
+            accounts = CustomerAccount.objects.filter(customer=user)
+        conversations = Conversation.participants.through.objects.filter(user=user)
+
+        return self.filter(
+            Q(account_id__in=accounts.values("pk"))
+            | Q(conversation_id__in=conversations.values("conversation_id"))
+        )
+
+
+class ChangeLogEntry(models.Model):
+    """
+    A creation, update or deletion of a synchronized object (orders, comments,
+    conversations, messages), logged by signals.py : clients fetch the changes since
+    their last entry id, deletions included, see ventAPI SyncViewSet.
+    The scope fields are no foreign keys, so that deletions are kept.
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["account_id", "id"], name="changelog_account_idx"),
+            models.Index(fields=["conversation_id", "id"], name="changelog_conversation_idx"),
+        ]
+
+    # Synchronized models, by model_name.
+    MODELS = {
+        "order": Order,
+        "comment": Comment,
+        "message": Message,
+        "conversation": Conversation,
+    }
+    PRUNED_SEQUENCE = "changelog_pruned"
+
+    CREATED = "C"
+    UPDATED = "U"
+    DELETED = "D"
+    ACTION_CHOICES = [(CREATED, "created"), (UPDATED, "updated"), (DELETED, "deleted")]
+
+    id = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=1, choices=ACTION_CHOICES)
+    account_id = models.BigIntegerField(null=True, blank=True)
+    conversation_id = models.BigIntegerField(null=True, blank=True)
+    date_created = models.DateTimeField(default=timezone.now)
+
+    objects = ChangeLogQuerySet.as_manager()
+
+    def __str__(self) -> str:
+        return f"{self.get_action_display()} {self.model} {self.object_id}"
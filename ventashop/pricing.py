@@ -0,0 +1,97 @@
+"""Our product repricing module : rule-based, set-based price updates."""
+
+import time
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Round
+
+from ventashop.catalogue import bump_catalogue_version
+from ventashop.models import Cart, LineItem, Product
+
+
+def select_products(category=None, created_before=None):
+    """
+    Products matched by repricing rules.
+
+    Args:
+        category (str): category slug, optional.
+        created_before (datetime): creation date cutoff, optional.
+
+    Returns:
+        products (QuerySet).
+    """
+
+    products = Product.objects.all()
+
+    if category is not None:
+        products = products.filter(category__slug=category)
+
+    if created_before is not None:
+        products = products.filter(date_created__lt=created_before)
+
+    return products
+
+
+def reprice_products(products, ratio, batch_size=1000):
+    """
+    Multiply the price of products by ratio, batch after batch (by primary key),
+    with set-based UPDATEs. In the same transaction, the line items of open carts
+    are repriced and the totals of these carts recalculated.
+    Line items of placed orders are left untouched.
+
+    Args:
+        products (QuerySet): products to reprice.
+        ratio (Decimal): e.g. 0.6 for a 40 % discount.
+        batch_size (int): products updated per transaction.
+
+    Yields:
+        report (dict): batch number, rows changed per table and elapsed seconds.
+    """
+
+    ratio = Decimal(ratio)
+    if ratio <= 0:
+        raise ValueError("The price ratio must be positive.")
+
+    product_ids = products.order_by("pk").values_list("pk", flat=True)
+    product_price = Product.objects.filter(pk=OuterRef("product_id")).values("price")
+    last_pk = 0
+    batch_number = 0
+
+    while True:
+        batch = list(product_ids.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return
+
+        batch_number += 1
+        start = time.perf_counter()
+
+        with transaction.atomic():
+            products_count = Product.objects.filter(pk__in=batch).update(
+                price=Round(F("price") * ratio, 2)
+            )
+
+            open_line_items = LineItem.objects.filter(
+                cart__isnull=False, product_id__in=batch
+            )
+            line_items_count = open_line_items.update(
+                price=Subquery(product_price) * F("quantity")
+            )
+
+            carts_count = Cart.objects.filter(
+                pk__in=open_line_items.values("cart_id")
+            ).recalculate_totals()
+
+            # Set-based updates send no signal.
+            transaction.on_commit(bump_catalogue_version)
+
+        last_pk = batch[-1]
+
+        yield {
+            "batch": batch_number,
+            "products": products_count,
+            "line_items": line_items_count,
+            "carts": carts_count,
+            "elapsed": time.perf_counter() - start,
+        }
@@ -0,0 +1,174 @@
+"""
+Our query profiler module : the SQL queries of each request, N+1 patterns and budgets.
+
+QueryProfilerMiddleware (opt-in, see QUERY_PROFILER in settings) records the queries
+of every request, and logs :
+- repeated query shapes (the same SQL but for its parameters, run at least
+  QUERY_PROFILER_REPEAT_THRESHOLD times), with the project code frame running them,
+- requests running more queries than their view's query_budget class attribute.
+With DEBUG on, the numbers are exposed in an X-Queries response header.
+Tests use the same recording through profile_queries() (see tests/utils_tests.py).
+"""
+
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = str(settings.BASE_DIR) + os.sep
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+
+def query_shape(sql):
+    """SQL without its parameters and literals, IN lists of any length alike."""
+
+    sql = STRING_LITERAL.sub("?", sql)
+    sql = NUMBER_LITERAL.sub("?", sql)
+    sql = sql.replace("%s", "?")
+
+    return PLACEHOLDER_LIST.sub("(...)", sql)
+
+
+def project_frame():
+    """'path:line in function' of the innermost project code frame, or None."""
+
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(PROJECT_ROOT)
+            and filename != __file__
+            and "site-packages" not in filename
+        ):
+            path = filename[len(PROJECT_ROOT) :]
+            return f"{path}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+
+    return None
+
+
+class QueryProfile:
+    """
+    The queries run through a connection, recorded as an execute wrapper :
+    (sql, duration in seconds, project frame) tuples.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        frame = project_frame()
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start, frame))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        """Time spent in queries, in seconds."""
+
+        return sum(duration for _, duration, _ in self.queries)
+
+    def repeated(self, threshold=None):
+        """
+        Query shapes run at least threshold times (e.g. in a loop, an N+1 pattern).
+
+        Returns:
+            repeated (list): (shape, count, frame of its first run) tuples, most run first.
+        """
+
+        if threshold is None:
+            threshold = getattr(settings, "QUERY_PROFILER_REPEAT_THRESHOLD", 3)
+
+        shapes = Counter()
+        frames = {}
+        for sql, _, frame in self.queries:
+            shape = query_shape(sql)
+            shapes[shape] += 1
+            frames.setdefault(shape, frame)
+
+        return [
+            (shape, count, frames[shape])
+            for shape, count in shapes.most_common()
+            if count >= threshold
+        ]
+
+    def problems(self, budget=None, threshold=None):
+        """Descriptions of the repeated query shapes, and of a budget overrun."""
+
+        problems = [
+            f"{count} x {shape[:200]} (from {frame})"
+            for shape, count, frame in self.repeated(threshold)
+        ]
+        if budget is not None and self.count > budget:
+            problems.append(f"{self.count} queries, over a budget of {budget}")
+
+        return problems
+
+
+@contextmanager
+def profile_queries(using=DEFAULT_DB_ALIAS):
+    """Record the queries run through a connection, in a QueryProfile."""
+
+    profile = QueryProfile()
+    with connections[using].execute_wrapper(profile):
+        yield profile
+
+
+def get_query_budget(view_func):
+    """query_budget of a view's class (Django view or DRF viewset), or None."""
+
+    view_class = getattr(view_func, "view_class", None) or getattr(view_func, "cls", None)
+
+    return getattr(view_class, "query_budget", None)
+
+
+class QueryProfilerMiddleware:
+    """Middleware recording and checking the queries of each request (see module docstring)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.query_budget = None
+
+        with profile_queries() as profile:
+            response = self.get_response(request)
+
+        problems = profile.problems(budget=request.query_budget)
+        for problem in problems:
+            logger.warning("%s %s : %s", request.method, request.path, problem)
+
+        # Available to tests, through the test client's responses.
+        response.query_profile = profile
+        response.query_budget = request.query_budget
+
+        if settings.DEBUG:
+            header = (
+                f"count={profile.count}; time_ms={profile.duration * 1000:.1f}; "
+                f"repeated={len(profile.repeated())}"
+            )
+            if request.query_budget is not None:
+                header += f"; budget={request.query_budget}"
+            response["X-Queries"] = header
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func)
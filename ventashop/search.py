@@ -0,0 +1,118 @@
+"""
+Our product search module : ranked full-text search on product name and description,
+with prefix matching for type-ahead.
+
+Backed by a text index, see migration 0009 :
+- Postgres : stored generated tsvector column search_vector (name weighted before
+  description), with a GIN index. Ranking reads the stored vector instead of
+  parsing every matching product again.
+- SQLite : FTS5 table ventashop_product_fts, kept in sync by triggers,
+  results ranked by the number of words found in the product name.
+Other databases fall back to unindexed icontains lookups.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, Case, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from ventashop.models import Product
+
+SEARCH_CONFIG = "french"
+SQLITE_FTS_TABLE = "ventashop_product_fts"
+MIN_PREFIX_LENGTH = 3  # Shorter prefixes match too many products to be useful.
+
+
+def search_terms(query):
+    """Words of a search query, without any search syntax."""
+
+    return re.findall(r"\w+", query.lower())[:10]
+
+
+def _is_prefix(term):
+    return len(term) >= MIN_PREFIX_LENGTH
+
+
+def _postgres_search(products, terms):
+    # Every word, the last one being a prefix (type-ahead).
+    last = terms[-1] + ":*" if _is_prefix(terms[-1]) else terms[-1]
+    query = " & ".join(terms[:-1] + [last])
+    tsquery = "to_tsquery(%s::regconfig, %s)"
+    params = [SEARCH_CONFIG, query]
+
+    return products.filter(
+        RawSQL(
+            f"ventashop_product.search_vector @@ {tsquery}",
+            params,
+            output_field=BooleanField(),
+        )
+    ).annotate(
+        rank=RawSQL(
+            f"ts_rank(ventashop_product.search_vector, {tsquery})",
+            params,
+            output_field=FloatField(),
+        )
+    )
+
+
+def _name_rank(terms):
+    """Number of terms found in the product name : a cheap rank, name matches first."""
+
+    return sum(
+        (Case(When(name__icontains=term, then=1.0), default=0.0) for term in terms),
+        Value(0.0),
+    )
+
+
+def _sqlite_search(products, terms):
+    # Quoted words, the last one being a prefix (type-ahead).
+    match = " ".join(f'"{term}"' for term in terms)
+    if _is_prefix(terms[-1]):
+        match += "*"
+    matches = RawSQL(
+        f"SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s", [match]
+    )
+
+    # bm25() would run the full-text query again for each product found.
+    return products.filter(pk__in=matches).annotate(rank=_name_rank(terms))
+
+
+def _fallback_search(products, terms):
+    condition = Q()
+    for term in terms:
+        condition &= Q(name__icontains=term) | Q(description__icontains=term)
+
+    return products.filter(condition).annotate(rank=_name_rank(terms))
+
+
+def search_products(query, category=None):
+    """
+    Products matching every word of query, the last one as a prefix,
+    best ranked first (name matches before description matches).
+
+    Args:
+        query (str): words typed by the user.
+        category (str): category slug, optional.
+
+    Returns:
+        products (QuerySet), annotated with rank.
+    """
+
+    terms = search_terms(query)
+    products = Product.objects.all()
+
+    if category is not None:
+        products = products.filter(category__slug=category)
+
+    if not terms:
+        return products.none()
+
+    if connection.vendor == "postgresql":
+        products = _postgres_search(products, terms)
+    elif connection.vendor == "sqlite":
+        products = _sqlite_search(products, terms)
+    else:
+        products = _fallback_search(products, terms)
+
+    return products.order_by("-rank", "name")
@@ -0,0 +1,159 @@
+"""Our signal receivers module, connected in apps.py."""
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django_cleanup.signals import cleanup_post_delete
+
+from ventashop.catalogue import bump_catalogue_version
+from ventashop.events import publish_message
+from ventashop.images import delete_variants, schedule_product_variants
+from ventashop.models import (
+    Category,
+    ChangeLogEntry,
+    Comment,
+    Conversation,
+    LineItem,
+    Message,
+    Order,
+    Product,
+    UnreadCounter,
+)
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def sync_unread_counters(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep one unread counter per conversation participant.
+    A new participant starts with no unread message.
+    """
+
+    # instance is a user when participants are edited from the user side.
+    if reverse:
+        counters = UnreadCounter.objects.filter(user=instance)
+        new_counters = [UnreadCounter(user=instance, conversation_id=pk) for pk in pk_set or ()]
+        removed = {"conversation_id__in": pk_set}
+    else:
+        counters = UnreadCounter.objects.filter(conversation=instance)
+        new_counters = [UnreadCounter(user_id=pk, conversation=instance) for pk in pk_set or ()]
+        removed = {"user_id__in": pk_set}
+
+    if action == "post_add":
+        UnreadCounter.objects.bulk_create(new_counters, ignore_conflicts=True)
+    elif action == "post_remove":
+        counters.filter(**removed).delete()
+    elif action == "post_clear":
+        counters.delete()
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def touch_conversation(sender, instance, action, reverse, pk_set, **kwargs):
+    """A conversation is modified by its participants changes (see ventAPI/conditional.py)."""
+
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+
+    if not reverse:
+        conversations = Conversation.objects.filter(pk=instance.pk)
+    elif action == "pre_clear":
+        conversations = Conversation.objects.filter(participants=instance)
+    else:
+        conversations = Conversation.objects.filter(pk__in=pk_set)
+
+    conversations.update(date_modified=timezone.now())
+    ChangeLogEntry.objects.bulk_create(
+        [
+            ChangeLogEntry(
+                model="conversation",
+                object_id=pk,
+                action=ChangeLogEntry.UPDATED,
+                conversation_id=pk,
+            )
+            for pk in conversations.values_list("pk", flat=True)
+        ]
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=LineItem)
+@receiver(post_delete, sender=LineItem)
+def touch_order(sender, instance, **kwargs):
+    """An order is modified by its comments and line items changes."""
+
+    if instance.order_id is not None:
+        Order.objects.filter(pk=instance.order_id).update(date_modified=timezone.now())
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Message)
+@receiver(post_save, sender=Conversation)
+def log_saved(sender, instance, created, **kwargs):
+    """Log changes for synchronization, see ventAPI SyncViewSet."""
+
+    action = ChangeLogEntry.CREATED if created else ChangeLogEntry.UPDATED
+    ChangeLogEntry.objects.log(instance, action)
+
+
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Message)
+@receiver(post_delete, sender=Conversation)
+def log_deleted(sender, instance, **kwargs):
+    """Log deletions (tombstones) for synchronization."""
+
+    ChangeLogEntry.objects.log(instance, ChangeLogEntry.DELETED)
+
+
+@receiver(post_delete, sender=Message)
+def count_out_deleted_message(sender, instance, **kwargs):
+    """A deleted unread message is no longer counted by the other participants."""
+
+    if not instance.is_read:
+        UnreadCounter.objects.filter(
+            conversation_id=instance.conversation_id, count__gt=0
+        ).exclude(user_id=instance.author_id).update(count=F("count") - 1)
+
+
+@receiver(post_save, sender=Message)
+def push_new_message(sender, instance, created, **kwargs):
+    """Push a new message to the connected participants, see events.py."""
+
+    if created:
+        publish_message(instance)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalogue(sender, **kwargs):
+    """Cached catalogue pages are outdated once committed, see catalogue.py."""
+
+    transaction.on_commit(bump_catalogue_version)
+
+
+@receiver(post_save, sender=Product)
+def update_image_variants(sender, instance, **kwargs):
+    """Variants of a new product image are generated in the background, see images.py."""
+
+    if instance.image and instance.variants.get("source") != instance.image.name:
+        schedule_product_variants(instance.pk)
+
+    elif not instance.image and instance.variants:
+        Product.objects.filter(pk=instance.pk).update(variants={})
+
+
+@receiver(cleanup_post_delete, sender=Product)
+def delete_image_variants(sender, file_name, field_name, success, **kwargs):
+    """
+    Variants are deleted along with the image replaced or deleted by django_cleanup,
+    unless another product still uses it (see storage.py).
+    """
+
+    storage = kwargs["file"].storage
+    if field_name == "image" and success and not storage.exists(file_name):
+        delete_variants(file_name, storage)
@@ -1,3 +1,104 @@
 // Custom script
 
-console.log("Hi from script.js");
\ No newline at end of file
+console.log("Hi from script.js");
+
+// New messages of the displayed conversation : pushed by the server (Server-Sent Events)
+// when the stream is enabled, polled otherwise.
+const messageList = document.getElementById("message-list");
+const MESSAGE_POLL_INTERVAL = 10000; // ms
+
+function lastMessageId() {
+    const rows = messageList.querySelectorAll("[data-message-id]");
+    return rows.length ? rows[rows.length - 1].dataset.messageId : "";
+}
+
+if (messageList && messageList.dataset.pollUrl) {
+    setInterval(async () => {
+        const response = await fetch(messageList.dataset.pollUrl + "?after=" + lastMessageId());
+        if (!response.ok) {
+            return;
+        }
+        const page = new DOMParser().parseFromString(await response.text(), "text/html");
+        for (const row of page.querySelectorAll("#message-list [data-message-id]")) {
+            if (!messageList.querySelector(`[data-message-id="${row.dataset.messageId}"]`)) {
+                messageList.appendChild(document.importNode(row, true));
+            }
+        }
+    }, MESSAGE_POLL_INTERVAL);
+}
+
+if (messageList && messageList.dataset.streamUrl && window.EventSource) {
+    const source = new EventSource(messageList.dataset.streamUrl + "?after=" + lastMessageId());
+
+    source.addEventListener("message", (e) => {
+        const message = JSON.parse(e.data);
+        if (messageList.querySelector(`[data-message-id="${message.id}"]`)) {
+            return;
+        }
+        const own = message.author === messageList.dataset.userEmail;
+
+        const row = document.createElement("div");
+        row.className = "row";
+        row.dataset.messageId = message.id;
+
+        const spacer = document.createElement("div");
+        spacer.className = "col-4";
+        const col = document.createElement("div");
+        col.className = "col-8";
+        const card = document.createElement("div");
+        card.className = own ? "card text-end" : "card";
+
+        const header = document.createElement("div");
+        header.className = "card-header";
+        header.textContent = own ? "Vous avez écrit :" : `${message.author} a écrit :`;
+        const body = document.createElement("div");
+        body.className = "card-body";
+        const text = document.createElement("p");
+        text.className = "card-text";
+        text.textContent = message.content;
+        body.appendChild(text);
+
+        card.append(header, body);
+        col.appendChild(card);
+        if (own) {
+            row.append(spacer, col);
+        } else {
+            row.append(col, spacer);
+        }
+        messageList.appendChild(row);
+    });
+}
+
+// Next catalogue pages, appended when the "Produits suivants" link comes into view.
+const productsMore = document.getElementById("products-more");
+const productList = document.getElementById("product-list");
+
+if (productsMore && productList && window.IntersectionObserver) {
+    let loading = false;
+
+    const observer = new IntersectionObserver(async (entries) => {
+        if (!entries[0].isIntersecting || loading) {
+            return;
+        }
+        loading = true;
+
+        const response = await fetch(productsMore.dataset.pageUrl);
+        const page = document.createElement("template");
+        page.innerHTML = await response.text();
+
+        const next = page.content.querySelector("[data-next-page-url]");
+        next.remove();
+        productList.appendChild(page.content);
+
+        if (next.dataset.nextPageUrl) {
+            productsMore.href = next.dataset.nextUrl;
+            productsMore.dataset.pageUrl = next.dataset.nextPageUrl;
+            loading = false;
+        } else {
+            observer.disconnect();
+            productsMore.remove();
+        }
+    });
+
+    observer.observe(productsMore);
+}
@@ -0,0 +1,89 @@
+"""
+Our content-hash media storage : files named after the SHA-256 of their bytes.
+
+Identical uploads are stored once, under the same name. A file is only deleted
+(e.g. by django_cleanup) once no database row references it any more,
+and its content never changes : it can be served with immutable, far-future caching.
+"""
+
+import hashlib
+import os
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+from django.utils.deconstruct import deconstructible
+
+# URL path pattern of content-hash names, and names derived from them (image variants).
+CONTENT_HASH_PATH = r"(?:[\w-]+/)*[0-9a-f]{2}/[0-9a-f]{64}(?:-\w+)?\.\w+"
+# Directory of the files derived from content-hash named ones (image variants, see
+# images.py) : already named after their source, they are stored under their own name.
+DERIVED_DIR = "variants"
+
+
+@deconstructible
+class ContentHashStorage(FileSystemStorage):
+    """File system storage addressing files by content hash, with reference counting."""
+
+    def content_name(self, name, content):
+        """
+        Name of a file from its content : e.g. product_img/2023/05/01/photo.JPG
+        becomes product_img/3f/3f2a...c9.jpg, dated folders being dropped.
+        """
+
+        sha256 = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            sha256.update(chunk)
+        content.seek(0)
+
+        digest = sha256.hexdigest()
+        root = name.split("/", 1)[0] if "/" in name else ""
+        extension = os.path.splitext(name)[1].lower()
+
+        return "/".join(filter(None, [root, digest[:2], digest + extension]))
+
+    def save(self, name, content, max_length=None):
+        """Store content once : an existing file with the same content is reused."""
+
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+
+        if not name.startswith(DERIVED_DIR + "/"):
+            name = self.content_name(name, content)
+
+        if self.exists(name):
+            return name
+
+        return self._save(name, content)
+
+    def references(self, name):
+        """Number of database rows referencing a file, in file fields using this storage."""
+
+        count = 0
+        for model in apps.get_models():
+            for field in model._meta.get_fields():
+                if isinstance(field, models.FileField) and field.storage is self:
+                    count += model._base_manager.filter(**{field.name: name}).count()
+
+        return count
+
+    def delete(self, name):
+        """Delete a file, unless still referenced."""
+
+        if self.references(name):
+            return
+
+        super().delete(name)
+
+
+product_image_storage = ContentHashStorage()
+
+
+def get_product_image_storage():
+    """Storage of product images (callable, so migrations don't serialize it)."""
+
+    return product_image_storage
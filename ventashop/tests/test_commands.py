@@ -0,0 +1,326 @@
+"""Our management commands' test module."""
+
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from ventashop.models import (
+    Cart,
+    Category,
+    ChangeLogEntry,
+    Comment,
+    Conversation,
+    CustomerAccount,
+    LineItem,
+    Message,
+    Order,
+    Product,
+    UnreadCounter,
+    User,
+)
+from ventashop.tests import utils_tests
+
+
+class CheckCartTotalsCommandTestCase(TestCase):
+    """Test class for our check_cart_totals command."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Arrange."""
+
+        cls.product1 = Product.objects.create(
+            name="product1",
+            description="description1",
+            price=4242,
+        )
+        cls.cart = Cart.objects.create()
+        cls.cart.add_line_item(cls.product1, 1000)
+
+    def test_no_drifted_cart(self):
+        """Check nothing is reported when totals are consistent."""
+
+        # Arrange.
+        out = StringIO()
+
+        # Act.
+        call_command("check_cart_totals", stdout=out)
+
+        # Assert.
+        self.assertIn("No drifted cart total.", out.getvalue())
+
+    def test_drifted_cart_detected(self):
+        """Check a drifted cart is reported and the command fails without --repair."""
+
+        # Arrange.
+        Cart.objects.filter(pk=self.cart.pk).update(total_price=1)
+        out = StringIO()
+
+        # Act, assert.
+        with self.assertRaises(CommandError):
+            call_command("check_cart_totals", stdout=out)
+        self.assertIn(f"Cart {self.cart.pk}", out.getvalue())
+        self.assertEqual(Cart.objects.get(pk=self.cart.pk).total_price, 1)
+
+    def test_drifted_cart_repaired(self):
+        """Check a drifted cart total is recalculated with --repair."""
+
+        # Arrange.
+        empty_cart = Cart.objects.create()
+        Cart.objects.filter(pk__in=[self.cart.pk, empty_cart.pk]).update(total_price=1)
+
+        # Act.
+        call_command("check_cart_totals", "--repair", stdout=StringIO())
+
+        # Assert.
+        self.assertEqual(Cart.objects.get(pk=self.cart.pk).total_price, 4242 * 1000)
+        self.assertEqual(Cart.objects.get(pk=empty_cart.pk).total_price, 0)
+        self.assertFalse(Cart.objects.drifted().exists())
+
+
+class CheckUnreadCountersCommandTestCase(TestCase):
+    """Test class for our check_unread_counters command."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Arrange."""
+
+        cls.employee = utils_tests.create_employee1()
+        cls.customer = utils_tests.create_customer1()
+        cls.conversation = Conversation.objects.get(participants=cls.customer)
+        cls.conversation.add_message(author=cls.customer, content="question")
+
+    def counter(self, user):
+        return UnreadCounter.objects.get(user=user, conversation=self.conversation)
+
+    def test_no_drifted_counter(self):
+        """Check nothing is reported when counters are consistent."""
+
+        # Arrange.
+        out = StringIO()
+
+        # Act.
+        call_command("check_unread_counters", stdout=out)
+
+        # Assert.
+        self.assertIn("No drifted unread counter.", out.getvalue())
+
+    def test_drifted_counter_detected(self):
+        """Check a drifted counter is reported and the command fails without --repair."""
+
+        # Arrange.
+        UnreadCounter.objects.filter(user=self.employee).update(count=5)
+        out = StringIO()
+
+        # Act, assert.
+        with self.assertRaises(CommandError):
+            call_command("check_unread_counters", stdout=out)
+        self.assertIn(f"Unread counter {self.counter(self.employee).pk}", out.getvalue())
+        self.assertEqual(self.counter(self.employee).count, 5)
+
+    def test_drifted_counters_repaired(self):
+        """Check drifted counters are recounted with --repair."""
+
+        # Arrange.
+        UnreadCounter.objects.update(count=3)
+
+        # Act.
+        call_command("check_unread_counters", "--repair", stdout=StringIO())
+
+        # Assert.
+        self.assertEqual(self.counter(self.employee).count, 1)
+        self.assertEqual(self.counter(self.customer).count, 0)
+        self.assertFalse(UnreadCounter.objects.drifted().exists())
+
+
+class RegNumberPoolCommandTestCase(TestCase):
+    """Test class for our reg_number_pool command."""
+
+    def test_pool_usage_report(self):
+        """Check used and free registration numbers are reported."""
+
+        # Arrange.
+        utils_tests.create_employee1()
+        out = StringIO()
+
+        # Act.
+        call_command("reg_number_pool", stdout=out)
+
+        # Assert.
+        self.assertIn("1 used, 9999 free, out of 10000", out.getvalue())
+
+
+class PruneChangeLogCommandTestCase(TestCase):
+    """Test class for our prune_changelog command."""
+
+    def test_old_entries_pruned(self):
+        """Check entries older than --days are deleted, and the pruned cursor recorded."""
+
+        # Arrange.
+        utils_tests.create_customer1()
+        old = list(ChangeLogEntry.objects.order_by("pk"))
+        ChangeLogEntry.objects.update(date_created=timezone.now() - timedelta(days=40))
+        recent = ChangeLogEntry.objects.log(old[0], ChangeLogEntry.UPDATED)
+        out = StringIO()
+
+        # Act.
+        call_command("prune_changelog", "--days", "30", stdout=out)
+
+        # Assert.
+        self.assertEqual(list(ChangeLogEntry.objects.all()), [recent])
+        self.assertEqual(ChangeLogEntry.objects.pruned_up_to(), old[-1].pk)
+        self.assertIn(f"{len(old)} change log entries pruned.", out.getvalue())
+
+
+class SeedVentalisCommandTestCase(TestCase):
+    """Test class for our seed_ventalis command."""
+
+    OPTIONS = [
+        "--employees=3",
+        "--customers=30",
+        "--categories=2",
+        "--products=20",
+        "--orders=120",
+        "--messages=200",
+        "--chunk-size=50",
+        "--force",
+    ]
+
+    def test_dataset_seeded(self):
+        """Check the requested rows are created, consistent with each other."""
+
+        # Act.
+        call_command("seed_ventalis", *self.OPTIONS, stdout=StringIO())
+
+        # Assert.
+        self.assertEqual(User.objects.filter(role="EMPLOYEE").count(), 3)
+        self.assertEqual(CustomerAccount.objects.count(), 30)
+        self.assertEqual(Cart.objects.count(), 30)
+        self.assertEqual(Conversation.objects.count(), 30)
+        self.assertEqual(UnreadCounter.objects.count(), 60)
+        self.assertEqual(Product.objects.count(), 20)
+        self.assertEqual(Order.objects.count(), 120)
+        self.assertEqual(Message.objects.count(), 200)
+        self.assertEqual(
+            UnreadCounter.objects.filter(count=1).count(),
+            Message.objects.filter(is_read=False).count(),
+        )
+        self.assertEqual(
+            Comment.objects.filter(content="La commande vient d'être créée.").count(), 120
+        )
+        self.assertFalse(Cart.objects.drifted().exists())
+        self.assertFalse(
+            LineItem.objects.filter(order__isnull=True, cart__isnull=True).exists()
+        )
+
+    def test_reproducible(self):
+        """Check a seed gives the same dataset."""
+
+        # Arrange.
+        call_command("seed_ventalis", *self.OPTIONS, stdout=StringIO())
+        first = list(Order.objects.order_by("ref_number").values_list("total_price", flat=True))
+        for model in (LineItem, Order, Message, Conversation, CustomerAccount, User):
+            model.objects.all().delete()
+        Product.objects.all().delete()
+        Category.objects.all().delete()
+
+        # Act.
+        call_command("seed_ventalis", *self.OPTIONS, stdout=StringIO())
+
+        # Assert.
+        second = list(Order.objects.order_by("ref_number").values_list("total_price", flat=True))
+        self.assertEqual(first, second)
+
+    def test_already_seeded(self):
+        """Check seeding twice is refused."""
+
+        # Arrange.
+        call_command("seed_ventalis", *self.OPTIONS, stdout=StringIO())
+
+        # Act / Assert.
+        with self.assertRaises(CommandError):
+            call_command("seed_ventalis", *self.OPTIONS, stdout=StringIO())
+
+
+class BenchmarkCommandTestCase(TestCase):
+    """Test class for our benchmark command."""
+
+    def setUp(self) -> None:
+        """Arrange : a temporary directory for reports."""
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.report_path = os.path.join(directory.name, "report.json")
+        self.baseline_path = os.path.join(directory.name, "baseline.json")
+
+    def run_benchmark(self, *args):
+        call_command(
+            "benchmark",
+            "--sizes=60",
+            "--repeat=1",
+            "--scenario=cart.make_order",
+            "--scenario=api.orders",
+            "--force",
+            *args,
+            stdout=StringIO(),
+        )
+
+    def test_report_written(self):
+        """Check every scenario of every size is measured, and rolled back."""
+
+        # Act.
+        self.run_benchmark(f"--output={self.report_path}")
+
+        # Assert.
+        with open(self.report_path) as f:
+            report = json.load(f)
+        scenarios = report["sizes"]["60"]["scenarios"]
+        self.assertEqual(list(scenarios), ["cart.make_order", "api.orders"])
+        self.assertEqual(scenarios["api.orders"]["queries"], 4)
+        self.assertGreater(scenarios["cart.make_order"]["wall_ms"], 0)
+        self.assertGreater(scenarios["cart.make_order"]["peak_kib"], 0)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(User.objects.exists())
+
+    def test_refused_without_debug(self):
+        """Check benchmarks aren't seeded with DEBUG off, unless forced."""
+
+        # Act / Assert.
+        with self.assertRaisesMessage(CommandError, "run again with --force"):
+            call_command("benchmark", "--sizes=60", "--repeat=1", stdout=StringIO())
+        self.assertFalse(User.objects.exists())
+
+    def test_regression_detected(self):
+        """Check a report with more queries than its baseline fails the comparison."""
+
+        # Arrange.
+        self.run_benchmark(f"--output={self.baseline_path}")
+        with open(self.baseline_path) as f:
+            report = json.load(f)
+        report["sizes"]["60"]["scenarios"]["api.orders"]["queries"] += 1
+        with open(self.report_path, "w") as f:
+            json.dump(report, f)
+        out = StringIO()
+
+        # Act / Assert.
+        call_command(
+            "benchmark",
+            f"--report={self.baseline_path}",
+            f"--baseline={self.baseline_path}",
+            stdout=out,
+        )
+        self.assertIn("No regression.", out.getvalue())
+        with self.assertRaisesMessage(CommandError, "1 regression(s) found."):
+            call_command(
+                "benchmark",
+                f"--report={self.report_path}",
+                f"--baseline={self.baseline_path}",
+                stdout=out,
+            )
+        self.assertIn("api.orders : queries 4 -> 5", out.getvalue())
@@ -0,0 +1,169 @@
+"""Our tests file for module events.py, and the message stream view."""
+
+import asyncio
+import json
+import threading
+
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.client import AsyncClient
+
+from ventashop.events import InProcessBroker, get_broker, message_event
+from ventashop.models import Conversation, Message
+from ventashop.tests import utils_tests
+
+
+class InProcessBrokerTestCase(SimpleTestCase):
+    """Test class for our in-process broker."""
+
+    async def test_fan_out_from_another_thread(self):
+        """Check an event published from a thread reaches the conversation's subscriptions."""
+
+        # Arrange.
+        broker = InProcessBroker()
+        subscription = broker.subscribe(1)
+        other = broker.subscribe(2)
+
+        # Act.
+        thread = threading.Thread(target=broker.publish, args=(1, {"id": 42}))
+        thread.start()
+        thread.join()
+        event = await asyncio.wait_for(subscription.queue.get(), 1)
+
+        # Assert.
+        self.assertEqual(event, {"id": 42})
+        self.assertTrue(other.queue.empty())
+
+    async def test_unsubscribe(self):
+        """Check unsubscribed clients are forgotten."""
+
+        # Arrange.
+        broker = InProcessBroker()
+        subscription = broker.subscribe(1)
+
+        # Act.
+        broker.unsubscribe(1, subscription)
+
+        # Assert.
+        self.assertEqual(broker.subscription_count(), 0)
+
+    async def test_overflow(self):
+        """Check a slow client's subscription is flagged instead of growing."""
+
+        # Arrange.
+        broker = InProcessBroker()
+        broker.queue_size = 2
+        subscription = broker.subscribe(1)
+
+        # Act.
+        for i in range(3):
+            broker.publish(1, {"id": i})
+        await asyncio.sleep(0)
+
+        # Assert.
+        self.assertEqual(subscription.queue.qsize(), 2)
+        self.assertTrue(subscription.overflowed)
+
+
+@override_settings(MESSAGE_STREAM_ENABLED=True)
+class MessageStreamViewTestCase(TestCase):
+    """Test class for our message stream view."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Arrange."""
+
+        cls.employee1 = utils_tests.create_employee1()
+        cls.customer1 = utils_tests.create_customer1()
+        cls.customer2 = utils_tests.create_customer2()
+        cls.conversation = Conversation.objects.get(participants=cls.customer1)
+        cls.messages = [
+            Message.objects.create(
+                author=cls.customer1,
+                content="content" + str(i),
+                conversation=cls.conversation,
+            )
+            for i in range(3)
+        ]
+        cls.url = f"/{cls.conversation.pk}/messages/stream/"
+
+    def setUp(self) -> None:
+        """Arrange : async clients, logged in as a participant and a non-participant."""
+
+        self.participant = AsyncClient()
+        self.outsider = AsyncClient()
+
+        for async_client, email in (
+            (self.participant, "customer1@test.com"),
+            (self.outsider, "customer2@test.com"),
+        ):
+            c = Client()
+            c.login(email=email, password="12345678&")
+            async_client.cookies = c.cookies
+
+    async def test_catch_up_then_live_messages(self):
+        """Check missed messages are sent first, then the published ones."""
+
+        # Act.
+        response = await self.participant.get(
+            self.url, headers={"Last-Event-ID": str(self.messages[0].pk)}
+        )
+        stream = response.streaming_content
+        chunks = [await anext(stream) for _ in range(3)]
+        subscription_count = get_broker().subscription_count()
+
+        new_message = await Message.objects.select_related("author").acreate(
+            author=self.employee1, content="live", conversation=self.conversation
+        )
+        get_broker().publish(self.conversation.pk, message_event(new_message))
+        live = await asyncio.wait_for(anext(stream), 1)
+        await stream.aclose()
+
+        # Assert.
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(chunks[0], b"retry: 3000\n\n")
+        self.assertIn(b"content1", chunks[1])
+        self.assertIn(b"content2", chunks[2])
+        self.assertIn(f"id: {new_message.pk}\n".encode(), live)
+        data = json.loads(live.decode().split("data: ")[1])
+        self.assertEqual(data["author"], "employee1@ventalis.com")
+        self.assertEqual(subscription_count, 1)
+
+    async def test_not_participant(self):
+        """Check only participants get the stream."""
+
+        # Act.
+        response = await self.outsider.get(self.url)
+
+        # Assert.
+        self.assertEqual(response.status_code, 401)
+
+    async def test_disabled(self):
+        """Check there is no stream unless enabled (served under ASGI)."""
+
+        # Act.
+        with override_settings(MESSAGE_STREAM_ENABLED=False):
+            response = await self.participant.get(self.url)
+
+        # Assert.
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_streams_or_polls(self):
+        """Check the conversation page streams new messages if enabled, polls otherwise."""
+
+        # Arrange.
+        c = Client()
+        c.login(email="customer1@test.com", password="12345678&")
+        url = f"/{self.conversation.pk}/messages/"
+
+        # Act.
+        streamed = c.get(url)
+        with override_settings(MESSAGE_STREAM_ENABLED=False):
+            polled = c.get(url)
+
+        # Assert.
+        self.assertContains(streamed, f'data-stream-url="{self.url}"')
+        self.assertNotContains(streamed, "data-poll-url")
+        self.assertContains(
+            polled, f'data-poll-url="/{self.conversation.pk}/messages/100"'
+        )
+        self.assertNotContains(polled, "data-stream-url")
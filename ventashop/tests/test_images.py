@@ -0,0 +1,161 @@
+"""Our tests file for module images.py : product image variants."""
+
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from ventashop.images import VARIANTS_DIR, build_variants, generate_product_variants
+from ventashop.models import Product
+from ventashop.storage import product_image_storage
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image(name="image.png", size=(1000, 500)):
+    """An uploaded PNG image."""
+
+    content = io.BytesIO()
+    Image.new("RGBA", size, (255, 0, 0, 128)).save(content, "PNG")
+
+    return SimpleUploadedFile(name, content.getvalue(), content_type="image/png")
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, PRODUCT_IMAGE_WORKERS=0)
+class ProductImageVariantsTestCase(TestCase):
+    """Test class for our product image variants."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def create_product(self):
+        """A product with an image, its variants generated."""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                name="product1", description="description1", price=1, image=make_image()
+            )
+        product.refresh_from_db()
+
+        return product
+
+    def test_build_variants(self):
+        """Check variants narrower than the original are built, in each format."""
+
+        # Arrange.
+        name = default_storage.save("product_img/test.png", make_image())
+
+        # Act.
+        variants = build_variants(name, default_storage)
+
+        # Assert.
+        self.assertEqual(variants["source"], name)
+        self.assertEqual(
+            sorted((v["width"], v["format"]) for v in variants["images"]),
+            [(320, "jpeg"), (320, "webp"), (640, "jpeg"), (640, "webp")],
+        )
+        with default_storage.open(variants["images"][0]["name"]) as variant:
+            self.assertEqual(Image.open(variant).size, (320, 160))
+
+    def test_small_image(self):
+        """Check a small image gets the smallest variant only."""
+
+        # Arrange.
+        name = default_storage.save("product_img/small.png", make_image(size=(100, 100)))
+
+        # Act.
+        variants = build_variants(name, default_storage)
+
+        # Assert.
+        self.assertEqual({v["width"] for v in variants["images"]}, {320})
+
+    def test_variants_recorded_and_served(self):
+        """Check variants are recorded after upload, and listed in srcset."""
+
+        # Act.
+        product = self.create_product()
+        response = self.client.get(product.get_absolute_url())
+
+        # Assert.
+        self.assertEqual(len(product.get_variants("webp")), 2)
+        self.assertIn("-320w.webp 320w", product.webp_srcset)
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, "-640w.jpeg 640w")
+
+    def test_upload_not_blocked(self):
+        """Check variants are submitted to the worker pool, not built in the request."""
+
+        # Arrange.
+        executor = mock.Mock()
+
+        # Act.
+        with override_settings(PRODUCT_IMAGE_WORKERS=2), mock.patch(
+            "ventashop.images.get_executor", return_value=executor
+        ):
+            product = self.create_product()
+
+        # Assert.
+        self.assertTrue(executor.submit.called)
+        self.assertEqual(product.variants, {})
+
+    def test_variants_deleted_with_image(self):
+        """Check variants are deleted when the image is replaced, then the product deleted."""
+
+        # Arrange.
+        product = self.create_product()
+        old_variants = [v["name"] for v in product.variants["images"]]
+
+        # Act.
+        with self.captureOnCommitCallbacks(execute=True):
+            product.image = make_image("new.png", size=(800, 400))
+            product.save()
+        product.refresh_from_db()
+
+        # Assert.
+        self.assertFalse(any(product_image_storage.exists(name) for name in old_variants))
+        new_variants = [v["name"] for v in product.variants["images"]]
+        self.assertTrue(all(product_image_storage.exists(name) for name in new_variants))
+
+        # Act.
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+
+        # Assert.
+        self.assertFalse(any(product_image_storage.exists(name) for name in new_variants))
+        self.assertTrue(new_variants[0].startswith(VARIANTS_DIR + "/"))
+
+    def test_shared_variants_kept_when_image_replaced(self):
+        """
+        Check the variants built for an image replaced meanwhile are kept,
+        as long as another product uses the image.
+        """
+
+        # Arrange : product2 shares product1's image, their variants not recorded.
+        product1 = self.create_product()
+        image_name = product1.image.name
+        Product.objects.filter(pk=product1.pk).update(variants={})
+        product2 = Product.objects.create(name="product2", description="", price=1)
+        Product.objects.filter(pk=product2.pk).update(image=image_name)
+        built = []
+
+        def replace_then_build(*args, **kwargs):
+            Product.objects.filter(pk=product1.pk).update(image="product_img/other.png")
+            built.append(build_variants(*args, **kwargs))
+            return built[0]
+
+        # Act.
+        with mock.patch("ventashop.images.build_variants", side_effect=replace_then_build):
+            generate_product_variants(product1.pk)
+
+        # Assert.
+        product1.refresh_from_db()
+        self.assertEqual(product1.variants, {})
+        self.assertEqual(built[0]["source"], image_name)
+        self.assertTrue(all(product_image_storage.exists(v["name"]) for v in built[0]["images"]))
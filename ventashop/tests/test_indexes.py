@@ -0,0 +1,157 @@
+"""
+Our tests file for the indexes of the hot query paths : their query plans,
+on a seeded dataset, must not scan whole tables.
+"""
+
+import re
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from ventashop.models import (
+    Cart,
+    Conversation,
+    CustomerAccount,
+    LineItem,
+    Message,
+    Order,
+    Product,
+    User,
+)
+
+EMPLOYEES = 50
+CUSTOMERS = 5000
+
+
+def sequential_scans(queryset):
+    """Tables scanned sequentially in the query plan of queryset."""
+
+    plan = queryset.explain()
+
+    if connection.vendor == "postgresql":
+        return set(re.findall(r"Seq Scan on (\w+)", plan))
+
+    # SQLite : "SCAN table" without index, "SEARCH table USING INDEX ..." with.
+    return set(re.findall(r"\bSCAN (?:TABLE )?(\w+)(?! USING)\s*$", plan, re.M))
+
+
+class HotPathIndexesTestCase(TestCase):
+    """Test class for the indexes of the hot query paths."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Arrange : employees, customers with their cart, orders and messages."""
+
+        now = timezone.now()
+        employees = User.objects.bulk_create(
+            [
+                User(
+                    email=f"employee{i}@ventalis.com",
+                    role="EMPLOYEE",
+                    reg_number=f"{i:04d}",
+                    date_joined=now,
+                )
+                for i in range(EMPLOYEES)
+            ]
+        )
+        customers = User.objects.bulk_create(
+            [
+                User(email=f"customer{i}@test.com", role="CUSTOMER", date_joined=now)
+                for i in range(CUSTOMERS)
+            ]
+        )
+        accounts = CustomerAccount.objects.bulk_create(
+            [
+                CustomerAccount(customer=customer, employee_reg=f"{i % EMPLOYEES:04d}")
+                for i, customer in enumerate(customers)
+            ]
+        )
+        carts = Cart.objects.bulk_create(
+            [Cart(customer_account=account) for account in accounts]
+        )
+        orders = Order.objects.bulk_create(
+            [
+                Order(customer_account=account, ref_number=str(i), slug=str(i))
+                for i, account in enumerate(accounts)
+            ]
+        )
+        products = Product.objects.bulk_create(
+            [
+                Product(name=f"product{i}", slug=f"product{i}", description="", price=1)
+                for i in range(20)
+            ]
+        )
+        LineItem.objects.bulk_create(
+            [
+                LineItem(product=products[i % 20], order=order, price=1)
+                for i, order in enumerate(orders)
+                for _ in range(2)
+            ]
+            + [
+                LineItem(product=products[0], cart=cart, price=1)
+                for cart in carts[: CUSTOMERS // 10]
+            ]
+        )
+        conversations = Conversation.objects.bulk_create(
+            [Conversation(subject=str(i)) for i in range(CUSTOMERS // 10)]
+        )
+        Message.objects.bulk_create(
+            [
+                Message(author=employees[0], conversation=conversation, content=str(i))
+                for conversation in conversations
+                for i in range(10)
+            ]
+        )
+
+        cls.cart = carts[0]
+        cls.order = orders[0]
+        cls.product = products[0]
+        cls.conversation = conversations[0]
+
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+    def assertIndexed(self, queryset, *tables):
+        """Check queryset's plan scans no table (or none of tables) sequentially."""
+
+        scans = sequential_scans(queryset)
+        if tables:
+            scans &= set(tables)
+
+        self.assertEqual(scans, set(), queryset.explain())
+
+    def test_customer_accounts_by_employee(self):
+        """Check customers of an employee are found through an index."""
+
+        self.assertIndexed(CustomerAccount.objects.filter(employee_reg="0007"))
+        # Users are joined by primary key, at the planner's discretion.
+        self.assertIndexed(
+            User.objects.filter(
+                role="CUSTOMER", customeraccount__employee_reg="0007"
+            ).order_by("date_joined"),
+            "ventashop_customeraccount",
+        )
+
+    def test_employees(self):
+        """Check employees are found through an index, by reg_number or role."""
+
+        self.assertIndexed(User.objects.filter(reg_number="0007"))
+        self.assertIndexed(User.objects.filter(role="EMPLOYEE").order_by("date_joined"))
+
+    def test_line_items(self):
+        """Check line items of a cart (by product too) and of an order use an index."""
+
+        self.assertIndexed(LineItem.objects.filter(cart=self.cart))
+        self.assertIndexed(LineItem.objects.filter(cart=self.cart, product=self.product))
+        self.assertIndexed(LineItem.objects.filter(order=self.order))
+
+    def test_conversation_messages(self):
+        """Check messages of a conversation are read in order through an index."""
+
+        self.assertIndexed(
+            Message.objects.filter(conversation=self.conversation).order_by(
+                "date_created", "id"
+            )
+        )
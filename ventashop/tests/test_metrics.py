@@ -0,0 +1,193 @@
+"""Our tests file for the request metrics, and their Prometheus endpoint."""
+
+import re
+import tempfile
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+
+from ventashop.metrics import (
+    CacheStore,
+    FileStore,
+    Registry,
+    get_store,
+    merge,
+    registry,
+    render_prometheus,
+)
+from ventashop.models import Product
+
+
+def sample(text, name, **labels):
+    """Value of the sample name with labels in a Prometheus exposition, or None."""
+
+    label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf"^{name}\{{{re.escape(label_text)}\}} (\S+)$", text, re.M)
+
+    return float(match.group(1)) if match else None
+
+
+class MetricsEndpointTestCase(TestCase):
+    """Test class for the recording of requests, and the metrics endpoint."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Arrange."""
+
+        Product.objects.create(name="product1", description="", price=1)
+
+    def setUp(self) -> None:
+        """Arrange : an empty store and registry, and a metrics token."""
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            METRICS_STORE="ventashop.metrics.FileStore",
+            METRICS_DIR=directory.name,
+            METRICS_TOKEN="secret",
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        get_store.cache_clear()
+        self.addCleanup(get_store.cache_clear)
+        registry._reset()
+
+        self.c = Client()
+
+    def get_metrics(self):
+        return self.c.get("/metrics/", HTTP_AUTHORIZATION="Bearer secret")
+
+    def test_requests_recorded(self):
+        """Check latency, status, queries and size are exported by URL name."""
+
+        # Arrange.
+        page = self.c.get("/products/")
+        self.c.get("/products/")
+        self.c.get("/no/such/page/")
+
+        # Act.
+        response = self.get_metrics()
+
+        # Assert.
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        text = response.content.decode()
+        products = {"view": "ventashop:products-all", "method": "GET"}
+        self.assertEqual(
+            sample(text, "ventalis_http_request_duration_seconds_count", **products), 2
+        )
+        self.assertEqual(
+            sample(
+                text, "ventalis_http_request_duration_seconds_bucket", **products, le="+Inf"
+            ),
+            2,
+        )
+        self.assertEqual(
+            sample(text, "ventalis_http_requests_total", **products, status="2xx"), 2
+        )
+        self.assertGreater(sample(text, "ventalis_http_request_queries_total", **products), 0)
+        self.assertEqual(
+            sample(text, "ventalis_http_response_size_bytes_total", **products),
+            2 * len(page.content),
+        )
+        self.assertEqual(
+            sample(
+                text,
+                "ventalis_http_requests_total",
+                view="<unmatched>",
+                method="GET",
+                status="4xx",
+            ),
+            1,
+        )
+
+    def test_unauthorized(self):
+        """Check the endpoint needs the token, and is disabled without one."""
+
+        # Act.
+        anonymous = self.c.get("/metrics/")
+        wrong = self.c.get("/metrics/", HTTP_AUTHORIZATION="Bearer wrong")
+        with override_settings(METRICS_TOKEN=None):
+            disabled = self.get_metrics()
+
+        # Assert.
+        self.assertEqual(anonymous.status_code, 401)
+        self.assertEqual(wrong.status_code, 401)
+        self.assertEqual(disabled.status_code, 404)
+
+    def test_workers_summed(self):
+        """Check the snapshots of all the workers are summed."""
+
+        # Arrange.
+        for worker, duration in (("host-1", 0.003), ("host-2", 0.2)):
+            worker_registry = Registry()
+            worker_registry.record("ventAPI:order-list", "GET", 200, duration, 0.001, 3, 100)
+            get_store().save(worker, worker_registry.snapshot())
+
+        # Act.
+        text = self.get_metrics().content.decode()
+
+        # Assert.
+        orders = {"view": "ventAPI:order-list", "method": "GET"}
+        bucket = "ventalis_http_request_duration_seconds_bucket"
+        self.assertEqual(sample(text, bucket, **orders, le="0.005"), 1)
+        self.assertEqual(sample(text, bucket, **orders, le="0.1"), 1)
+        self.assertEqual(sample(text, bucket, **orders, le="0.25"), 2)
+        self.assertEqual(sample(text, "ventalis_http_request_queries_total", **orders), 6)
+        self.assertEqual(sample(text, "ventalis_http_response_size_bytes_total", **orders), 200)
+
+
+class MetricsStoresTestCase(TestCase):
+    """Test class for our metrics stores, and the exposition format."""
+
+    def setUp(self) -> None:
+        """Arrange : a snapshot."""
+
+        worker_registry = Registry()
+        worker_registry.record('a"view', "POST", 302, 0.02, 0.01, 2, 0)
+        self.snapshot = worker_registry.snapshot()
+
+    def test_file_store(self):
+        """Check snapshots saved in files are loaded, the last one of each worker."""
+
+        # Arrange.
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(METRICS_DIR=directory):
+                store = FileStore()
+                store.save("host-1", [])
+                store.save("host-1", self.snapshot)
+                store.save("host-2", self.snapshot)
+
+                # Act.
+                snapshots = store.load()
+
+        # Assert.
+        self.assertEqual(snapshots, [self.snapshot, self.snapshot])
+
+    def test_cache_store(self):
+        """Check snapshots saved in the cache are loaded, the last one of each worker."""
+
+        # Arrange.
+        cache.clear()
+        store = CacheStore()
+        store.save("host-1", [])
+        store.save("host-1", self.snapshot)
+        store.save("host-2", self.snapshot)
+
+        # Act.
+        snapshots = store.load()
+
+        # Assert.
+        self.assertEqual(snapshots, [self.snapshot, self.snapshot])
+
+    def test_labels_escaped(self):
+        """Check label values are escaped."""
+
+        # Act.
+        text = render_prometheus(merge([self.snapshot]))
+
+        # Assert.
+        self.assertIn(
+            'ventalis_http_requests_total{view="a\\"view",method="POST",status="3xx"} 1',
+            text,
+        )
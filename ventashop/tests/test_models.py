@@ -2,13 +2,18 @@
 
 from decimal import Decimal
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 from ventashop.models import (User, Product, LineItem, 
                               Cart, Order, Comment, 
                               Conversation, Message, 
-                              CustomerAccount)
-from ventashop.tests.utils_tests import create_employee1, create_customer1
+                              CustomerAccount, RegNumberSlot, Sequence,
+                              UnreadCounter)
+from ventashop.tests.utils_tests import create_employee1, create_employee2, create_customer1
+from ventashop.utils import get_VAT_prices, is_valid_ref_number
 
 class OrderTestCase(TestCase):
     """Test class for our Cart model logic."""
@@ -33,6 +38,30 @@ class OrderTestCase(TestCase):
         self.assertEqual(com_count + 1, Comment.objects.all().count())
         self.assertEqual(list(order_comments)[0].content, "test")
 
+    def test_ref_number_unique_and_valid(self):
+        """Check new orders get distinct and valid reference numbers, used as slugs."""
+
+        # Act.
+        orders = [Order.objects.create() for _ in range(3)]
+
+        # Assert.
+        ref_numbers = {order.ref_number for order in orders + [self.order]}
+        self.assertEqual(len(ref_numbers), 4)
+        for order in orders:
+            self.assertTrue(is_valid_ref_number(order.ref_number))
+            self.assertEqual(order.slug, order.ref_number)
+
+    def test_legacy_ref_number_kept(self):
+        """Check an existing (legacy) reference number is not replaced."""
+
+        # Act.
+        order = Order.objects.create(ref_number="abcdefghij")
+        order.save()
+
+        # Assert.
+        self.assertEqual(Order.objects.get(pk=order.pk).ref_number, "abcdefghij")
+        self.assertEqual(order.slug, "abcdefghij")
+
 
 class CommentTestCase(TestCase):
     """Test class for our Comment model logic."""
@@ -62,6 +91,22 @@ class CommentTestCase(TestCase):
         )
 
 
+class ProductTestCase(TestCase):
+    """Test class for our Product model logic."""
+
+    def test_pack_price(self):
+        """Check the price of 1000 units is computed by the database."""
+
+        # Arrange.
+        Product.objects.create(name="product1", description="description1", price="4.25")
+
+        # Act.
+        product = Product.objects.with_pack_price().get(name="product1")
+
+        # Assert.
+        self.assertEqual(product.pack_price, Decimal("4250.00"))
+
+
 class CartTestCase(TestCase):
     """Test class for our Cart model logic."""
 
@@ -212,6 +257,29 @@ class CartTestCase(TestCase):
         # Assert.
         self.assertEqual(self.cart.total_price, 4242 * 1234 + 6789 * 5678)
 
+    def test_add_line_item_query_count_independent_of_cart_size(self):
+        """
+        Check adding a line item costs the same number of queries,
+        whatever the number of line items already in cart.
+        """
+
+        # Arrange.
+        products = Product.objects.bulk_create(
+            [
+                Product(name=f"bulk{i}", slug=f"bulk{i}", description="d", price=1)
+                for i in range(50)
+            ]
+        )
+        LineItem.objects.bulk_create(
+            [LineItem(product=p, cart=self.cart, quantity=1000, price=1000) for p in products]
+        )
+        Cart.objects.filter(pk=self.cart.pk).recalculate_totals()
+
+        # Act, assert.
+        with self.assertNumQueries(6):
+            self.cart.add_line_item(self.product1, 1000)
+        self.assertEqual(self.cart.total_price, 50 * 1000 + 4242 * 1000)
+
     def test_make_order_aborted_if_empty_cart(self):
         """
         Check if order is not created from  an "empty" cart, 
@@ -290,6 +358,27 @@ class CartTestCase(TestCase):
             li_pk = li.pk
             self.assertIn(LineItem.objects.filter(pk=li_pk), order.lineitem_set.all())
 
+    def test_make_order_current_prices(self):
+        """Check line items are ordered at their products' current prices."""
+
+        # Arrange.
+        self.cart.add_line_item(self.product1, 1000)
+        self.cart.add_line_item(self.product2, 2000)
+        Product.objects.filter(pk=self.product1.pk).update(price=5000)
+
+        # Act.
+        order = self.cart.make_order()
+
+        # Assert.
+        prices = dict(order.lineitem_set.values_list("product", "price"))
+        self.assertEqual(prices[self.product1.pk], 5000 * 1000)
+        self.assertEqual(prices[self.product2.pk], 6789 * 2000)
+        order.refresh_from_db()
+        self.assertEqual(order.total_price, 5000 * 1000 + 6789 * 2000)
+        vat_amount, incl_vat_price = get_VAT_prices(order.total_price)
+        self.assertEqual(order.vat_amount, round(vat_amount, 2))
+        self.assertEqual(order.incl_vat_price, round(incl_vat_price, 2))
+
     def test_make_order_assigns_new_order_to_customer_account(self):
         """Check if newly created order is assigned to customer account."""
 
@@ -363,6 +452,241 @@ class ConversationTestCase(TestCase):
         self.assertEqual(message.content, message_content)
 
 
+class ConversationInboxTestCase(TestCase):
+    """Test class for our conversation inbox."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Arrange."""
+
+        cls.employee = create_employee1()
+        cls.customer = create_customer1()
+        cls.conversation = Conversation.objects.get(participants=cls.customer)
+        cls.other_conversation = Conversation.objects.create(subject="other")
+        cls.other_conversation.participants.add(cls.employee)
+
+        cls.conversation.add_message(author=cls.customer, content="first")
+        cls.conversation.add_message(author=cls.customer, content="second")
+        cls.conversation.add_message(author=cls.employee, content="answer")
+
+    def test_inbox_annotations(self):
+        """Check counterparts, last message and unread count of conversations."""
+
+        # Act.
+        inbox = list(Conversation.objects.inbox(self.employee))
+
+        # Assert.
+        self.assertEqual(inbox, [self.conversation, self.other_conversation])
+        self.assertEqual(inbox[0].counterparts, [self.customer])
+        self.assertEqual(inbox[0].last_message_content, "answer")
+        self.assertEqual(inbox[0].unread_count, 2)
+        self.assertEqual(inbox[1].counterparts, [])
+        self.assertIsNone(inbox[1].last_message_content)
+        self.assertEqual(inbox[1].unread_count, 0)
+
+    def test_inbox_most_recent_first(self):
+        """Check the most recently active conversation comes first."""
+
+        # Act.
+        self.other_conversation.add_message(author=self.employee, content="new")
+
+        # Assert.
+        self.assertEqual(
+            list(Conversation.objects.inbox(self.employee)),
+            [self.other_conversation, self.conversation],
+        )
+
+    def test_inbox_query_count(self):
+        """Check the inbox takes two queries, whatever the number of conversations."""
+
+        # Arrange.
+        for i in range(20):
+            conversation = Conversation.objects.create(subject="subject" + str(i))
+            conversation.participants.add(self.employee, self.customer)
+
+        # Act, assert.
+        with self.assertNumQueries(2):
+            for conversation in Conversation.objects.inbox(self.employee):
+                list(conversation.counterparts)
+
+
+class UnreadCounterTestCase(TestCase):
+    """Test class for our unread message counters."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Arrange."""
+
+        cls.employee = create_employee1()
+        cls.customer = create_customer1()
+        cls.conversation = Conversation.objects.get(participants=cls.customer)
+
+    def count(self, user):
+        """User's unread counter in cls.conversation."""
+
+        return UnreadCounter.objects.get(user=user, conversation=self.conversation).count
+
+    def test_counters_follow_participants(self):
+        """Check participants get a counter, removed with them."""
+
+        # Assert.
+        self.assertEqual(self.count(self.customer), 0)
+        self.assertEqual(self.count(self.employee), 0)
+
+        # Act.
+        self.conversation.participants.remove(self.employee)
+
+        # Assert.
+        self.assertFalse(
+            UnreadCounter.objects.filter(user=self.employee, conversation=self.conversation).exists()
+        )
+
+    def test_new_messages_counted_for_others(self):
+        """Check a new message is counted for the other participants only."""
+
+        # Act.
+        self.conversation.add_message(author=self.customer, content="first")
+        self.conversation.add_message(author=self.customer, content="second")
+
+        # Assert.
+        self.assertEqual(self.count(self.employee), 2)
+        self.assertEqual(self.count(self.customer), 0)
+        self.assertEqual(UnreadCounter.objects.total_for(self.employee), 2)
+
+    def test_mark_read(self):
+        """Check marking a conversation read updates messages and resets the counter."""
+
+        # Arrange.
+        self.conversation.add_message(author=self.customer, content="question")
+        self.conversation.add_message(author=self.employee, content="answer")
+
+        # Act.
+        # Savepoint, unread ids, message update, change log, counter update, release.
+        with self.assertNumQueries(6):
+            updated = self.conversation.mark_read(self.employee)
+
+        # Assert.
+        self.assertEqual(updated, 1)
+        self.assertEqual(self.count(self.employee), 0)
+        self.assertEqual(self.count(self.customer), 1)
+        self.assertFalse(Message.objects.get(content="answer").is_read)
+
+    def test_read_state_changes_counted(self):
+        """Check a message marked read, then unread again, is counted out, then in."""
+
+        # Arrange.
+        self.conversation.add_message(author=self.customer, content="question")
+        message = Message.objects.get(content="question")
+
+        # Act.
+        message.is_read = True
+        message.save()
+        read_count = self.count(self.employee)
+        message.is_read = False
+        message.save()
+
+        # Assert.
+        self.assertEqual(read_count, 0)
+        self.assertEqual(self.count(self.employee), 1)
+        self.assertEqual(self.count(self.customer), 0)
+
+    def test_deleted_messages_counted_out(self):
+        """Check deleting unread messages counts them out, read ones change nothing."""
+
+        # Arrange.
+        for content in ("first", "second", "third"):
+            self.conversation.add_message(author=self.customer, content=content)
+        third = Message.objects.get(content="third")
+        third.is_read = True
+        third.save()
+
+        # Act.
+        Message.objects.get(content="first").delete()
+        first_deleted_count = self.count(self.employee)
+        Message.objects.filter(content__in=["second", "third"]).delete()
+
+        # Assert.
+        self.assertEqual(first_deleted_count, 1)
+        self.assertEqual(self.count(self.employee), 0)
+        self.assertFalse(UnreadCounter.objects.drifted().exists())
+
+
+class MessageWindowTestCase(TestCase):
+    """Test class for our keyset message windows."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Arrange."""
+
+        cls.author = create_customer1()
+        cls.conversation = Conversation.objects.create(subject="test")
+        cls.other_conversation = Conversation.objects.create(subject="other")
+
+        # Same creation date for all : the id breaks ties.
+        date = timezone.now()
+        cls.messages = [
+            Message.objects.create(
+                author=cls.author,
+                content="content" + str(i),
+                conversation=cls.conversation,
+                date_created=date,
+            )
+            for i in range(10)
+        ]
+        Message.objects.create(
+            author=cls.author, content="other", conversation=cls.other_conversation
+        )
+
+    def window(self, *args, **kwargs):
+        """Contents of a window of cls.conversation's messages."""
+
+        messages = Message.objects.filter(conversation=self.conversation)
+
+        return [m.content for m in messages.window(*args, **kwargs)]
+
+    def test_last_messages(self):
+        """Check the last n messages are returned in chronological order."""
+
+        # Act, assert.
+        self.assertEqual(self.window(3), ["content7", "content8", "content9"])
+
+    def test_messages_before(self):
+        """Check the n messages right before a given one are returned."""
+
+        # Act, assert.
+        self.assertEqual(
+            self.window(3, before=self.messages[5].pk),
+            ["content2", "content3", "content4"],
+        )
+        self.assertEqual(self.window(3, before=self.messages[1].pk), ["content0"])
+
+    def test_messages_after(self):
+        """Check the n messages right after a given one are returned."""
+
+        # Act, assert.
+        self.assertEqual(
+            self.window(3, after=self.messages[5].pk),
+            ["content6", "content7", "content8"],
+        )
+        self.assertEqual(self.window(3, after=self.messages[9].pk), [])
+
+    def test_cursor_from_other_conversation(self):
+        """Check a cursor taken from another conversation gives an empty window."""
+
+        # Arrange.
+        other = Message.objects.get(conversation=self.other_conversation)
+
+        # Act, assert.
+        self.assertEqual(self.window(3, before=other.pk), [])
+
+    def test_window_single_query(self):
+        """Check a window is fetched in a single query."""
+
+        # Act, assert.
+        with self.assertNumQueries(1):
+            self.window(5, before=self.messages[8].pk)
+
+
 class CustomerAccountTestCase(TestCase):
     """Test class for our Convesation model logic."""
 
@@ -418,4 +742,313 @@ class CustomerAccountTestCase(TestCase):
         self.ca.set_conversation("test", self.customer)
 
         # Assert.
-        self.assertEqual(self.conversation_count + 1, Conversation.objects.all().count())
\ No newline at end of file
+        self.assertEqual(self.conversation_count + 1, Conversation.objects.all().count())
+
+class MakeOrderQueryCountTestCase(TestCase):
+    """
+    Benchmark-like test class for Cart.make_order :
+    the number of queries must not depend on the number of line items.
+    """
+
+    def fill_cart(self, size):
+        """Create a cart with "size" line items, return it."""
+
+        cart = Cart.objects.create()
+        products = Product.objects.bulk_create(
+            [
+                Product(
+                    name=f"{size}_product{i}",
+                    slug=f"{size}_product{i}",
+                    description="description",
+                    price=1,
+                )
+                for i in range(size)
+            ]
+        )
+        LineItem.objects.bulk_create(
+            [LineItem(product=p, cart=cart, quantity=1000, price=1000) for p in products]
+        )
+        Cart.objects.filter(pk=cart.pk).recalculate_totals()
+        cart.refresh_from_db()
+
+        return cart
+
+    def test_make_order_query_count_constant_for_10_100_1000_line_items(self):
+        """Check make_order issues the same number of queries for 10, 100 and 1000 line items."""
+
+        # Arrange.
+        query_counts = {}
+        Sequence.objects.get_or_create(name="order_ref_number")
+
+        for size in (10, 100, 1000):
+            cart = self.fill_cart(size)
+
+            # Act.
+            with CaptureQueriesContext(connection) as queries:
+                order = cart.make_order()
+            query_counts[size] = len(queries)
+
+            # Assert.
+            self.assertEqual(order.lineitem_set.count(), size)
+            self.assertEqual(order.total_price, size * 1000)
+            order.refresh_from_db()
+            self.assertEqual(order.incl_vat_price, Decimal(size * 1200))
+            self.assertEqual(cart.lineitem_set.count(), 0)
+            self.assertEqual(Cart.objects.get(pk=cart.pk).total_price, 0)
+
+        self.assertEqual(len(set(query_counts.values())), 1, query_counts)
+
+
+class ChooseRelatedEmployeeTestCase(TestCase):
+    """Test class for the assignment of new customers to employees."""
+
+    def create_employees(self, count, customer_capacity=1):
+        """Create "count" employees with registration numbers, return them."""
+
+        first = User.objects.filter(role="EMPLOYEE").count()
+
+        return [
+            User.objects.create(
+                email=f"employee{first + i}@ventalis.com",
+                role="EMPLOYEE",
+                reg_number=str(first + i).zfill(4),
+                customer_capacity=customer_capacity,
+            )
+            for i in range(count)
+        ]
+
+    def assign_customers(self, count):
+        """Create and assign "count" customer accounts, return them."""
+
+        customer_accounts = []
+        for i in range(count):
+            ca = CustomerAccount.objects.create()
+            ca.set_employee_reg_number()
+            customer_accounts.append(ca)
+
+        return customer_accounts
+
+    def test_no_employee(self):
+        """Check customer account stays unassigned if no employee exists."""
+
+        # Act.
+        (ca,) = self.assign_customers(1)
+
+        # Assert.
+        self.assertIsNone(ca.employee_reg)
+
+    def test_weighted_capacity(self):
+        """Check an employee with twice the capacity gets twice the customers."""
+
+        # Arrange.
+        (employee1,) = self.create_employees(1, customer_capacity=1)
+        (employee2,) = self.create_employees(1, customer_capacity=2)
+
+        # Act.
+        self.assign_customers(6)
+
+        # Assert.
+        self.assertEqual(
+            CustomerAccount.objects.filter(employee_reg=employee1.reg_number).count(), 2
+        )
+        self.assertEqual(
+            CustomerAccount.objects.filter(employee_reg=employee2.reg_number).count(), 4
+        )
+
+    def test_zero_capacity_employee_not_assigned(self):
+        """Check an employee with a capacity of 0 gets no new customer."""
+
+        # Arrange.
+        (employee1,) = self.create_employees(1, customer_capacity=0)
+        self.create_employees(1)
+
+        # Act.
+        self.assign_customers(3)
+
+        # Assert.
+        self.assertFalse(
+            CustomerAccount.objects.filter(employee_reg=employee1.reg_number).exists()
+        )
+
+    def test_query_count_independent_of_employee_count(self):
+        """Check the assignment costs the same number of queries with 2 or 50 employees."""
+
+        # Arrange.
+        self.create_employees(2)
+        ca = CustomerAccount.objects.create()
+
+        # Act, assert.
+        with self.assertNumQueries(5):
+            ca.set_employee_reg_number()
+
+        # Arrange.
+        self.create_employees(48)
+        ca = CustomerAccount.objects.create()
+
+        # Act, assert.
+        with self.assertNumQueries(5):
+            ca.set_employee_reg_number()
+
+
+class RegNumberSlotTestCase(TestCase):
+    """Test class for our employee registration number pool."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Arrange."""
+
+        cls.employee1 = create_employee1()
+
+    def test_allocated_reg_numbers_are_unique(self):
+        """Check every employee gets a distinct registration number from the pool."""
+
+        # Act.
+        employees = [
+            User.objects.create(email=f"employee{i}@test.com", role="EMPLOYEE")
+            for i in range(5)
+        ]
+        reg_numbers = [RegNumberSlot.objects.allocate(e) for e in employees]
+
+        # Assert.
+        self.assertEqual(len(set(reg_numbers + [self.employee1.reg_number])), 6)
+        self.assertEqual(RegNumberSlot.objects.usage()["used"], 6)
+
+    def test_deactivated_employee_releases_reg_number(self):
+        """Check a deactivated employee gives their registration number back."""
+
+        # Arrange.
+        reg_number = self.employee1.reg_number
+
+        # Act.
+        self.employee1.is_active = False
+        self.employee1.save(update_fields=["is_active"])
+
+        # Assert.
+        self.assertIsNone(User.objects.get(pk=self.employee1.pk).reg_number)
+        self.assertIsNone(RegNumberSlot.objects.get(number=reg_number).employee)
+        self.assertEqual(RegNumberSlot.objects.usage()["used"], 0)
+
+    def test_deactivated_employee_hands_customers_over(self):
+        """
+        Check a deactivated employee's customers, and their conversations,
+        go to another employee, and the released number leaves them no customer.
+        """
+
+        # Arrange.
+        customer1 = create_customer1()
+        employee2 = create_employee2()
+        reg_number = self.employee1.reg_number
+
+        # Act.
+        self.employee1.is_active = False
+        self.employee1.save(update_fields=["is_active"])
+        new_employee = User.objects.create(email="employee@test.com", role="EMPLOYEE")
+        new_employee.reg_number = RegNumberSlot.objects.allocate(new_employee)
+        new_employee.save()
+
+        # Assert.
+        self.assertEqual(new_employee.reg_number, reg_number)
+        self.assertEqual(
+            CustomerAccount.objects.get(customer=customer1).employee_reg, employee2.reg_number
+        )
+        conversation = Conversation.objects.get(participants=customer1)
+        self.assertEqual(set(conversation.participants.all()), {customer1, employee2})
+        self.assertTrue(
+            UnreadCounter.objects.filter(conversation=conversation, user=employee2).exists()
+        )
+        self.assertFalse(
+            CustomerAccount.objects.filter(employee_reg=new_employee.reg_number).exists()
+        )
+
+    def test_deactivated_last_employee_keeps_customers(self):
+        """Check an employee with customers and no successor keeps their number."""
+
+        # Arrange.
+        customer1 = create_customer1()
+        reg_number = self.employee1.reg_number
+
+        # Act.
+        self.employee1.is_active = False
+        self.employee1.save(update_fields=["is_active"])
+
+        # Assert.
+        self.assertEqual(User.objects.get(pk=self.employee1.pk).reg_number, reg_number)
+        self.assertEqual(
+            CustomerAccount.objects.get(customer=customer1).employee_reg, reg_number
+        )
+
+    def test_reactivated_employee_gets_reg_number(self):
+        """Check a reactivated employee gets a registration number, and customers again."""
+
+        # Arrange.
+        self.employee1.is_active = False
+        self.employee1.save(update_fields=["is_active"])
+
+        # Act.
+        self.employee1.is_active = True
+        self.employee1.save(update_fields=["is_active"])
+        customer1 = create_customer1()
+
+        # Assert.
+        employee1 = User.objects.get(pk=self.employee1.pk)
+        self.assertIsNotNone(employee1.reg_number)
+        self.assertEqual(RegNumberSlot.objects.get(employee=employee1).number, employee1.reg_number)
+        self.assertEqual(
+            CustomerAccount.objects.get(customer=customer1).employee_reg, employee1.reg_number
+        )
+
+    def test_customers_handed_over_by_load(self):
+        """
+        Check a deactivated employee's customers are spread by load over the others,
+        employees being locked and their loads read once.
+        """
+
+        # Arrange : employee1's 4 customers, employees of capacity 1 and 3.
+        for i in range(4):
+            account = CustomerAccount.objects.create(
+                customer=User.objects.create(email=f"customer{i}@test.com")
+            )
+            account.set_employee_reg_number()
+            account.set_conversation(subject="subject", customer=account.customer)
+        employees = []
+        for i, capacity in enumerate((1, 3)):
+            employee = User.objects.create(
+                email=f"employee{i}@test.com", role="EMPLOYEE", customer_capacity=capacity
+            )
+            employee.reg_number = RegNumberSlot.objects.allocate(employee)
+            employee.save()
+            employees.append(employee)
+
+        # Act.
+        with CaptureQueriesContext(connection) as queries:
+            self.employee1.is_active = False
+            self.employee1.save(update_fields=["is_active"])
+
+        # Assert.
+        self.assertEqual(
+            [
+                CustomerAccount.objects.filter(employee_reg=e.reg_number).count()
+                for e in employees
+            ],
+            [1, 3],
+        )
+        for employee in employees:
+            self.assertEqual(
+                Conversation.objects.filter(participants=employee).count(),
+                CustomerAccount.objects.filter(employee_reg=employee.reg_number).count(),
+            )
+        self.assertFalse(Conversation.objects.filter(participants=self.employee1).exists())
+        self.assertEqual(
+            len([q for q in queries.captured_queries if 'AS "load"' in q["sql"]]), 1
+        )
+
+    def test_exhausted_pool(self):
+        """Check allocation fails once every registration number is used."""
+
+        # Arrange : only employee1's slot is left.
+        RegNumberSlot.objects.filter(employee__isnull=True).delete()
+        employee = User.objects.create(email="employee@test.com", role="EMPLOYEE")
+
+        # Act, assert.
+        with self.assertRaises(ValueError):
+            RegNumberSlot.objects.allocate(employee)
@@ -0,0 +1,164 @@
+"""Our tests file for module pricing.py"""
+
+import datetime
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.utils import timezone
+
+from ventashop.catalogue import catalogue_version
+from ventashop.models import Cart, Category, LineItem, Product, User
+from ventashop.pricing import reprice_products, select_products
+
+
+class RepriceProductsTestCase(TestCase):
+    """Test class for our set-based repricing engine."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Arrange."""
+
+        cls.category1 = Category.objects.create(name="cat1")
+        cls.category2 = Category.objects.create(name="cat2")
+        cls.old_date = timezone.make_aware(datetime.datetime(2021, 6, 1))
+
+        cls.product1 = Product.objects.create(
+            name="product1",
+            description="description1",
+            price=10,
+            category=cls.category1,
+            date_created=cls.old_date,
+        )
+        cls.product2 = Product.objects.create(
+            name="product2",
+            description="description2",
+            price=20,
+            category=cls.category2,
+        )
+
+        # An open cart, and a placed order, with both products.
+        cls.cart = Cart.objects.create()
+        cls.cart.add_line_item(cls.product1, 1000)
+        cls.cart.add_line_item(cls.product2, 1000)
+        cls.order = cls.cart.make_order()
+        cls.cart.add_line_item(cls.product1, 1000)
+        cls.cart.add_line_item(cls.product2, 1000)
+
+    def test_select_products(self):
+        """Check products are selected by category and creation date."""
+
+        # Act, assert.
+        self.assertEqual(list(select_products(category="cat1")), [self.product1])
+        self.assertEqual(
+            list(
+                select_products(
+                    created_before=timezone.make_aware(datetime.datetime(2022, 1, 1))
+                )
+            ),
+            [self.product1],
+        )
+        self.assertEqual(select_products().count(), 2)
+
+    def test_reprice_products_and_open_carts(self):
+        """Check products, open cart line items and cart total are repriced."""
+
+        # Act.
+        reports = list(reprice_products(select_products(category="cat1"), Decimal("0.6")))
+
+        # Assert.
+        self.assertEqual(Product.objects.get(pk=self.product1.pk).price, Decimal("6.00"))
+        self.assertEqual(Product.objects.get(pk=self.product2.pk).price, Decimal("20.00"))
+        self.assertEqual(
+            LineItem.objects.get(cart=self.cart, product=self.product1).price, 6000
+        )
+        self.assertEqual(Cart.objects.get(pk=self.cart.pk).total_price, 6000 + 20000)
+        self.assertFalse(Cart.objects.drifted().exists())
+        self.assertEqual(reports[0]["products"], 1)
+        self.assertEqual(reports[0]["line_items"], 1)
+        self.assertEqual(reports[0]["carts"], 1)
+
+    def test_placed_orders_untouched(self):
+        """Check line items and totals of placed orders keep their price."""
+
+        # Act.
+        list(reprice_products(select_products(), Decimal("0.5")))
+
+        # Assert.
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_price, 10000 + 20000)
+        self.assertEqual(
+            sorted(self.order.lineitem_set.values_list("price", flat=True)),
+            [10000, 20000],
+        )
+
+    def test_batches(self):
+        """Check products are updated batch after batch."""
+
+        # Act.
+        reports = list(reprice_products(select_products(), Decimal("2"), batch_size=1))
+
+        # Assert.
+        self.assertEqual([r["batch"] for r in reports], [1, 2])
+        self.assertEqual(Product.objects.get(pk=self.product2.pk).price, 40)
+
+    def test_catalogue_cache_invalidated(self):
+        """Check cached catalogue pages are outdated by a repricing."""
+
+        # Arrange.
+        version = catalogue_version()
+
+        # Act.
+        with self.captureOnCommitCallbacks(execute=True):
+            list(reprice_products(select_products(), Decimal("2")))
+
+        # Assert.
+        self.assertNotEqual(catalogue_version(), version)
+
+    def test_non_positive_ratio(self):
+        """Check a ratio <= 0 is refused."""
+
+        # Act, assert.
+        with self.assertRaises(ValueError):
+            list(reprice_products(select_products(), Decimal("0")))
+
+    def test_reprice_products_command(self):
+        """Check the command applies the percentage and reports batches."""
+
+        # Arrange.
+        out = StringIO()
+
+        # Act.
+        call_command(
+            "reprice_products",
+            "--percent=-40",
+            "--created-before=2022-01-01",
+            stdout=out,
+        )
+
+        # Assert.
+        self.assertEqual(Product.objects.get(pk=self.product1.pk).price, Decimal("6.00"))
+        self.assertEqual(Product.objects.get(pk=self.product2.pk).price, Decimal("20.00"))
+        self.assertIn("Batch 1 : 1 products, 1 cart line items, 1 carts", out.getvalue())
+
+    def test_reprice_admin_action(self):
+        """Check the admin action asks for a percentage, then reprices selected products."""
+
+        # Arrange.
+        User.objects.create_superuser(email="admin@test.com", password="12345678&")
+        c = Client()
+        c.login(email="admin@test.com", password="12345678&")
+        data = {"action": "reprice", "_selected_action": [self.product2.pk]}
+
+        # Act.
+        response = c.post("/gestion/ventashop/product/", data)
+
+        # Assert.
+        self.assertContains(response, "Variation de prix")
+
+        # Act.
+        c.post("/gestion/ventashop/product/", {**data, "apply": "1", "percent": "10"})
+
+        # Assert.
+        self.assertEqual(Product.objects.get(pk=self.product2.pk).price, Decimal("22.00"))
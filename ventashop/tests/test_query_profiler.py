@@ -0,0 +1,198 @@
+"""Our tests file for the query profiler : N+1 patterns and per-view query budgets."""
+
+from unittest import mock
+
+from django.test import Client, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from ventashop.message_views import ConversationListView
+from ventashop.models import Cart, Conversation, Order, Product
+from ventashop.query_profiler import profile_queries, query_shape
+from ventashop.tests import utils_tests
+
+
+class QueryProfileTestCase(TestCase):
+    """Test class for the recording of queries, and their shapes."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Arrange."""
+
+        cls.products = [
+            Product.objects.create(name=f"product{i}", description="", price=1)
+            for i in range(5)
+        ]
+
+    def test_query_shape(self):
+        """Check parameters, literals and IN lists of any length make one shape."""
+
+        # Act.
+        shapes = {
+            query_shape('SELECT "id" FROM "t" WHERE "id" IN (%s, %s) LIMIT 21'),
+            query_shape('SELECT "id" FROM "t" WHERE "id" IN (%s) LIMIT 1'),
+            query_shape("SELECT \"id\" FROM \"t\" WHERE \"id\" IN (1, 2, 3) LIMIT 'x'"),
+        }
+
+        # Assert.
+        self.assertEqual(shapes, {'SELECT "id" FROM "t" WHERE "id" IN (...) LIMIT ?'})
+
+    def test_repeated_queries_flagged(self):
+        """Check a query run in a loop is flagged, with the line running it."""
+
+        # Act.
+        with profile_queries() as profile:
+            for product in self.products:
+                Product.objects.get(pk=product.pk)
+            list(Product.objects.all())
+
+        # Assert.
+        self.assertEqual(profile.count, 6)
+        [(shape, count, frame)] = profile.repeated()
+        self.assertEqual(count, 5)
+        self.assertIn('WHERE "ventashop_product"."id" = ?', shape)
+        self.assertRegex(
+            frame, r"^ventashop/tests/test_query_profiler.py:\d+ in test_repeated_queries_flagged$"
+        )
+
+    def test_budget_overrun(self):
+        """Check problems list a budget overrun, and nothing within budget."""
+
+        # Act.
+        with profile_queries() as profile:
+            list(Product.objects.all())
+            Product.objects.count()
+
+        # Assert.
+        self.assertEqual(profile.problems(budget=2), [])
+        self.assertEqual(profile.problems(budget=1), ["2 queries, over a budget of 1"])
+
+
+class QueryProfilerMiddlewareTestCase(utils_tests.QueryProfileMixin, TestCase):
+    """Test class for our query profiler middleware, and the views' query budgets."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Arrange : orders, a cart, and a conversation with messages."""
+
+        cls.employee1 = utils_tests.create_employee1()
+        cls.customer1 = utils_tests.create_customer1()
+        cls.customer2 = utils_tests.create_customer2()
+
+        products = [
+            Product.objects.create(name=f"product{i}", description="", price=i + 1)
+            for i in range(10)
+        ]
+        cart = Cart.objects.get(customer_account__customer=cls.customer1)
+        for i in range(3):
+            cart.add_line_item(products[i], 1000)
+            cart.add_line_item(products[i + 1], 1000)
+            cart.make_order()
+        cart.add_line_item(products[5], 1000)
+        cart.add_line_item(products[6], 1000)
+
+        cls.order = Order.objects.first()
+        cls.conversation = Conversation.objects.get(participants=cls.customer1)
+        for i in range(5):
+            cls.conversation.add_message(author=cls.customer1, content=str(i))
+            cls.conversation.add_message(author=cls.employee1, content=str(i))
+
+        cls.token = Token.objects.create(user=cls.employee1)
+
+    def setUp(self) -> None:
+        """Arrange : logged in customer, employee and API clients."""
+
+        self.customer_client = Client()
+        self.customer_client.force_login(self.customer1)
+        self.employee_client = Client()
+        self.employee_client.force_login(self.employee1)
+        self.api_client = APIClient()
+        self.api_client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    def test_customer_views_within_budget(self):
+        """Check customer pages repeat no query, and keep to their budget."""
+
+        urls = [
+            "/products/",
+            "/products/page/",
+            "/cart/",
+            "/orders/",
+            f"/{self.order.slug}/order_detail/",
+            f"/{self.conversation.pk}/messages/",
+            "/my_space/",
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                # Act.
+                response = self.customer_client.get(url)
+
+                # Assert.
+                self.assertEqual(response.status_code, 200)
+                self.assertIsNotNone(response.query_budget)
+                self.assertQueryProfile(response)
+
+    def test_employee_views_within_budget(self):
+        """Check employee pages repeat no query, and keep to their budget."""
+
+        urls = ["/conversations/", "/customers/", f"/{self.conversation.pk}/messages/"]
+        for url in urls:
+            with self.subTest(url=url):
+                # Act.
+                response = self.employee_client.get(url)
+
+                # Assert.
+                self.assertEqual(response.status_code, 200)
+                self.assertIsNotNone(response.query_budget)
+                self.assertQueryProfile(response)
+
+    def test_api_lists_without_repeated_queries(self):
+        """Check API lists repeat no query, and read-only viewsets keep to their budget."""
+
+        urls = [
+            "/api/users/",
+            "/api/customeraccounts/",
+            "/api/orders/",
+            "/api/whole_orders/",
+            "/api/user_orders/",
+            "/api/comments/",
+            "/api/lineitems/",
+            "/api/conversations/",
+            "/api/user_conversations/",
+            f"/api/messages/?conversation={self.conversation.pk}",
+            "/api/products/",
+            "/api/sync/",
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                # Act.
+                response = self.api_client.get(url)
+
+                # Assert.
+                self.assertEqual(response.status_code, 200)
+                self.assertQueryProfile(response)
+
+    def test_budget_overrun_logged(self):
+        """Check a request over its view's budget is logged."""
+
+        # Act.
+        with mock.patch.object(ConversationListView, "query_budget", 1):
+            with self.assertLogs("ventashop.query_profiler", "WARNING") as logs:
+                self.employee_client.get("/conversations/")
+
+        # Assert.
+        self.assertIn("GET /conversations/ : 6 queries, over a budget of 1", logs.output[0])
+
+    def test_header_in_debug_only(self):
+        """Check the X-Queries header is only sent with DEBUG on."""
+
+        # Act.
+        response = self.employee_client.get("/conversations/")
+        with override_settings(DEBUG=True):
+            debug_response = self.employee_client.get("/conversations/")
+
+        # Assert.
+        self.assertNotIn("X-Queries", response)
+        self.assertRegex(
+            debug_response["X-Queries"],
+            r"^count=6; time_ms=\d+\.\d; repeated=0; budget=6$",
+        )
@@ -0,0 +1,189 @@
+"""Our tests file for module search.py, and the search features using it."""
+
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from ventashop.models import Category, Product
+from ventashop.search import search_products, search_terms
+from ventashop.tests import utils_tests
+
+
+class SearchProductsTestCase(TestCase):
+    """Test class for our product search."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Arrange."""
+
+        cls.chairs = Category.objects.create(name="Chaises")
+        cls.desks = Category.objects.create(name="Bureaux")
+
+        cls.chair = Product.objects.create(
+            name="Chaise pliante",
+            description="Une chaise légère pour vos salons.",
+            price=10,
+            category=cls.chairs,
+        )
+        cls.desk = Product.objects.create(
+            name="Bureau compact",
+            description="Un bureau, livré avec sa chaise.",
+            price=100,
+            category=cls.desks,
+        )
+        cls.lamp = Product.objects.create(
+            name="Lampe", description="Une lampe de bureau.", price=20
+        )
+
+    def names(self, query, category=None):
+        """Names of the products found, best first."""
+
+        return [p.name for p in search_products(query, category=category)]
+
+    def test_search_terms(self):
+        """Check search syntax is stripped from queries."""
+
+        # Act, assert.
+        self.assertEqual(search_terms("Chaise & (bureau):* 'x'"), ["chaise", "bureau", "x"])
+
+    def test_ranked_results(self):
+        """Check name matches come before description matches."""
+
+        # Act, assert.
+        self.assertEqual(self.names("chaise"), ["Chaise pliante", "Bureau compact"])
+        self.assertEqual(self.names("bureau"), ["Bureau compact", "Lampe"])
+
+    def test_all_words(self):
+        """Check products match every word."""
+
+        # Act, assert.
+        self.assertEqual(self.names("bureau lampe"), ["Lampe"])
+
+    def test_prefix(self):
+        """Check the last word is a prefix, for type-ahead."""
+
+        # Act, assert.
+        self.assertEqual(self.names("pli"), ["Chaise pliante"])
+        self.assertEqual(self.names("lam"), ["Lampe"])
+
+    def test_category(self):
+        """Check results are filtered by category."""
+
+        # Act, assert.
+        self.assertEqual(self.names("chaise", category=self.desks.slug), ["Bureau compact"])
+
+    def test_empty_query(self):
+        """Check an empty query finds nothing."""
+
+        # Act, assert.
+        self.assertEqual(self.names(" ?! "), [])
+
+    def test_renamed_product(self):
+        """Check the text index follows product changes."""
+
+        # Act.
+        self.lamp.name = "Lampadaire"
+        self.lamp.save()
+
+        # Assert.
+        self.assertEqual(self.names("lampadaire"), ["Lampadaire"])
+
+    def test_index_used(self):
+        """Check the text index serves searches."""
+
+        # Arrange.
+        if connection.vendor != "postgresql":
+            self.skipTest("Postgres text index.")
+
+        # Act.
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = search_products("chaise").explain()
+
+        # Assert.
+        self.assertIn("product_search_idx", plan)
+
+    def test_index_maintained(self):
+        """
+        Check the text index is still maintained once every migration has run
+        (SQLite drops the triggers of the tables it rebuilds).
+        """
+
+        # Act.
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s",
+                    ["ventashop_product"],
+                )
+            elif connection.vendor == "postgresql":
+                cursor.execute(
+                    "SELECT column_name FROM information_schema.columns "
+                    "WHERE table_name = %s AND column_name = 'search_vector'",
+                    ["ventashop_product"],
+                )
+            else:
+                self.skipTest("No text index.")
+            names = {row[0] for row in cursor.fetchall()}
+
+        # Assert.
+        expected = {
+            "sqlite": {
+                "ventashop_product_fts_insert",
+                "ventashop_product_fts_delete",
+                "ventashop_product_fts_update",
+            },
+            "postgresql": {"search_vector"},
+        }
+        self.assertEqual(names, expected[connection.vendor])
+
+    def test_catalogue_search(self):
+        """Check the web catalogue displays search results."""
+
+        # Arrange.
+        cache.clear()
+
+        # Act.
+        response = Client().get("/products/", {"q": "chai"})
+
+        # Assert.
+        self.assertEqual(
+            [p.name for p in response.context["product_list"]],
+            ["Chaise pliante", "Bureau compact"],
+        )
+        self.assertNotIn("next_url", response.context)
+
+    def test_api_search(self):
+        """Check the product API endpoint searches, with a limit."""
+
+        # Arrange.
+        customer = utils_tests.create_customer1()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=customer).key)
+
+        # Act.
+        response = client.get("/api/products/", {"search": "chaise", "limit": 1})
+
+        # Assert.
+        self.assertEqual([p["name"] for p in response.json()], ["Chaise pliante"])
+
+    def test_benchmark_search_command(self):
+        """Check the benchmark reports latencies and rolls its catalogue back."""
+
+        # Arrange.
+        out = StringIO()
+
+        # Act.
+        call_command(
+            "benchmark_search", "--products=300", "--queries=5", "--target-ms=1000", stdout=out
+        )
+
+        # Assert.
+        self.assertIn("prefix : p50", out.getvalue())
+        self.assertIn("All searches within target.", out.getvalue())
+        self.assertEqual(Product.objects.count(), 3)
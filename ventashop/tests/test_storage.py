@@ -0,0 +1,109 @@
+"""Our tests file for module storage.py : content-hash product images."""
+
+import hashlib
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+
+from ventashop.models import Product
+from ventashop.storage import product_image_storage
+from ventashop.tests.test_images import make_image
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, PRODUCT_IMAGE_WORKERS=0)
+class ContentHashStorageTestCase(TestCase):
+    """Test class for our content-hash storage."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def create_product(self, name, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(
+                name=name, description="description", price=1, image=image
+            )
+
+    def test_name_from_content(self):
+        """Check files are named after the hash of their content, without dated folders."""
+
+        # Arrange.
+        image = make_image("Photo.PNG")
+        digest = hashlib.sha256(image.read()).hexdigest()
+
+        # Act.
+        product = self.create_product("product1", image)
+
+        # Assert.
+        self.assertEqual(product.image.name, f"product_img/{digest[:2]}/{digest}.png")
+        self.assertTrue(product_image_storage.exists(product.image.name))
+
+    def test_identical_content_stored_once(self):
+        """Check identical uploads share a single file."""
+
+        # Act.
+        product1 = self.create_product("product1", make_image("a.png"))
+        product2 = self.create_product("product2", make_image("b.png"))
+
+        # Assert.
+        self.assertEqual(product1.image.name, product2.image.name)
+        _, files = product_image_storage.listdir(product1.image.name.rsplit("/", 1)[0])
+        self.assertEqual(len(files), 1)
+        self.assertEqual(product_image_storage.references(product1.image.name), 2)
+
+    def test_file_deleted_with_last_reference(self):
+        """Check a shared file is only deleted (by django_cleanup) with its last product."""
+
+        # Arrange.
+        product1 = self.create_product("product1", make_image())
+        product2 = self.create_product("product2", make_image())
+        name = product1.image.name
+
+        # Act.
+        with self.captureOnCommitCallbacks(execute=True):
+            product1.delete()
+        kept = product_image_storage.exists(name)
+        with self.captureOnCommitCallbacks(execute=True):
+            product2.delete()
+
+        # Assert.
+        self.assertTrue(kept)
+        self.assertFalse(product_image_storage.exists(name))
+
+    def test_variants_kept_for_shared_image(self):
+        """Check variants of a shared image are reused, and kept with the image."""
+
+        # Arrange.
+        product1 = self.create_product("product1", make_image())
+        product2 = self.create_product("product2", make_image())
+        product1.refresh_from_db()
+        product2.refresh_from_db()
+
+        # Act.
+        with self.captureOnCommitCallbacks(execute=True):
+            product1.delete()
+
+        # Assert.
+        self.assertEqual(product2.variants, product1.variants)
+        for variant in product2.variants["images"]:
+            self.assertTrue(product_image_storage.exists(variant["name"]))
+
+    def test_immutable_url(self):
+        """Check content-hash images are served with far-future, immutable caching."""
+
+        # Arrange.
+        product = self.create_product("product1", make_image())
+
+        # Act.
+        response = self.client.get(product.image.url)
+
+        # Assert.
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response["Cache-Control"], "public, max-age=31536000, immutable"
+        )
+        self.assertEqual(b"".join(response.streaming_content), product.image.read())
@@ -7,6 +7,9 @@ from django.core.exceptions import ValidationError
 from django.test import TestCase
 
 from ventashop.utils import (
+                            BlockAllocator,
+                            encode_ref_number,
+                            is_valid_ref_number,
                             get_VAT_prices, 
                             min_length_8, 
                             contains_min_one_digit, 
@@ -33,6 +36,61 @@ class UtilsTestCase(TestCase):
         self.assertEqual(incl_vat_price, price * (1 + Decimal(0.2)))
 
 
+class RefNumberTestCase(TestCase):
+    """Test class for our reference number encoding and allocation."""
+
+    def test_encode_ref_number(self):
+        """Check reference numbers are 9 characters long, and valid."""
+
+        # Act.
+        ref_numbers = [encode_ref_number(n) for n in (1, 35, 36, 123456789)]
+
+        # Assert.
+        self.assertEqual(ref_numbers[0][:-1], "00000001")
+        self.assertEqual(ref_numbers[2][:-1], "00000010")
+        for ref_number in ref_numbers:
+            self.assertEqual(len(ref_number), 9)
+            self.assertTrue(is_valid_ref_number(ref_number))
+
+    def test_check_char_detects_typo(self):
+        """Check a single mistyped character, or two swapped ones, are detected."""
+
+        # Arrange.
+        ref_number = encode_ref_number(123456789)
+        mistyped = ref_number[:3] + ("a" if ref_number[3] != "a" else "b") + ref_number[4:]
+        swapped = ref_number[:6] + ref_number[7] + ref_number[6] + ref_number[8:]
+
+        # Assert.
+        self.assertFalse(is_valid_ref_number(mistyped))
+        if swapped != ref_number:
+            self.assertFalse(is_valid_ref_number(swapped))
+        self.assertFalse(is_valid_ref_number("abc!"))
+        self.assertFalse(is_valid_ref_number(""))
+
+    def test_block_allocator_reserves_one_block_per_block_size(self):
+        """Check numbers are unique, and reserved from "database" once per block."""
+
+        # Arrange.
+        reservations = []
+
+        def reserve(size):
+            reservations.append(size)
+            return (len(reservations) - 1) * size + 1
+
+        allocator = BlockAllocator(reserve=reserve, block_size=10)
+
+        # Act.
+        numbers = []
+        for _ in range(25):
+            # Each allocation in its own "committed" transaction.
+            with self.captureOnCommitCallbacks(execute=True):
+                numbers.append(allocator.allocate())
+
+        # Assert.
+        self.assertEqual(numbers, list(range(1, 26)))
+        self.assertEqual(len(reservations), 3)
+
+
 class PasswordCustomValidationTestCase(TestCase):
     """Test class for our validation functions."""
 
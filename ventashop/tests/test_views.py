@@ -1,11 +1,18 @@
 """Our views' test module, for logic and content."""
 
 from decimal import Decimal
+from unittest import mock
 
 from django.core import mail
+from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
+from ventashop.catalogue import (
+    CATALOGUE_VERSION_SEQUENCE,
+    catalogue_cache_key,
+    catalogue_version,
+)
 from ventashop.forms import UserForm
 from ventashop.models import (
     Category,
@@ -16,8 +23,10 @@ from ventashop.models import (
     Comment,
     Conversation,
     Message,
+    Sequence,
 )
 from ventashop.tests import utils_tests
+from ventashop.views import CatalogueMixin
 
 
 class StaticViewsTestCase(TestCase):
@@ -315,6 +324,11 @@ class ProductsListViewTestCase(TestCase):
             category=cls.category1,
         )
 
+    def setUp(self) -> None:
+        """Arrange : no rendered page cached by previous tests."""
+
+        cache.clear()
+
     def test_product_price_display(self):
         """Check prices multiplied by 1000 are displayed."""
 
@@ -345,6 +359,80 @@ class ProductsListViewTestCase(TestCase):
         self.assertContains(response, "product1")
         self.assertContains(response, "product2")
 
+    def test_anonymous_catalogue_cached(self):
+        """Check anonymous users get cached pages, with the catalogue version query only."""
+
+        # Arrange.
+        self.c.get("/products/")
+
+        # Act, assert.
+        with self.assertNumQueries(1):
+            response = self.c.get("/products/")
+        self.assertContains(response, "product1")
+
+    def test_catalogue_cache_key_parameters(self):
+        """Check cached pages are keyed on the query parameters the views use only."""
+
+        # Arrange.
+        self.c.get("/products/")
+
+        # Act, assert.
+        with self.assertNumQueries(1):
+            response = self.c.get("/products/", {"utm_source": "newsletter"})
+        self.assertContains(response, "product1")
+        self.assertNotEqual(
+            catalogue_cache_key("/products/", {"q": "product1"}),
+            catalogue_cache_key("/products/", {"q": "product2"}),
+        )
+
+    def test_catalogue_version_shared(self):
+        """Check the catalogue version is kept in the database, not in the per process cache."""
+
+        # Arrange.
+        version = catalogue_version()
+        cache.clear()
+
+        # Act.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product1.name = "renamed1"
+            self.product1.save()
+
+        # Assert.
+        self.assertEqual(
+            Sequence.objects.get(name=CATALOGUE_VERSION_SEQUENCE).last_value, version + 1
+        )
+        self.assertEqual(catalogue_version(), version + 1)
+
+    def test_catalogue_cache_invalidated(self):
+        """Check a product change is displayed at once."""
+
+        # Arrange.
+        self.c.get("/products/")
+
+        # Act.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product1.name = "renamed1"
+            self.product1.save()
+        response = self.c.get("/products/")
+
+        # Assert.
+        self.assertContains(response, "renamed1")
+
+    def test_catalogue_not_cached_for_authenticated_users(self):
+        """Check logged in users get fresh pages, e.g. with their own header."""
+
+        # Arrange.
+        utils_tests.create_customer1()
+        c = Client()
+        c.login(email="customer1@test.com", password="12345678&")
+        self.c.get("/products/")
+
+        # Act.
+        response = c.get("/products/")
+
+        # Assert.
+        self.assertContains(response, "Mon panier")
+
     def test_products_filtered_by_category_empty_category(self):
         """Check no products are displayed in "empty" category."""
 
@@ -357,6 +445,122 @@ class ProductsListViewTestCase(TestCase):
         self.assertNotContains(response, "product2")
 
 
+class ProductsPaginationTestCase(TestCase):
+    """Test class for the keyset pagination of our product list, and its next pages."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Arrange."""
+
+        cls.c = Client()
+        cls.category1 = Category.objects.create(name="test1")
+
+        # 5 products in category1, 1 without category.
+        for i in range(5):
+            Product.objects.create(
+                name="product" + str(i),
+                description="description",
+                price=1,
+                category=cls.category1,
+            )
+        Product.objects.create(name="product9", description="description", price=1)
+
+    def setUp(self) -> None:
+        """Arrange : no rendered page cached by previous tests, small pages."""
+
+        cache.clear()
+        patcher = mock.patch.object(CatalogueMixin, "page_size", 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_first_page(self):
+        """Check only the first products are displayed, with a link to the next ones."""
+
+        # Act.
+        response = self.c.get("/products/")
+
+        # Assert.
+        self.assertEqual(
+            [p.name for p in response.context["product_list"]], ["product0", "product1"]
+        )
+        self.assertEqual(response.context["next_url"], "/products/?after=product1")
+        self.assertEqual(
+            response.context["next_page_url"], "/products/page/?after=product1"
+        )
+
+    def test_next_page_fragment(self):
+        """Check a next page of a category is rendered as a fragment."""
+
+        # Act.
+        url = "/" + self.category1.slug + "/products/page/?after=product3"
+        response = self.c.get(url)
+
+        # Assert.
+        self.assertContains(response, "product4")
+        self.assertNotContains(response, "product3")
+        self.assertNotContains(response, "product9")
+        self.assertNotContains(response, "<html")
+        self.assertContains(response, 'data-next-page-url=""')
+
+    def test_next_page_json(self):
+        """Check a next page is available as JSON, the last one without next url."""
+
+        # Act.
+        response = self.c.get("/products/page/", {"after": "product1", "format": "json"})
+        last_response = self.c.get(
+            "/products/page/", {"after": "product4", "format": "json"}
+        )
+
+        # Assert.
+        self.assertEqual(
+            [p["name"] for p in response.json()["products"]], ["product2", "product3"]
+        )
+        self.assertEqual(response.json()["products"][0]["pack_price"], "1000.00")
+        self.assertEqual(response.json()["next"], "/products/page/?after=product3&format=json")
+        self.assertEqual(
+            self.c.get(response.json()["next"]).json()["products"][0]["name"], "product4"
+        )
+        self.assertEqual(
+            last_response.json(),
+            {
+                "products": [
+                    {
+                        "name": "product9",
+                        "slug": "product9",
+                        "url": "/product9/product_detail/",
+                        "pack_price": "1000.00",
+                    }
+                ],
+                "next": None,
+            },
+        )
+
+    def test_cached_json_page(self):
+        """Check a cached JSON page keeps its content type."""
+
+        # Arrange.
+        self.c.get("/products/page/", {"format": "json"})
+
+        # Act.
+        with self.assertNumQueries(1):
+            response = self.c.get("/products/page/", {"format": "json"})
+
+        # Assert.
+        self.assertEqual(response["Content-Type"], "application/json")
+
+    def test_page_query_count(self):
+        """Check a page takes the same number of queries as the catalogue grows."""
+
+        # Arrange.
+        for i in range(10, 30):
+            Product.objects.create(name="product" + str(i), description="d", price=1)
+        catalogue_version()
+
+        # Act, assert : the catalogue version, and the page.
+        with self.assertNumQueries(2):
+            self.c.get("/products/page/", {"after": "product1"})
+
+
 class CartEditingViewsTestCase(TestCase):
     """
     Test class regrouping tests for views modifying cart content,
@@ -624,6 +828,22 @@ class ConversationListViewTestCase(TestCase):
         # Assert.
         self.assertContains(response, "Échanges avec mon conseiller")
 
+    def test_conversation_list_view_query_count(self):
+        """Check the number of queries doesn't grow with the number of conversations."""
+
+        # Arrange.
+        self.c.get("/conversations/")
+        for i in range(10):
+            conversation = Conversation.objects.create(subject="subject" + str(i))
+            conversation.participants.add(self.employee1, self.customer1)
+            conversation.add_message(author=self.customer1, content="content" + str(i))
+
+        # Act, assert.
+        # Session, user, count, conversations, counterparts, header badge.
+        with self.assertNumQueries(6):
+            response = self.c.get("/conversations/")
+        self.assertContains(response, "content9")
+
 
 class MessageListViewTestCase(TestCase):
     """Test class for our message list view."""
@@ -681,6 +901,42 @@ class MessageListViewTestCase(TestCase):
             self.assertContains(response, self.customer1)
             self.assertContains(response, "content" + str(i + 5))
 
+    def test_display_n_messages_before_cursor(self):
+        """Check if the n messages before a given one are displayed, with links to older and newer ones."""
+
+        # Arrange.
+        messages = list(Message.objects.filter(conversation=self.conversation))
+        url = "/" + str(self.conv_id) + "/messages/3?before=" + str(messages[5].pk)
+
+        # Act.
+        response = self.c.get(url)
+
+        # Assert.
+        self.assertEqual(
+            [m.content for m in response.context["message_list"]],
+            ["content2", "content3", "content4"],
+        )
+        self.assertEqual(response.context["previous_cursor"], messages[2].pk)
+        self.assertEqual(response.context["next_cursor"], messages[4].pk)
+        self.assertContains(response, "?before=" + str(messages[2].pk))
+        self.assertContains(response, "?after=" + str(messages[4].pk))
+
+    def test_messages_marked_read_in_view(self):
+        """Check displaying the conversation marks the other participants' messages read."""
+
+        # Arrange.
+        self.conversation.add_message(author=self.employee1, content="answer")
+
+        # Act.
+        badge_before = self.c.get("/my_space/")
+        self.c.get("/" + str(self.conv_id) + "/messages/5")
+        badge_after = self.c.get("/my_space/")
+
+        # Assert.
+        self.assertContains(badge_before, 'rounded-pill">1</span>')
+        self.assertNotContains(badge_after, "rounded-pill")
+        self.assertTrue(Message.objects.get(content="answer").is_read)
+
     def test_new_message_form_in_view(self):
         """
         Check if new message is created with form,
@@ -1,6 +1,7 @@
 """A utility module for our tests."""
 
 from django.contrib.auth.hashers import make_password
+from django.test import modify_settings
 
 from ventashop.models import User
 from ventashop.forms import UserForm
@@ -77,3 +78,33 @@ def create_customer2():
     }
 
     return user_form.create_user(role="CUSTOMER")
+
+
+##########################
+##### QUERY PROFILER #####
+##########################
+
+class QueryProfileMixin:
+    """
+    TestCase mixin sending requests through our query profiler middleware,
+    to check their queries (see query_profiler.py).
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        profiler = modify_settings(
+            MIDDLEWARE={"prepend": "ventashop.query_profiler.QueryProfilerMiddleware"}
+        )
+        profiler.enable()
+        cls.addClassCleanup(profiler.disable)
+        super().setUpClass()
+
+    def assertQueryProfile(self, response, budget=None):
+        """Check a request repeated no query shape, and kept to its view's (or a) budget."""
+
+        if budget is None:
+            budget = response.query_budget
+        problems = response.query_profile.problems(budget=budget)
+
+        if problems:
+            self.fail("\n".join([f"{response.request['PATH_INFO']} :", *problems]))
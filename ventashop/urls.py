@@ -8,7 +8,11 @@ from django.contrib.auth.views import (
 )
 from django.urls import path
 
-from ventashop.message_views import MessageListView, ConversationListView
+from ventashop.message_views import (
+    MessageListView,
+    ConversationListView,
+    message_stream,
+)
 from ventashop.views import (
     AboutView,
     ContactFormView,
@@ -19,6 +23,7 @@ from ventashop.views import (
     CategoryListView,
     ProductDetailView,
     ProductListView,
+    ProductListPageView,
     ProductCreateView,
     ProductUpdateView,
     CartView,
@@ -51,9 +56,17 @@ urlpatterns = [
     ##### PRODUCTS AND CATEGORIES #####
     ###################################
     path("products/", ProductListView.as_view(), name="products-all"),
+    path(
+        "products/page/", ProductListPageView.as_view(), name="products-all-page"
+    ),  # next page, to be appended
     path(
         "<slug:slug>/products/", ProductListView.as_view(), name="products"
     ),  # products filtered by category
+    path(
+        "<slug:slug>/products/page/",
+        ProductListPageView.as_view(),
+        name="products-page",
+    ),
     path(
         "<slug:slug>/product_detail/",
         ProductDetailView.as_view(),
@@ -103,6 +116,7 @@ urlpatterns = [
         MessageListView.as_view(),
         name="messages-last",
     ),
+    path("<int:pk>/messages/stream/", message_stream, name="messages-stream"),
     #########################
     ##### ROLE SPECIFIC #####
     #########################
@@ -1,9 +1,10 @@
 """A utility module for ventashop app."""
 
-import string, random, re
+import string, re, threading
 from decimal import Decimal
 
 from django import forms
+from django.db import transaction
 
 VAT_FRANCE = 0.2
 
@@ -11,46 +12,102 @@ VAT_FRANCE = 0.2
 ##### Reference number #####
 ############################
 
+REF_NUMBER_ALPHABET = string.digits + string.ascii_lowercase
+REF_NUMBER_BODY_SIZE = 8
 
-def random_string_generator(size=10, chars=string.ascii_lowercase + string.digits):
-    """Generate a random string of 10 characters"""
 
-    return "".join(random.choice(chars) for i in range(size))
+def to_base36(number):
+    """Encode a positive integer in base 36, with lower case characters."""
 
+    if number == 0:
+        return REF_NUMBER_ALPHABET[0]
 
-def unique_ref_number_generator(instance):
-    """Make unique reference number."""
-    ref_number = random_string_generator()
+    chars = []
+    while number:
+        number, remainder = divmod(number, 36)
+        chars.append(REF_NUMBER_ALPHABET[remainder])
 
-    Klass = instance.__class__
+    return "".join(reversed(chars))
 
-    qs_exists = Klass.objects.filter(ref_number=ref_number).exists()
-    if qs_exists:
-        return unique_ref_number_generator(instance)
-    return ref_number
 
+def ref_number_check_char(body):
+    """
+    Compute the check character of a reference number body (Luhn mod 36),
+    which detects any single mistyped character and most swapped neighbours.
+    """
+
+    base = len(REF_NUMBER_ALPHABET)
+    factor = 2
+    total = 0
+
+    for char in reversed(body):
+        addend = factor * REF_NUMBER_ALPHABET.index(char)
+        total += addend // base + addend % base
+        factor = 1 if factor == 2 else 2
+
+    return REF_NUMBER_ALPHABET[(base - total % base) % base]
+
+
+def encode_ref_number(number):
+    """
+    Make a reference number from a sequence number :
+    8 base 36 characters, and a check character.
+    Legacy random reference numbers are 10 characters long,
+    so both can never collide.
+    """
+
+    body = to_base36(number).zfill(REF_NUMBER_BODY_SIZE)
+    return body + ref_number_check_char(body)
 
-###############################
-##### Registration number #####
-###############################
 
+def is_valid_ref_number(ref_number):
+    """Check the check character of a sequence based reference number."""
+
+    body, check_char = ref_number[:-1], ref_number[-1:]
+
+    if not body or any(char not in REF_NUMBER_ALPHABET for char in ref_number):
+        return False
+
+    return ref_number_check_char(body) == check_char
+
+
+class BlockAllocator:
+    """
+    Hand out unique numbers from blocks reserved in the database,
+    so that most allocations cost no query at all.
+
+    reserve(size) must atomically reserve "size" consecutive numbers
+    and return the first one.
+    """
+
+    def __init__(self, reserve, block_size=100):
+        self.reserve = reserve
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
 
-def random_reg_number_generator(size=4, chars=string.digits):
-    """Generate a random string of 4 digits"""
+    def allocate(self):
+        """Return a unique number."""
 
-    return "".join(random.choice(chars) for i in range(size))
+        with self._lock:
+            if self._next < self._end:
+                number = self._next
+                self._next += 1
+                return number
 
+        start = self.reserve(self.block_size)
+        end = start + self.block_size
 
-def unique_reg_number_generator(instance):
-    """Make unique registration number."""
-    reg_number = random_reg_number_generator()
+        def keep_block():
+            with self._lock:
+                self._next, self._end = start + 1, end
 
-    Klass = instance.__class__
+        # The rest of the block is only handed out once the reservation is committed :
+        # if it were rolled back, other processes could reserve the same block.
+        transaction.on_commit(keep_block)
 
-    qs_exists = Klass.objects.filter(reg_number=reg_number).exists()
-    if qs_exists:
-        return unique_reg_number_generator(instance)
-    return reg_number
+        return start
 
 
 #######################
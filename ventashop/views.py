@@ -1,6 +1,8 @@
 """ Our Ventashp main view module."""
 
-from django.http import HttpResponseRedirect
+from decimal import Decimal
+
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
 from django.shortcuts import render, get_object_or_404
 
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -14,7 +16,10 @@ from django.views.generic import (
 )
 from django.views.generic.edit import CreateView, UpdateView
 from django.urls import reverse
+from django.utils.http import urlencode
 from django.db import IntegrityError
+from django.conf import settings
+from django.views.static import serve
 
 from ventashop.models import (
     Category,
@@ -26,6 +31,8 @@ from ventashop.models import (
     Conversation,
 )
 from ventashop.forms import ContactForm, UserForm, EmployeePwdUpdateForm
+from ventashop.catalogue import catalogue_cache_key, get_catalogue_page, set_catalogue_page
+from ventashop.search import search_products
 from ventashop.auth_utils import (
     TestIsCustomerMixin,
     TestIsEmployeeMixin,
@@ -164,6 +171,8 @@ class MySpaceView(LoginRequiredMixin, TestIsCustomerMixin, ListView):
     model = Order
     paginate_by = 100  # if pagination is desired
     context_object_name = "order_list"
+    # Queries per request, see query_profiler.py.
+    query_budget = 8
 
     def get_queryset(self):
         """
@@ -205,13 +214,17 @@ class CustomerListView(LoginRequiredMixin, TestIsEmployeeMixin, ListView):
     model = User
     template_name = "ventashop/employee/customers.html"
     context_object_name = "customer_list"
+    query_budget = 4
 
     def get_queryset(self):
         """Get employee's related customer list."""
 
         user = self.request.user
+        # No reg_number (e.g. deactivated) : not the unassigned customers' employee.
         customer_list = User.objects.filter(
-            role="CUSTOMER", customeraccount__employee_reg=user.reg_number
+            role="CUSTOMER",
+            customeraccount__employee_reg=user.reg_number,
+            customeraccount__employee_reg__isnull=False,
         ).order_by("date_joined")
 
         return customer_list
@@ -280,19 +293,51 @@ class ProductView(TemplateView):
         return Category.objects.all().order_by("name")
 
 
-class ProductListView(ListView):
-    """Our product-by-category list view."""
+class CatalogueMixin:
+    """
+    Keyset paginated product list, by name, optionally filtered by category :
+    a page is the page_size products named after the "after" query parameter.
+    With a "q" query parameter, the page_size best search results (see search.py).
+    Rendered pages are cached for anonymous users,
+    until products or categories change (see catalogue.py).
+    """
 
     model = Product
-    # paginate_by = 100  # if pagination is desired
-    template_name = "ventashop/products.html"
+    page_size = 50
     context_object_name = "product_list"
 
+    def get(self, request, *args, **kwargs):
+        """Cached page for anonymous users, if any."""
+
+        if request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+
+        key = catalogue_cache_key(request.path, request.GET)
+        cached = get_catalogue_page(key)
+
+        if cached is None:
+            response = super().get(request, *args, **kwargs)
+            if hasattr(response, "render"):
+                response.render()
+            if response.status_code == 200:
+                set_catalogue_page(key, (response.content, response["Content-Type"]))
+            return response
+
+        content, content_type = cached
+        return HttpResponse(content, content_type=content_type)
+
     def get_queryset(self, **kwargs):
         """
-        Return products by category, ordered by creation date, and with price multiplied by 1000.
+        Return a page of products by category, ordered by name,
+        and with the price of 1000 units computed by the database.
+        One more product is fetched, to know if there is a next page.
         """
 
+        query = self.request.GET.get("q", "").strip()
+        if query:
+            results = search_products(query, category=self.kwargs.get("slug"))
+            return results.with_pack_price()[: self.page_size]
+
         if "slug" in self.kwargs:
             p_set = Product.objects.filter(category__slug=self.kwargs["slug"]).order_by(
                 "name"
@@ -300,10 +345,45 @@ class ProductListView(ListView):
         else:
             p_set = Product.objects.all().order_by("name")
 
-        for product in p_set:
-            product.price *= 1000
+        after = self.request.GET.get("after")
+        if after:
+            p_set = p_set.filter(name__gt=after)
 
-        return p_set
+        return p_set.with_pack_price()[: self.page_size + 1]
+
+    def get_context_data(self, **kwargs):
+        """The page of products, and the urls of the next one if any."""
+
+        context = super().get_context_data(**kwargs)
+
+        page = list(context["product_list"])
+        # SQLite doesn't round computed decimals to their field's decimal places.
+        for product in page:
+            product.pack_price = product.pack_price.quantize(Decimal("0.01"))
+        context["product_list"] = page[: self.page_size]
+
+        if len(page) > self.page_size:
+            query = "?" + urlencode({"after": page[self.page_size - 1].name})
+            context["next_url"] = reverse(self.get_url_name(""), kwargs=self.kwargs) + query
+            context["next_page_url"] = (
+                reverse(self.get_url_name("-page"), kwargs=self.kwargs) + query
+            )
+
+        return context
+
+    def get_url_name(self, suffix):
+        """Name of the catalogue url, with or without category."""
+
+        name = "products" if "slug" in self.kwargs else "products-all"
+
+        return "ventashop:" + name + suffix
+
+
+class ProductListView(CatalogueMixin, ListView):
+    """Our product-by-category list view."""
+
+    template_name = "ventashop/products.html"
+    query_budget = 5
 
     def get_context_data(self, **kwargs):
         """
@@ -319,10 +399,41 @@ class ProductListView(ListView):
                 context["actual_category"] = actual_category[0]
 
         context["category_list"] = Category.objects.all().order_by("name")
+        context["query"] = self.request.GET.get("q", "")
 
         return context
 
 
+class ProductListPageView(CatalogueMixin, ListView):
+    """
+    A next page of the product list, to be appended by the catalogue page :
+    an HTML fragment, or JSON with ?format=json.
+    """
+
+    template_name = "ventashop/partials/product_list_page.html"
+    query_budget = 3
+
+    def render_to_response(self, context, **response_kwargs):
+        if self.request.GET.get("format") != "json":
+            return super().render_to_response(context, **response_kwargs)
+
+        products = [
+            {
+                "name": product.name,
+                "slug": product.slug,
+                "url": product.get_absolute_url(),
+                "pack_price": str(product.pack_price),
+            }
+            for product in context["product_list"]
+        ]
+
+        next_url = context.get("next_page_url")
+        if next_url:
+            next_url += "&" + urlencode({"format": "json"})
+
+        return JsonResponse({"products": products, "next": next_url})
+
+
 class ProductDetailView(DetailView):
     """Our product's detailed view."""
 
@@ -403,6 +514,7 @@ class CartView(LoginRequiredMixin, TestIsCustomerMixin, TemplateView):
 
     login_url = "/login/"
     template_name = "ventashop/cart.html"
+    query_budget = 8
 
     def get_context_data(self, **kwargs):
         """Cart with line item list to be displayed."""
@@ -483,8 +595,7 @@ class LineItemRemoveFromCartView(LoginRequiredMixin, TestIsCustomerMixin, Redire
 
         line_item = get_object_or_404(LineItem, pk=kwargs["line_item_id"])
         cart = line_item.cart
-        line_item.delete()
-        cart.save()
+        cart.remove_line_item(line_item)
 
         kwargs = {}
         kwargs["cart_id"] = cart.id
@@ -539,6 +650,7 @@ class OrderListView(LoginRequiredMixin, TestIsCustomerMixin, ListView):
     paginate_by = 100  # if pagination is desired
     template_name = "ventashop/orders.html"
     context_object_name = "order_list"
+    query_budget = 5
 
     def get_queryset(self):
         """
@@ -554,6 +666,7 @@ class OrderDetailView(LoginRequiredMixin, TestIsCustomerMixin, DetailView):
     login_url = "/login/"
     model = Order
     template_name = "ventashop/order_detail.html"
+    query_budget = 10
 
     def get_context_data(self, **kwargs):
         """Line item list, order status and last comment to be displayed."""
@@ -573,3 +686,16 @@ class OrderDetailView(LoginRequiredMixin, TestIsCustomerMixin, DetailView):
         context["status"] = status_tuple_list[0][1]
 
         return context
+
+
+def serve_immutable_media(request, path):
+    """
+    Serve a content-hash named media file (see storage.py) : its content never changes,
+    so browsers and proxies may cache it for good.
+    Development only (DEBUG), the web server does it in production (see settings.py).
+    """
+
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+
+    return response
@@ -74,9 +74,11 @@ INSTALLED_APPS = [
     "django_cleanup.apps.CleanupConfig",
     "rest_framework",
     "rest_framework.authtoken",
+    "ventAPI.apps.VentapiConfig",
 ]
 
 MIDDLEWARE = [
+    "ventashop.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -100,6 +102,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "ventashop.context_processors.unread_messages",
             ],
         },
     },
@@ -127,6 +130,34 @@ DATABASES = {
 AUTH_USER_MODEL = "ventashop.User"
 
 
+# Cache, e.g. for rendered catalogue pages (see ventashop/catalogue.py).
+# Per process by default : set REDIS_URL (with the redis package) to share it between workers.
+# Catalogue pages are outdated in every process at once, their version being kept in the database.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+if os.environ.get("REDIS_URL"):
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ["REDIS_URL"],
+    }
+
+# Seconds a cached catalogue page is kept.
+CATALOGUE_CACHE_TIMEOUT = 300
+
+# API token authentication caches, see ventAPI/authentication.py :
+# tokens kept per process, and seconds they are kept per process / in the shared cache.
+API_TOKEN_CACHE_SIZE = 1000
+API_TOKEN_LOCAL_TIMEOUT = 30
+API_TOKEN_CACHE_TIMEOUT = 300
+# Seconds after which a cached token is checked against the database again (one query),
+# bounding how long a revoked token or deactivated user is accepted by other processes.
+API_TOKEN_RECHECK_INTERVAL = 5
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -152,10 +183,10 @@ AUTH_PASSWORD_VALIDATORS = [
 
 # Django REST Framework settings
 REST_FRAMEWORK = {
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
-    # 'PAGE_SIZE': 10,
+    "DEFAULT_PAGINATION_CLASS": "ventAPI.pagination.CursorPagination",
+    "PAGE_SIZE": 50,
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework.authentication.TokenAuthentication",
+        "ventAPI.authentication.CachedTokenAuthentication",
         # 'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
     # "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
@@ -200,6 +231,13 @@ else:
 
 
 # Media files
+# Served by Django with DEBUG on only. In production, the web server (or CDN) serves
+# MEDIA_ROOT at MEDIA_URL, and product images being named by content hash
+# (see ventashop/storage.py), sends "Cache-Control: public, max-age=31536000, immutable"
+# for them, e.g. with nginx :
+#   location ~ ^/media/.+/[0-9a-f]{2}/[0-9a-f]{64}(-\w+)?\.\w+$ {
+#       root /path/to/ventalis; add_header Cache-Control "public, max-age=31536000, immutable";
+#   }
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
 MEDIA_URL = "media/"
@@ -244,3 +282,33 @@ if IS_PROD:
 
 
 VENTALIS_EMAIL = "ventalis-gmail@example.com"
+
+
+# Server-Sent Events stream of new messages, see ventashop/message_views.py.
+# Under WSGI (gunicorn sync workers), each open stream would hold a worker :
+# only enable it when served under ASGI (e.g. uvicorn). Pages poll otherwise.
+MESSAGE_STREAM_ENABLED = bool(os.environ.get("MESSAGE_STREAM_ENABLED"))
+
+# Broker of the message stream events, see ventashop/events.py.
+# "ventashop.events.PostgresBroker" shares events between processes / workers.
+VENTALIS_MESSAGE_BROKER = "ventashop.events.InProcessBroker"
+
+# Threads generating product image variants per process, see ventashop/images.py.
+# 0 generates them in the request, once committed.
+PRODUCT_IMAGE_WORKERS = 2
+
+# Query profiler middleware, opt-in, see ventashop/query_profiler.py.
+QUERY_PROFILER = bool(os.environ.get("QUERY_PROFILER"))
+# Runs of the same query shape in a request flagged as an N+1 pattern.
+QUERY_PROFILER_REPEAT_THRESHOLD = 3
+
+if QUERY_PROFILER:
+    MIDDLEWARE.insert(0, "ventashop.query_profiler.QueryProfilerMiddleware")
+
+# Request metrics, see ventashop/metrics.py.
+# "ventashop.metrics.CacheStore" shares them between hosts, with a shared cache.
+METRICS_STORE = "ventashop.metrics.FileStore"
+METRICS_DIR = os.environ.get("METRICS_DIR", "/tmp/ventalis-metrics")
+METRICS_FLUSH_INTERVAL = 10
+# Bearer token of the /metrics/ endpoint, disabled without it.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
@@ -0,0 +1,18 @@
+"""
+Settings for running the project, and its tests, on SQLite :
+    python manage.py test --settings=ventasite.settings_sqlite
+
+Some features have a SQLite implementation of their own (e.g. product search,
+see ventashop/search.py) : run the tests on both databases when changing them,
+or when a migration alters their tables.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.sqlite3",
+    }
+}
@@ -15,20 +15,32 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf.urls.static import static
 from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 
+from ventashop.metrics import metrics_view
+from ventashop.storage import CONTENT_HASH_PATH
+from ventashop.views import serve_immutable_media
 from . import settings
 
 
 urlpatterns = [
     path("api/", include("ventAPI.urls", namespace="ventAPI")),
     path("gestion/", admin.site.urls),
+    path("metrics/", metrics_view, name="metrics"),
     path("", include("ventashop.urls", namespace="ventashop")),
 ]
 
 if settings.DEBUG:
+    # Media are served by the web server (or CDN) in production, see settings.py.
+    urlpatterns += [
+        # Content-hash named media, and their variants : cached for good.
+        re_path(
+            rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>{CONTENT_HASH_PATH})$",
+            serve_immutable_media,
+        ),
+    ]
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 else:
     urlpatterns += staticfiles_urlpatterns()